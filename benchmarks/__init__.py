@@ -0,0 +1 @@
+"""Замеры производительности базы данных на синтетических таблицах."""
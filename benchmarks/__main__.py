@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+from prettytable import PrettyTable
+from .data import format_size, parse_size
+from .suite import run_size
+
+DEFAULT_SIZES = "10k,100k,1m"
+DEFAULT_THRESHOLD = 0.2
+
+
+def parse_args(argv=None):
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Замеры производительности на синтетических таблицах.",
+    )
+    parser.add_argument(
+        "--sizes", default=DEFAULT_SIZES,
+        help=f"размеры таблиц через запятую (по умолчанию {DEFAULT_SIZES})",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="зерно генератора")
+    parser.add_argument(
+        "--only", help="выполнить только перечисленные через запятую замеры"
+    )
+    parser.add_argument("--output", metavar="FILE", help="сохранить итоги в JSON")
+    parser.add_argument(
+        "--baseline", metavar="FILE", help="сравнить с итогами прошлого запуска"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_THRESHOLD,
+        help="допустимое падение ops/s относительно базы "
+             f"в долях (по умолчанию {DEFAULT_THRESHOLD})",
+    )
+    return parser.parse_args(argv)
+
+
+def print_results(size_label, results):
+    """Печатает итоги одного размера таблицы."""
+    table = PrettyTable()
+    table.field_names = [
+        "замер", "ops", "ops/s", "строк/s", "p50 мкс", "p95 мкс", "p99 мкс",
+        "пик КиБ",
+    ]
+    for name, result in results.items():
+        table.add_row([
+            name, result["ops"], result["ops_per_sec"], result["rows_per_sec"],
+            result["p50_us"], result["p95_us"], result["p99_us"],
+            result["peak_kib"],
+        ])
+    table.align = "r"
+    table.align["замер"] = "l"
+    print(f"Размер таблицы: {size_label}")
+    print(table)
+
+
+def compare(report, baseline, threshold):
+    """
+    Сравнивает ops/s с базой. Возвращает список регрессий.
+
+    Регрессия - падение ops/s больше чем на threshold (доля).
+    """
+    regressions = []
+    table = PrettyTable()
+    table.field_names = ["размер", "замер", "база ops/s", "ops/s", "изменение"]
+
+    for size_label, results in report["results"].items():
+        base_results = baseline.get("results", {}).get(size_label, {})
+        for name, result in results.items():
+            base = base_results.get(name)
+            if not base or not base.get("ops_per_sec"):
+                continue
+            change = result["ops_per_sec"] / base["ops_per_sec"] - 1
+            mark = ""
+            if change < -threshold:
+                regressions.append((size_label, name, change))
+                mark = " !"
+            table.add_row([
+                size_label, name, base["ops_per_sec"], result["ops_per_sec"],
+                f"{change:+.1%}{mark}",
+            ])
+
+    table.align = "r"
+    print(table)
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    only = set(args.only.split(',')) if args.only else None
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+
+    for size in sizes:
+        size_label = format_size(size)
+        results = run_size(size, seed=args.seed, only=only)
+        report["results"][size_label] = results
+        print_results(size_label, results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"Итоги записаны в {args.output}.")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"Регрессий больше {args.threshold:.0%}: {len(regressions)}")
+            for size_label, name, change in regressions:
+                print(f"- {size_label} {name}: {change:+.1%}")
+            sys.exit(1)
+        print("Регрессий нет.")
+
+
+if __name__ == "__main__":
+    main()
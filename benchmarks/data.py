@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import random
+
+# Схема синтетической таблицы в формате метаданных
+DEFAULT_SCHEMA = ["name:str", "age:int", "city:str", "is_active:bool"]
+
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_size(text):
+    """Разбирает размер вида 10000, 10k или 1m."""
+    text = text.strip().lower()
+    if text and text[-1] in SIZE_SUFFIXES:
+        return int(text[:-1]) * SIZE_SUFFIXES[text[-1]]
+    return int(text)
+
+
+def format_size(size):
+    """Обратное к parse_size: 1000000 -> 1m, 10000 -> 10k."""
+    for suffix, factor in sorted(SIZE_SUFFIXES.items(), key=lambda item: -item[1]):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{suffix}"
+    return str(size)
+
+
+def _value_generators(size):
+    """Генераторы значений для каждого типа (кардинальность зависит от size)."""
+    return {
+        "int": lambda rng: rng.randrange(100),
+        "str": lambda rng: f"user{rng.randrange(max(size // 10, 1))}",
+        "bool": lambda rng: rng.random() < 0.5,
+    }
+
+
+def generate_rows(size, schema=DEFAULT_SCHEMA, seed=0):
+    """
+    Генерирует size строк значений (без ID) для схемы.
+
+    При одинаковом seed данные одинаковы, поэтому прогоны сравнимы.
+    Столбец city берет значения из короткого списка, чтобы было
+    по чему группировать и фильтровать с низкой селективностью.
+    """
+    rng = random.Random(seed)
+    generators = _value_generators(size)
+    cities = ["Москва", "Казань", "Томск", "Омск", "Пермь"]
+
+    makers = []
+    for column_def in schema:
+        name, type_ = column_def.split(':')
+        if name == "city":
+            makers.append(lambda rng: rng.choice(cities))
+        else:
+            makers.append(generators[type_])
+
+    for _ in range(size):
+        yield [make(rng) for make in makers]
+
+
+def generate_records(size, schema=DEFAULT_SCHEMA, seed=0):
+    """Как generate_rows, но словари {столбец: значение} с ID от 1."""
+    names = [column_def.split(':')[0] for column_def in schema]
+    for record_id, values in enumerate(generate_rows(size, schema, seed), 1):
+        record = {'ID': record_id}
+        record.update(zip(names, values))
+        yield record
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+
+import contextlib
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from src.primitive_db.api import Connection
+from src.primitive_db.binary import load_binary_table, write_binary
+from src.primitive_db.columnar import ColumnarTable
+from src.primitive_db.constants import LOAD_BATCH_SIZE, SYSTEM_KEY
+from src.primitive_db.core import (
+    delete, format_table_output, get_column_types, get_table_schema,
+    insert_many, select, update,
+)
+from src.primitive_db.decorators import set_auto_confirm
+from src.primitive_db.engine import execute_command
+from src.primitive_db.join import HashJoin
+from src.primitive_db.manager import TableManager
+from src.primitive_db.parser import JoinClause, parse_where_condition
+from src.primitive_db.storage import replay_log, write_log
+from src.primitive_db.table import Table
+from src.primitive_db.utils import save_metadata
+from .data import DEFAULT_SCHEMA, generate_records, generate_rows
+
+TABLE_NAME = "bench"
+
+# Число операций для точечных и для тяжелых (полный проход) замеров
+POINT_OPS = 1000
+SCAN_OPS = 10
+
+
+def percentile(sorted_values, fraction):
+    """Процентиль по ближайшему рангу."""
+    if not sorted_values:
+        return 0
+    rank = max(int(round(fraction * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def measure(operation, ops, rows_per_op=1):
+    """
+    Выполняет operation(i) для i от 0 до ops-1 и собирает статистику.
+
+    Время замеряется без tracemalloc; пиковая память - отдельным
+    дополнительным вызовом под tracemalloc, чтобы не искажать время.
+    """
+    latencies = []
+    start = time.perf_counter()
+    for i in range(ops):
+        op_start = time.perf_counter_ns()
+        operation(i)
+        latencies.append(time.perf_counter_ns() - op_start)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    operation(ops)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "ops": ops,
+        "seconds": round(elapsed, 6),
+        "ops_per_sec": round(ops / elapsed, 2) if elapsed > 0 else 0,
+        "rows_per_sec": round(ops * rows_per_op / elapsed, 2) if elapsed > 0 else 0,
+        "p50_us": round(percentile(latencies, 0.50) / 1000, 2),
+        "p95_us": round(percentile(latencies, 0.95) / 1000, 2),
+        "p99_us": round(percentile(latencies, 0.99) / 1000, 2),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def _metadata(schema):
+    return {TABLE_NAME: ["ID:int"] + list(schema)}
+
+
+def _conditions(template, count):
+    return [parse_where_condition(template.format(i=i)) for i in range(count)]
+
+
+def run_size(size, schema=DEFAULT_SCHEMA, seed=0, only=None):
+    """Прогоняет все замеры на таблице из size строк. Возвращает {замер: итог}."""
+    set_auto_confirm(True)
+    metadata = _metadata(schema)
+    metadata[SYSTEM_KEY] = {"sequences": {TABLE_NAME: size}}
+    table_schema = get_table_schema(metadata, TABLE_NAME)
+    column_types = get_column_types(metadata, TABLE_NAME)
+    records = list(generate_records(size, schema, seed))
+    table = Table(TABLE_NAME, records, column_types=column_types)
+    tmp_dir = tempfile.mkdtemp(prefix="primitive_db_bench_")
+
+    by_id = _conditions("ID = {i}", POINT_OPS + 1)
+    by_name = _conditions('name = "user{i}"', SCAN_OPS + 1)
+
+    # Каждая фабрика готовит данные замера и возвращает операцию op(i)
+    def build_table():
+        return lambda _: Table(TABLE_NAME, records, column_types=column_types)
+
+    def insert_row():
+        new_rows = list(generate_rows(POINT_OPS + 1, schema, seed + 1))
+
+        def operation(i):
+            inserted = insert_many(metadata, TABLE_NAME, [new_rows[i]])
+            table.append(inserted[0])
+        return operation
+
+    batch = list(generate_rows(min(LOAD_BATCH_SIZE, size), schema, seed + 2))
+
+    def insert_batch():
+        def operation(_):
+            batch_table = Table(TABLE_NAME, column_types=column_types)
+            for record in insert_many(_metadata(schema), TABLE_NAME, batch):
+                batch_table.append(record)
+        return operation
+
+    def select_all():
+        return lambda _: select(table)
+
+    def select_by_id():
+        return lambda i: select(table, by_id[i * 7919 % len(by_id)])
+
+    def select_eq_scan():
+        return lambda i: select(table, by_name[i])
+
+    def select_range_scan():
+        by_range = _conditions("age >= {i} and age < 50", SCAN_OPS + 1)
+        return lambda i: select(table, by_range[i])
+
+    def select_range_limit():
+        by_range = _conditions("age >= {i} and age < 50", POINT_OPS + 1)
+        return lambda i: select(table, by_range[i % 50], None, 10)
+
+    def select_eq_indexed():
+        indexed = Table(TABLE_NAME, records, {"name": "hash"}, column_types)
+        by_name_point = _conditions('name = "user{i}"', POINT_OPS + 1)
+        return lambda i: select(indexed, by_name_point[i])
+
+    def select_order_by_sorted():
+        sorted_table = Table(TABLE_NAME, records, {"age": "sorted"}, column_types)
+        by_age = _conditions("age = {i}", SCAN_OPS + 1)
+        return lambda i: select(sorted_table, by_age[i], ("age", False))
+
+    def select_eq_columnar():
+        columnar = ColumnarTable(TABLE_NAME, records, column_types)
+        return lambda i: select(columnar, by_name[i])
+
+    def select_eq_binary():
+        write_binary(TABLE_NAME, records, column_types, tmp_dir)
+        binary = load_binary_table(TABLE_NAME, TABLE_NAME, column_types, tmp_dir)
+        return lambda i: select(binary, by_name[i])
+
+    def select_eq_compressed():
+        # Столбцы распаковываются при первом запросе, дальше сравнение кодов
+        write_binary(TABLE_NAME, records, column_types, tmp_dir, compression="zlib")
+        packed = load_binary_table(TABLE_NAME, TABLE_NAME, column_types, tmp_dir)
+        return lambda i: select(packed, by_name[i])
+
+    def select_range_binary():
+        # Диапазон ID в конце таблицы: остальные сегменты отсекают карты зон
+        write_binary(TABLE_NAME, records, column_types, tmp_dir)
+        binary = load_binary_table(TABLE_NAME, TABLE_NAME, column_types, tmp_dir)
+        by_id_range = [
+            parse_where_condition(f"ID > {size - 1000 - i} and age < 50")
+            for i in range(SCAN_OPS + 1)
+        ]
+        return lambda i: select(binary, by_id_range[i])
+
+    def _orders(size):
+        # Заказы: по одному на пользователя, user_id вразброс
+        return Table("orders", [
+            {"ID": i, "user_id": i * 7919 % size + 1, "amount": i % 100}
+            for i in range(1, size + 1)
+        ], column_types={"ID": int, "user_id": int, "amount": int})
+
+    def select_join_key():
+        join = HashJoin(table, _orders(size), JoinClause(
+            "u", "orders", "o", "u.ID", "o.user_id"
+        ))
+        by_amount = _conditions("o.amount = {i} and u.age < 50", SCAN_OPS + 1)
+        return lambda i: select(join, by_amount[i])
+
+    def select_join_hash():
+        join = HashJoin(table, _orders(size), JoinClause(
+            "u", "orders", "o", "u.age", "o.amount"
+        ))
+        by_name = _conditions('u.name = "user{i}"', SCAN_OPS + 1)
+        return lambda i: select(join, by_name[i])
+
+    page = records[:1000]
+
+    def format_output():
+        return lambda _: str(format_table_output(page, table_schema))
+
+    def save():
+        return lambda _: write_log(TABLE_NAME, table.records, tmp_dir)
+
+    def load():
+        write_log(TABLE_NAME, table.records, tmp_dir)
+        return lambda _: replay_log(TABLE_NAME, tmp_dir)
+
+    def load_binary():
+        write_binary(TABLE_NAME, table.records, column_types, tmp_dir)
+        return lambda _: load_binary_table(
+            TABLE_NAME, TABLE_NAME, column_types, tmp_dir
+        )
+
+    def load_compressed():
+        # Холодная загрузка: файл с диска и распаковка всех столбцов
+        write_binary(
+            TABLE_NAME, table.records, column_types, tmp_dir, compression="zlib"
+        )
+        return lambda _: load_binary_table(
+            TABLE_NAME, TABLE_NAME, column_types, tmp_dir
+        ).records
+
+    def update_by_id():
+        set_age = {"age": 1}
+        return lambda i: update(table, set_age, by_id[i])
+
+    def delete_by_id():
+        return lambda i: delete(table, by_id[i])
+
+    def _command_manager():
+        # Сквозной путь: разбор команды, менеджер, журнал упреждающей записи
+        command_dir = tempfile.mkdtemp(dir=tmp_dir)
+        meta_file = os.path.join(command_dir, "db_meta.json")
+        write_log(TABLE_NAME, records, command_dir)
+        save_metadata(metadata, meta_file)
+        manager = TableManager(
+            meta_file, command_dir, flush_every=0, flush_interval=0,
+            durability="off",
+        )
+        manager.get_table(TABLE_NAME)
+        return manager
+
+    def command_select():
+        manager = _command_manager()
+        return lambda i: execute_command(
+            manager, f"select from {TABLE_NAME} where ID = {i + 1}"
+        )
+
+    def command_insert():
+        manager = _command_manager()
+        return lambda i: execute_command(
+            manager,
+            f'insert into {TABLE_NAME} values ("cmd{i}", {i}, "Омск", true)',
+        )
+
+    def vacuum():
+        # Переписывание таблицы в новое поколение файлов
+        manager = _command_manager()
+        return lambda _: execute_command(manager, f"vacuum {TABLE_NAME}")
+
+    def _connection():
+        # То же, что _command_manager, но через Python API
+        manager = _command_manager()
+        connection = Connection(
+            manager.meta_file, manager.data_dir, durability="off",
+            flush_every=0, flush_interval=0,
+        )
+        manager.close()
+        return connection
+
+    def api_select():
+        connection = _connection()
+        statement = connection.prepare(f"select from {TABLE_NAME} where ID = ?")
+        return lambda i: statement.execute((i + 1,)).fetchall()
+
+    def api_insert():
+        connection = _connection()
+        statement = connection.prepare(
+            f"insert into {TABLE_NAME} values (?, ?, ?, ?)"
+        )
+        return lambda i: statement.execute((f"api{i}", i, "Омск", True))
+
+    def api_executemany():
+        connection = _connection()
+        rows = [
+            tuple(values)
+            for values in generate_rows(LOAD_BATCH_SIZE, schema, seed + 3)
+        ]
+        query = f"insert into {TABLE_NAME} values (?, ?, ?, ?)"
+        return lambda _: connection.executemany(query, rows)
+
+    benchmarks = [
+        ("build_table", build_table, 1, size),
+        ("insert", insert_row, POINT_OPS, 1),
+        ("insert_batch", insert_batch, 3, len(batch)),
+        ("select_all", select_all, 3, size),
+        ("select_where_id", select_by_id, POINT_OPS, 1),
+        ("select_where_eq_scan", select_eq_scan, SCAN_OPS, size),
+        ("select_where_range_scan", select_range_scan, SCAN_OPS, size),
+        ("select_where_range_limit_10", select_range_limit, POINT_OPS, 10),
+        ("select_where_eq_hash_index", select_eq_indexed, POINT_OPS, 1),
+        ("select_order_by_sorted_index", select_order_by_sorted, SCAN_OPS, size),
+        ("select_where_eq_columnar", select_eq_columnar, SCAN_OPS, size),
+        ("select_where_eq_binary", select_eq_binary, SCAN_OPS, size),
+        ("select_where_eq_compressed", select_eq_compressed, SCAN_OPS, size),
+        ("select_where_id_range_binary", select_range_binary, SCAN_OPS, size),
+        ("select_join_key", select_join_key, SCAN_OPS, size),
+        ("select_join_hash", select_join_hash, SCAN_OPS, size),
+        ("format_1000_rows", format_output, SCAN_OPS, len(page)),
+        ("save", save, 2, size),
+        ("load", load, 2, size),
+        ("load_binary", load_binary, 2, size),
+        ("load_compressed", load_compressed, 2, size),
+        ("command_select", command_select, POINT_OPS, 1),
+        ("command_insert", command_insert, POINT_OPS, 1),
+        ("vacuum", vacuum, 2, size),
+        ("api_select", api_select, POINT_OPS, 1),
+        ("api_insert", api_insert, POINT_OPS, 1),
+        ("api_executemany", api_executemany, 3, LOAD_BATCH_SIZE),
+        # Изменяющие замеры идут последними: они меняют общую таблицу
+        ("update_by_id", update_by_id, POINT_OPS, 1),
+        ("delete_by_id", delete_by_id, POINT_OPS, 1),
+    ]
+
+    results = {}
+    try:
+        # Сообщения log_time и команд не нужны в выводе замеров
+        with open(os.devnull, 'w', encoding='utf-8') as devnull:
+            for name, factory, ops, rows_per_op in benchmarks:
+                if only and name not in only:
+                    continue
+                with contextlib.redirect_stdout(devnull):
+                    results[name] = measure(factory(), ops, rows_per_op)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return results
@@ -0,0 +1,619 @@
+#!/usr/bin/env python3
+
+import shlex
+from contextlib import contextmanager
+from .constants import (
+    META_FILE, DATA_DIR, FLUSH_EVERY_OPS, FLUSH_INTERVAL, DEFAULT_DURABILITY,
+    STATEMENT_CACHE_SIZE, SYSTEM_KEY, ERROR_TABLE_NOT_FOUND, ERROR_COLUMN_NOT_FOUND,
+    ERROR_STATEMENT, ERROR_PARAM_COUNT, ERROR_PARAM_TYPE, ERROR_EXECUTEMANY,
+    ERROR_CONNECTION_CLOSED, ERROR_DDL, ERROR_SET_ID,
+)
+from .core import (
+    create_table, drop_table, create_index, drop_index, get_column_types,
+    reserve_table_ids, validate_data_types, iter_select, aggregate, update,
+    delete,
+)
+from .decorators import embedded
+from .expressions import Param
+from .join import HashJoin
+from .manager import TableManager
+from .metrics import metrics
+from .parser import (
+    Aggregate, parse_select, parse_set_clause, parse_values_list,
+    parse_where_condition, split_keyword,
+)
+from .storage import insert_entry, update_entry, delete_entry
+
+# Значения параметров ?: те же типы, что у столбцов
+_PARAM_TYPES = frozenset((int, str, bool))
+
+_USAGE = {
+    "insert": "insert into <таблица> values (<значение|?>, ...), ...",
+    "update": "update <таблица> set <столбец> = <значение|?>, ... [where <условие>]",
+    "delete": "delete from <таблица> [where <условие>]",
+    "create_table": "create_table <таблица> <столбец:тип> ...",
+    "drop_table": "drop_table <таблица>",
+    "create_index": "create_index <таблица> <столбец> [using hash|sorted]",
+    "drop_index": "drop_index <таблица> <столбец>",
+}
+
+
+class DatabaseError(Exception):
+    """Ошибка выполнения запроса через Python API."""
+
+
+class ProgrammingError(DatabaseError):
+    """Ошибка в запросе: синтаксис, таблица, столбец или число параметров."""
+
+
+class DataError(DatabaseError):
+    """Значение не подходит к типу столбца."""
+
+
+class Result:
+    """
+    Результат запроса: итератор кортежей значений в порядке columns.
+
+    У выборки rowcount равен -1; у insert, update и delete кортежей нет,
+    rowcount - число затронутых строк, ids - их ID.
+    """
+
+    def __init__(self, columns=(), rows=(), rowcount=-1, ids=()):
+        self.columns = list(columns)
+        self.rowcount = rowcount
+        self.ids = ids
+        self._rows = iter(rows)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._rows)
+
+    @property
+    def lastrowid(self):
+        """ID последней добавленной (измененной, удаленной) строки."""
+        return self.ids[-1] if self.ids else None
+
+    def fetchone(self):
+        """Следующий кортеж или None, если строки кончились."""
+        return next(self._rows, None)
+
+    def fetchall(self):
+        """Оставшиеся кортежи списком."""
+        return list(self._rows)
+
+
+def _tuples(chunks, columns):
+    """Кортежи значений столбцов из частей выборки."""
+    try:
+        for chunk in chunks:
+            for record in chunk:
+                yield tuple(map(record.get, columns))
+    except ValueError as e:
+        raise DatabaseError(str(e)) from e
+
+
+def _bind(value, params):
+    return params[value.index] if value.__class__ is Param else value
+
+
+def _check_types(schema, values, number=None):
+    """Поднимает DataError с сообщением validate_data_types."""
+    try:
+        validate_data_types(schema, values)
+    except ValueError as e:
+        raise DataError(f"Строка {number}: {e}" if number else str(e)) from e
+
+
+class Statement:
+    """
+    Подготовленный запрос.
+
+    Текст разбирается и проверяется по схеме один раз: таблица, столбцы,
+    число значений и типы значений-констант. execute подставляет
+    параметры ? и сразу выполняет запрос; если схема таблицы с тех пор
+    изменилась, запрос проверяется заново.
+    """
+
+    def __init__(self, connection, query):
+        self.connection = connection
+        self.query = query
+        words = query.split(None, 1)
+        self.command = words[0].lower() if words else ""
+        self._prepare = getattr(self, f"_prepare_{self.command}", None)
+        if self._prepare is None:
+            raise ProgrammingError(ERROR_STATEMENT.format(query))
+        self._run = getattr(self, f"_run_{self.command}")
+        self.writes = self.command != "select"
+        self._check()
+
+    def _check(self):
+        """Разбирает запрос и проверяет его по текущей схеме."""
+        self._schemas = {}
+        self._where = None
+        try:
+            self._prepare(self.connection.manager.metadata)
+        except ValueError as e:
+            raise ProgrammingError(str(e)) from e
+
+    def _schema(self, metadata, table_name):
+        """Схема [(столбец, тип)] таблицы; запоминается для проверки."""
+        if table_name not in metadata or table_name == SYSTEM_KEY:
+            raise ProgrammingError(ERROR_TABLE_NOT_FOUND.format(table_name))
+        self._schemas[table_name] = list(metadata[table_name])
+        return [tuple(column.split(':')) for column in metadata[table_name]]
+
+    def _where_clause(self, text):
+        self._where = parse_where_condition(text, params=True)
+        return self._where.params if self._where is not None else 0
+
+    def execute(self, params=()):
+        """Выполняет запрос со значениями параметров ? по порядку."""
+        return self._execute([params])
+
+    def executemany(self, seq_of_params):
+        """
+        Выполняет insert, update или delete для каждого набора параметров.
+
+        Все наборы проверяются до изменений, а изменения фиксируются
+        одной записью журнала; insert добавляет все строки одной пачкой.
+        """
+        if not self.writes or self.command not in ("insert", "update", "delete"):
+            raise ProgrammingError(ERROR_EXECUTEMANY)
+        return self._execute(list(seq_of_params))
+
+    def _execute(self, param_rows):
+        manager = self.connection.manager
+        if not self.writes:
+            manager.refresh()
+            return self._run_checked(manager, param_rows)
+
+        manager.acquire_write()
+        try:
+            result = self._run_checked(manager, param_rows)
+            manager.operation_done()
+            return result
+        finally:
+            # Вне транзакции, как перед вводом в консоли: изменения
+            # публикуются, блокировка записи отпускается и при ошибке
+            manager.idle()
+
+    def _run_checked(self, manager, param_rows):
+        metadata = manager.metadata
+        for table_name, columns in self._schemas.items():
+            if metadata.get(table_name) != columns:
+                self._check()
+                break
+
+        for params in param_rows:
+            if len(params) != self.params:
+                raise ProgrammingError(
+                    ERROR_PARAM_COUNT.format(self.params, len(params))
+                )
+            if not _PARAM_TYPES.issuperset(map(type, params)):
+                for number, value in enumerate(params, 1):
+                    if type(value) not in _PARAM_TYPES:
+                        raise DataError(ERROR_PARAM_TYPE.format(number, value))
+
+        try:
+            with embedded():
+                return self._run(manager, param_rows)
+        except DatabaseError:
+            raise
+        except (ValueError, KeyError) as e:
+            raise DatabaseError(str(e)) from e
+
+    # select
+
+    def _prepare_select(self, metadata):
+        query = parse_select(self.query, params=True)
+        self.params = query.where.params if query.where is not None else 0
+        self._where = query.where
+        self._query = query
+        self._aggregates = query.group_by is not None or any(
+            isinstance(item, Aggregate) for item in query.columns or []
+        )
+
+        schema = self._schema(metadata, query.table)
+        if query.join is not None:
+            self._schema(metadata, query.join.table)
+            relation = self._relation(self.connection.manager)
+            if self._aggregates:
+                self.columns = [str(item) for item in query.columns or query.group_by]
+            else:
+                self.columns = query.columns or relation.output_columns
+                relation.check_columns(self.columns)
+                if query.order_by is not None:
+                    relation.check_columns([query.order_by[0]])
+            return
+
+        names = [name for name, _ in schema]
+        if self._aggregates:
+            self.columns = [str(item) for item in query.columns or query.group_by]
+            return
+        self.columns = query.columns or names
+        order = [query.order_by[0]] if query.order_by is not None else []
+        for column in self.columns + order:
+            if column not in names:
+                raise ProgrammingError(
+                    ERROR_COLUMN_NOT_FOUND.format(column, query.table)
+                )
+
+    def _relation(self, manager):
+        query = self._query
+        table_data = manager.get_table(query.table)
+        if query.join is None:
+            return table_data
+        return HashJoin(table_data, manager.get_table(query.join.table), query.join)
+
+    def _run_select(self, manager, param_rows):
+        query = self._query
+        where = self._where.bind(param_rows[0]) if self.params else self._where
+        relation = self._relation(manager)
+
+        if self._aggregates:
+            rows = aggregate(
+                relation, query.columns, where, query.group_by, query.order_by,
+                query.limit, query.offset,
+            )
+            return Result(self.columns, [
+                tuple(map(row.get, self.columns)) for row in rows
+            ])
+
+        chunks = iter_select(
+            relation, where, query.order_by, query.limit, query.offset,
+            self.columns,
+        )
+        return Result(self.columns, _tuples(chunks, self.columns))
+
+    # insert
+
+    def _prepare_insert(self, metadata):
+        parts = split_keyword(self.query, "values")
+        words = parts[0].split() if parts is not None else []
+        if len(words) != 3 or words[1].lower() != "into":
+            raise ProgrammingError(ERROR_DDL.format(_USAGE["insert"]))
+
+        self._table = words[2]
+        self._schema_list = self._schema(metadata, self._table)
+        rows = parse_values_list(parts[1], params=True)
+        expected = len(self._schema_list) - 1
+        self._columns = [name for name, _ in self._schema_list[1:]]
+        self._types = list(get_column_types(metadata, self._table).values())[1:]
+
+        self.params = 0
+        for number, values in enumerate(rows, 1):
+            if len(values) != expected:
+                raise ProgrammingError(
+                    f'Строка {number}: ожидается {expected} значений, '
+                    f'получено {len(values)}'
+                )
+            params = [value for value in values if value.__class__ is Param]
+            self.params += len(params)
+            constants = [
+                (column, value) for column, value in zip(self._schema_list[1:], values)
+                if value.__class__ is not Param
+            ]
+            _check_types(
+                [("ID", "int")] + [column for column, _ in constants],
+                [value for _, value in constants],
+                number,
+            )
+
+        self._rows = rows
+        # Частый случай: одна строка из одних параметров по порядку
+        self._plain = len(rows) == 1 and rows[0] == [
+            Param(index) for index in range(expected)
+        ]
+
+    def _run_insert(self, manager, param_rows):
+        if self._plain:
+            rows = param_rows
+        else:
+            rows = [
+                [_bind(value, params) for value in values]
+                for params in param_rows
+                for values in self._rows
+            ]
+
+        types = self._types
+        for number, values in enumerate(rows, 1):
+            if list(map(type, values)) != types:
+                _check_types(self._schema_list, values, number)
+
+        table_name = self._table
+        table_data = manager.get_table(table_name)
+        first_id = reserve_table_ids(manager.metadata, table_name, len(rows))
+        columns = self._columns
+        records = [
+            {'ID': new_id, **dict(zip(columns, values))}
+            for new_id, values in enumerate(rows, first_id)
+        ]
+        for record in records:
+            table_data.append(record)
+        manager.set_metadata(manager.metadata)
+        manager.record_many(table_name, [insert_entry(record) for record in records])
+
+        if metrics.enabled:
+            metrics.inc("rows_affected_total", len(records), table=table_name)
+        ids = [record['ID'] for record in records]
+        return Result(rowcount=len(ids), ids=ids)
+
+    # update и delete
+
+    def _prepare_update(self, metadata):
+        where_parts = split_keyword(self.query, "where")
+        head = where_parts[0] if where_parts is not None else self.query
+        set_parts = split_keyword(head, "set")
+        words = set_parts[0].split() if set_parts is not None else []
+        if len(words) != 2:
+            raise ProgrammingError(ERROR_DDL.format(_USAGE["update"]))
+
+        self._table = words[1]
+        schema = self._schema(metadata, self._table)
+        self._set = parse_set_clause(set_parts[1], params=True)
+        self._set_params = sum(
+            value.__class__ is Param for value in self._set.values()
+        )
+        self._set_schema = []
+        types = dict(schema)
+        for column, value in self._set.items():
+            if column == "ID":
+                raise ProgrammingError(ERROR_SET_ID)
+            if column not in types:
+                raise ProgrammingError(
+                    ERROR_COLUMN_NOT_FOUND.format(column, self._table)
+                )
+            self._set_schema.append((column, types[column]))
+            if value.__class__ is not Param:
+                _check_types([("ID", "int"), (column, types[column])], [value])
+
+        where_params = self._where_clause(where_parts[1]) if where_parts else 0
+        self.params = self._set_params + where_params
+
+    def _run_update(self, manager, param_rows):
+        bound = []
+        for params in param_rows:
+            changes = {
+                column: _bind(value, params) for column, value in self._set.items()
+            }
+            if self._set_params:
+                _check_types([("ID", "int")] + self._set_schema, list(changes.values()))
+            where = self._where
+            if where is not None and where.params:
+                where = where.bind(params[self._set_params:])
+            bound.append((changes, where))
+
+        table_name = self._table
+        table_data = manager.get_table(table_name)
+        ids = []
+        for changes, where in bound:
+            _, updated_ids = update(table_data, changes, where)
+            if updated_ids:
+                manager.record(table_name, update_entry(updated_ids, changes))
+                ids.extend(updated_ids)
+        return Result(rowcount=len(ids), ids=ids)
+
+    def _prepare_delete(self, metadata):
+        where_parts = split_keyword(self.query, "where")
+        head = where_parts[0] if where_parts is not None else self.query
+        words = head.split()
+        if len(words) != 3 or words[1].lower() != "from":
+            raise ProgrammingError(ERROR_DDL.format(_USAGE["delete"]))
+
+        self._table = words[2]
+        self._schema(metadata, self._table)
+        self.params = self._where_clause(where_parts[1]) if where_parts else 0
+
+    def _run_delete(self, manager, param_rows):
+        table_name = self._table
+        table_data = manager.get_table(table_name)
+        ids = []
+        wheres = [
+            self._where.bind(params) if self.params else self._where
+            for params in param_rows
+        ]
+        for where in wheres:
+            _, deleted_ids = delete(table_data, where)
+            if deleted_ids:
+                manager.record(table_name, delete_entry(deleted_ids))
+                ids.extend(deleted_ids)
+        return Result(rowcount=len(ids), ids=ids)
+
+    # Команды схемы: разбираются как в консоли, параметров нет
+
+    def _ddl_args(self, valid):
+        args = shlex.split(self.query)[1:]
+        if not valid(len(args)):
+            raise ProgrammingError(ERROR_DDL.format(_USAGE[self.command]))
+        self.params = 0
+        self._args = args
+
+    def _prepare_create_table(self, metadata):
+        self._ddl_args(lambda count: count >= 2)
+
+    def _run_create_table(self, manager, param_rows):
+        table_name, *columns = self._args
+        manager.set_metadata(create_table(manager.metadata, table_name, columns))
+        return Result(rowcount=0)
+
+    def _prepare_drop_table(self, metadata):
+        self._ddl_args(lambda count: count == 1)
+
+    def _run_drop_table(self, manager, param_rows):
+        table_name = self._args[0]
+        manager.set_metadata(drop_table(manager.metadata, table_name))
+        manager.forget_table(table_name)
+        return Result(rowcount=0)
+
+    def _prepare_create_index(self, metadata):
+        self._ddl_args(lambda count: count in (2, 4))
+        if len(self._args) == 4 and self._args[2].lower() != "using":
+            raise ProgrammingError(ERROR_DDL.format(_USAGE["create_index"]))
+
+    def _run_create_index(self, manager, param_rows):
+        table_name, column = self._args[:2]
+        kind = self._args[3].lower() if len(self._args) == 4 else "hash"
+        manager.set_metadata(create_index(manager.metadata, table_name, column, kind))
+        manager.get_table(table_name).add_index(column, kind)
+        return Result(rowcount=0)
+
+    def _prepare_drop_index(self, metadata):
+        self._ddl_args(lambda count: count == 2)
+
+    def _run_drop_index(self, manager, param_rows):
+        table_name, column = self._args
+        manager.set_metadata(drop_index(manager.metadata, table_name, column))
+        manager.get_table(table_name).drop_index(column)
+        return Result(rowcount=0)
+
+
+class Connection:
+    """
+    Соединение с базой данных для использования из кода Python.
+
+    Запросы те же, что в консоли (select, insert, update, delete,
+    create_table, drop_table, create_index, drop_index), но значения
+    можно передавать параметрами ?, без сборки строк. Разобранные
+    запросы кэшируются по тексту; выборки возвращают итераторы
+    кортежей, ошибки поднимаются исключениями DatabaseError.
+
+    Каждое изменение вне транзакции фиксируется в журнале упреждающей
+    записи и публикуется, а блокировка записи отпускается, как у
+    консоли перед вводом; executemany и begin/commit объединяют
+    много изменений в одну запись журнала. Соединение не
+    потокобезопасно: на поток - свое соединение или своя блокировка.
+    """
+
+    def __init__(
+        self,
+        meta_file=META_FILE,
+        data_dir=DATA_DIR,
+        durability=DEFAULT_DURABILITY,
+        flush_every=FLUSH_EVERY_OPS,
+        flush_interval=FLUSH_INTERVAL,
+        auto_vacuum=False,
+    ):
+        self._manager = TableManager(
+            meta_file, data_dir, flush_every, flush_interval, durability,
+            auto_vacuum,
+        )
+        self._statements = {}
+
+    @property
+    def manager(self):
+        """Менеджер таблиц соединения."""
+        if self._manager is None:
+            raise ProgrammingError(ERROR_CONNECTION_CLOSED)
+        return self._manager
+
+    @property
+    def in_transaction(self):
+        return self.manager.in_transaction
+
+    def prepare(self, query):
+        """Возвращает подготовленный запрос (из кэша, если он уже был)."""
+        statement = self._statements.get(query)
+        if statement is None:
+            # Таблицу могли создать или изменить другие процессы
+            self.manager.refresh()
+            statement = Statement(self, query)
+            if len(self._statements) >= STATEMENT_CACHE_SIZE:
+                del self._statements[next(iter(self._statements))]
+            self._statements[query] = statement
+        return statement
+
+    def execute(self, query, params=()):
+        """Выполняет запрос; params - значения параметров ? по порядку."""
+        return self.prepare(query).execute(params)
+
+    def executemany(self, query, seq_of_params):
+        """Выполняет insert, update или delete для каждого набора параметров."""
+        return self.prepare(query).executemany(seq_of_params)
+
+    def begin(self):
+        """Открывает явную транзакцию."""
+        try:
+            self.manager.begin()
+        except ValueError as e:
+            raise ProgrammingError(str(e)) from e
+
+    def commit(self):
+        """Фиксирует транзакцию. Возвращает число изменений."""
+        manager = self.manager
+        changes = manager.commit()
+        manager.operation_done()
+        manager.idle()
+        return changes
+
+    def rollback(self):
+        """Отменяет явную транзакцию. Возвращает число отмененных изменений."""
+        manager = self.manager
+        try:
+            changes = manager.rollback()
+        except ValueError as e:
+            raise ProgrammingError(str(e)) from e
+        manager.idle()
+        return changes
+
+    @contextmanager
+    def transaction(self):
+        """Блок with в транзакции: commit в конце, rollback при исключении."""
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            self.rollback()
+            raise
+        self.commit()
+
+    def flush(self):
+        """Контрольная точка: переносит изменения в файлы таблиц."""
+        self.manager.flush()
+
+    def vacuum(self, table_name):
+        """
+        Сжимает файлы таблицы, убирая удаленные и замененные версии строк.
+
+        Возвращает (мертвых строк убрано, байт до, байт после).
+        """
+        manager = self.manager
+        if table_name not in manager.metadata or table_name == SYSTEM_KEY:
+            raise ProgrammingError(ERROR_TABLE_NOT_FOUND.format(table_name))
+        manager.acquire_write()
+        try:
+            result = manager.vacuum(table_name)
+            manager.operation_done()
+            return result
+        except ValueError as e:
+            raise ProgrammingError(str(e)) from e
+        finally:
+            manager.idle()
+
+    def close(self):
+        """Записывает изменения и закрывает соединение."""
+        if self._manager is not None:
+            self._manager.close()
+            self._manager = None
+            self._statements.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def connect(
+    meta_file=META_FILE,
+    data_dir=DATA_DIR,
+    durability=DEFAULT_DURABILITY,
+    flush_every=FLUSH_EVERY_OPS,
+    flush_interval=FLUSH_INTERVAL,
+    auto_vacuum=False,
+):
+    """Открывает соединение с базой данных (метаданные и каталог данных)."""
+    return Connection(
+        meta_file, data_dir, durability, flush_every, flush_interval, auto_vacuum
+    )
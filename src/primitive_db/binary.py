@@ -0,0 +1,1057 @@
+#!/usr/bin/env python3
+
+import bisect
+import json
+import lzma
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from .columnar import (
+    BoolColumn, COLUMN_CLASSES, ColumnarTable, IntColumn, StrColumn,
+    _CONST_METHODS, _Column,
+    _take, all_rows_mask, mask_from_flags, mask_positions, tree_mask,
+)
+from . import parallel
+from .constants import (
+    DATA_DIR, ERROR_BINARY_FILE, LOG_INSERT, LOG_UPDATE, LOG_DELETE,
+    SCAN_CHUNK_SIZE, SEGMENT_ROWS,
+)
+from .decorators import log_phase
+from .expressions import tree_columns
+from .metrics import metrics
+from .storage import get_binary_path
+
+# Файл таблицы:
+#   заголовок      сигнатура, версия, порядок байт, число столбцов и строк
+#   карты зон      смещение и размер их JSON в файле (с версии 2)
+#   каталог        на каждый столбец: тип, ширина смещений строк, число
+#                  NULL, смещения его частей в файле, имя
+#   столбцы        карта NULL (байт на строку, только если NULL есть),
+#                  затем значения: int - int64 на строку, bool - байт на
+#                  строку, str - таблица смещений строк (uint32 или uint64,
+#                  строк + 1) и куча UTF-8
+#   JSON карт зон  строки делятся на сегменты по segment_rows; на каждый
+#                  сегмент - число строк и по каждому столбцу число NULL,
+#                  min и max (для bool еще число true)
+# Части столбцов выровнены по 8 байт, чтобы читаться прямо из mmap.
+# Файлы версии 1 (без карт зон) читаются как один сегмент без карты.
+#
+# Версия 3 - сжатый файл: в каталоге у столбца еще кодировка, способ
+# сжатия (zlib или lzma) и размер каждой части, а каждая часть сжата
+# целиком. Кодировки: bool - по биту на строку, str - словарь (JSON
+# различных значений в куче и коды строк int8/16/32, NULL - код -1)
+# или, если различных значений много, смещения и куча как в версии 2.
+MAGIC = b"PDBT"
+VERSION = 2
+PACKED_VERSION = 3
+VERSIONS = (1, 2, 3)
+HEADER = struct.Struct("<4sBBHQ")
+ZONES = struct.Struct("<QQ")
+COLUMN = struct.Struct("<BBHQQQQQ")
+PACKED_COLUMN = struct.Struct("<BBBBHQQQQQQQ")
+ALIGNMENT = 8
+OFFSET_TYPECODES = {4: 'I', 8: 'Q'}
+CODE_TYPECODES = {1: 'b', 2: 'h', 4: 'i'}
+
+TYPE_CODES = {int: 1, bool: 2, str: 3}
+CODE_TYPES = {code: python_type for python_type, code in TYPE_CODES.items()}
+BYTE_ORDERS = {"little": 0, "big": 1}
+
+# Кодировки столбцов сжатого файла
+PLAIN, DICTIONARY, BITS = 0, 1, 2
+CODECS = {"zlib": 1, "lzma": 2}
+COMPRESSORS = {1: zlib.compress, 2: lzma.compress}
+DECOMPRESSORS = {1: zlib.decompress, 2: lzma.decompress}
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _encode_column(python_type, values):
+    """
+    Кодирует значения столбца: (число NULL, карта NULL, значения, куча строк).
+
+    Карта NULL пуста, если NULL в столбце нет.
+    """
+    nulls = bytearray(value is None for value in values)
+    for value in values:
+        if value is not None and value.__class__ is not python_type:
+            raise ValueError(
+                f"Ожидалось {python_type.__name__}, получено: {value}"
+            )
+    null_count = nulls.count(1)
+    if not null_count:
+        nulls = b""
+
+    if python_type is int:
+        values = array('q', (value or 0 for value in values))
+        return null_count, nulls, values.tobytes(), b""
+    if python_type is bool:
+        return null_count, nulls, bytes(bool(value) for value in values), b""
+
+    heap = bytearray()
+    ends = []
+    for value in values:
+        if value is not None:
+            heap += value.encode('utf-8')
+        ends.append(len(heap))
+    typecode = 'I' if len(heap) < 2 ** 32 else 'Q'
+    return null_count, nulls, array(typecode, [0] + ends).tobytes(), heap
+
+
+def pack_bits(flags):
+    """Упаковывает байтовые флаги 0/1 по биту на строку."""
+    flags = bytes(flags) + bytes(-len(flags) % 8)
+    bits = 0
+    for bit in range(8):
+        bits |= int.from_bytes(flags[bit::8], 'little') << bit
+    return bits.to_bytes(len(flags) // 8, 'little')
+
+
+# Для каждого номера бита: байт -> значение этого бита (0/1)
+_BIT_TABLES = [bytes((byte >> bit) & 1 for byte in range(256)) for bit in range(8)]
+
+
+def unpack_bits(packed, rows):
+    """Обратно к pack_bits: байтовая карта 0/1 из rows строк."""
+    flags = bytearray(len(packed) * 8)
+    for bit, table in enumerate(_BIT_TABLES):
+        flags[bit::8] = packed.translate(table)
+    del flags[rows:]
+    return flags
+
+
+def _pack_column(python_type, values):
+    """
+    Кодирует значения столбца для сжатого файла.
+
+    Возвращает (кодировка, ширина, число NULL, [карта NULL, значения,
+    куча]); части еще не сжаты. Столбец str кодируется словарем, если
+    различных значений не больше половины строк.
+    """
+    null_count, nulls, plain, heap = _encode_column(python_type, values)
+    if python_type is bool:
+        return BITS, 0, null_count, [nulls, pack_bits(plain), b""]
+    if python_type is int:
+        return PLAIN, 0, null_count, [nulls, plain, heap]
+
+    dictionary = {}
+    for value in values:
+        if value is not None:
+            dictionary.setdefault(value, len(dictionary))
+    if len(dictionary) * 2 > len(values):
+        return PLAIN, len(plain) // (len(values) + 1), null_count, [nulls, plain, heap]
+
+    width = next(
+        width for width in CODE_TYPECODES if len(dictionary) <= 2 ** (8 * width - 1)
+    )
+    codes = array(CODE_TYPECODES[width], (
+        -1 if value is None else dictionary[value] for value in values
+    ))
+    heap = json.dumps(
+        list(dictionary), ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+    return DICTIONARY, width, null_count, [nulls, codes.tobytes(), heap]
+
+
+def _zone(python_type, values):
+    """Карта зоны столбца в сегменте: число NULL, min, max (для bool и true)."""
+    present = [value for value in values if value is not None]
+    zone = {
+        "nulls": len(values) - len(present),
+        "min": min(present, default=None),
+        "max": max(present, default=None),
+    }
+    if python_type is bool:
+        zone["true"] = sum(present)
+    return zone
+
+
+def _segment_zones(columns, rows, segment_rows):
+    """Карты зон сегментов по значениям столбцов [(тип, значения)]."""
+    segments = []
+    for start in range(0, rows, segment_rows):
+        stop = min(start + segment_rows, rows)
+        segments.append({
+            "rows": stop - start,
+            "columns": {
+                column: _zone(python_type, values[start:stop])
+                for column, python_type, values in columns
+            },
+        })
+    return {"segment_rows": segment_rows, "segments": segments}
+
+
+def _may_equal(zone, value):
+    if value is None:
+        return zone["nulls"] > 0
+    low = zone["min"]
+    if low is None:
+        return False
+    if value.__class__ is not low.__class__:
+        # Равенство разных типов (1 = true) сравнениями min/max не проверить
+        return True
+    return low <= value <= zone["max"]
+
+
+def zone_may_match(node, zones):
+    """
+    Может ли в сегменте найтись строка, удовлетворяющая условию node.
+
+    zones - карта зон сегмента {столбец: зона}. Ответ осторожный: False
+    только тогда, когда min/max и число NULL исключают совпадение; NOT и
+    столбцы без карты считаются возможным совпадением.
+    """
+    kind = node[0]
+    if kind == "and":
+        return zone_may_match(node[1], zones) and zone_may_match(node[2], zones)
+    if kind == "or":
+        return zone_may_match(node[1], zones) or zone_may_match(node[2], zones)
+    if kind == "not":
+        return True
+
+    zone = zones.get(node[1])
+    if zone is None:
+        return True
+    if kind == "in":
+        return any(_may_equal(zone, value) for value in node[2])
+
+    _, _, op, value = node
+    if op == "=":
+        return _may_equal(zone, value)
+    if op == "!=":
+        # NULL != значение истинно, поэтому нужны сегменты без NULL
+        return not (zone["nulls"] == 0 and zone["min"] == zone["max"] == value)
+
+    low, high = zone["min"], zone["max"]
+    if low is None or value.__class__ is not low.__class__:
+        return False
+    if op == "<":
+        return low < value
+    if op == "<=":
+        return low <= value
+    if op == ">":
+        return high > value
+    return high >= value
+
+
+def write_binary(table_name, records, column_types, data_dir=DATA_DIR,
+                 segment_rows=SEGMENT_ROWS, compression=None):
+    """
+    Записывает снимок таблицы в двоичный файл.
+
+    Все значения проверяются и кодируются до записи, поэтому при
+    несовпадении типа ValueError выбрасывается, а файл не создается.
+    Для каждого сегмента из segment_rows строк пишется карта зон.
+    С compression ("zlib" или "lzma") пишется сжатый файл версии 3.
+    Файл пишется во временный и атомарно подменяет старый.
+    """
+    records = list(records)
+    encoded = []
+    columns = []
+    for column, python_type in column_types.items():
+        values = [record.get(column) for record in records]
+        if compression is None:
+            null_count, nulls, data, heap = _encode_column(python_type, values)
+            width = len(data) // (len(records) + 1) if python_type is str else 0
+            encoded.append((column, python_type, PLAIN, width, null_count,
+                            [nulls, data, heap]))
+        else:
+            encoded.append((column, python_type, *_pack_column(python_type, values)))
+        columns.append((column, python_type, values))
+    zones = json.dumps(
+        _segment_zones(columns, len(records), segment_rows),
+        ensure_ascii=False, separators=(',', ':'),
+    ).encode('utf-8')
+
+    if compression is None:
+        version, entry = VERSION, COLUMN
+    else:
+        version, entry = PACKED_VERSION, PACKED_COLUMN
+        codec = CODECS[compression]
+        for *_, parts in encoded:
+            parts[:] = [COMPRESSORS[codec](part) if part else b"" for part in parts]
+
+    names = [column.encode('utf-8') for column, *_ in encoded]
+    offset = _aligned(
+        HEADER.size + ZONES.size + sum(entry.size + len(name) for name in names)
+    )
+    directory = [HEADER.pack(
+        MAGIC, version, BYTE_ORDERS[sys.byteorder], len(encoded), len(records)
+    ), None]
+    sections = []
+    for name, column in zip(names, encoded):
+        _, python_type, encoding, width, null_count, parts = column
+        offsets = []
+        for data in parts:
+            offsets.append(offset)
+            offset = _aligned(offset + len(data))
+        if compression is None:
+            nulls, _, heap = parts
+            directory.append(COLUMN.pack(
+                TYPE_CODES[python_type], width, len(name), null_count,
+                offsets[0] if nulls else 0, offsets[1], offsets[2], len(heap),
+            ) + name)
+        else:
+            directory.append(PACKED_COLUMN.pack(
+                TYPE_CODES[python_type], encoding, codec, width, len(name),
+                null_count, *(
+                    field for part_offset, data in zip(offsets, parts)
+                    for field in (part_offset, len(data))
+                ),
+            ) + name)
+        sections.append(list(zip(offsets, parts)))
+    directory[1] = ZONES.pack(offset, len(zones))
+    sections.append([(offset, zones)])
+    offset = _aligned(offset + len(zones))
+
+    os.makedirs(data_dir, exist_ok=True)
+    filepath = get_binary_path(table_name, data_dir)
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(b"".join(directory))
+        for parts in sections:
+            for part_offset, data in parts:
+                file.write(b"\0" * (part_offset - file.tell()))
+                file.write(data)
+        file.write(b"\0" * (offset - file.tell()))
+        file.flush()
+        os.fsync(file.fileno())
+        written = file.tell()
+
+    os.replace(tmp_path, filepath)
+    if metrics.enabled:
+        metrics.inc("bytes_written_total", written, phase="save")
+
+
+class _MappedColumn:
+    """
+    Общая часть столбцов, читаемых прямо из отображенного файла.
+
+    Значения не раскодируются при загрузке: чтение столбца или строки
+    обращается к страницам файла. Перед первым изменением столбец
+    копируется в обычный столбец в памяти (thaw).
+    """
+
+    def take(self, positions):
+        values = self._take_values(positions)
+        if self.null_count:
+            nulls = _take(self.nulls, positions)
+            values = [None if null else value for value, null in zip(values, nulls)]
+        return values
+
+
+def _view(buffer, offset, size, typecode, swap):
+    """Массив из файла без копирования (или копия, если порядок байт чужой)."""
+    view = buffer[offset:offset + size]
+    if not swap:
+        return view.cast(typecode)
+    values = array(typecode)
+    values.frombytes(view)
+    values.byteswap()
+    return values
+
+
+class MappedIntColumn(_MappedColumn, IntColumn):
+    """Столбец int: int64 прямо из файла."""
+
+    def __init__(self, nulls, values, null_count):
+        self.nulls = nulls
+        self.values = values
+        self.null_count = null_count
+
+    def thaw(self):
+        column = IntColumn()
+        column.values.frombytes(memoryview(self.values).cast('B'))
+        column.nulls = bytearray(self.nulls)
+        return column
+
+
+class MappedBoolColumn(_MappedColumn, BoolColumn):
+    """Столбец bool: байт на строку прямо из файла."""
+
+    def __init__(self, nulls, values, null_count):
+        self.nulls = nulls
+        self.values = values
+        self.null_count = null_count
+
+    def thaw(self):
+        column = BoolColumn()
+        column.values = bytearray(self.values)
+        column.nulls = bytearray(self.nulls)
+        return column
+
+
+class MappedStrColumn(_MappedColumn, _Column):
+    """
+    Столбец str: таблица смещений и куча UTF-8 в файле.
+
+    Раскодируются только прочитанные строки. Условия проверяются по
+    байтам: порядок байт UTF-8 совпадает с порядком строк Python, а
+    равенство ищется в куче через find без просмотра каждой строки.
+    """
+
+    python_type = str
+
+    def __init__(self, nulls, offsets, buffer, heap_offset, heap_size, null_count):
+        self.nulls = nulls
+        self.offsets = offsets
+        self.buffer = buffer
+        self.heap_offset = heap_offset
+        self.heap_end = heap_offset + heap_size
+        self.null_count = null_count
+
+    def segment(self, start, stop):
+        # Смещения остаются относительно начала кучи, сужается только её часть
+        offsets = self.offsets[start:stop + 1]
+        return MappedStrColumn(
+            self.nulls[start:stop], offsets, self.buffer, self.heap_offset,
+            offsets[-1], self.null_count,
+        )
+
+    def _bytes(self, position):
+        start = self.heap_offset + self.offsets[position]
+        return self.buffer[start:self.heap_offset + self.offsets[position + 1]]
+
+    def get(self, position):
+        if self.nulls[position]:
+            return None
+        return self._bytes(position).decode('utf-8')
+
+    def _take_values(self, positions):
+        # NULL раскодируется в пустую строку, его подменяет take
+        get_offset = self.offsets.__getitem__
+        base = self.heap_offset
+        starts = map(base.__add__, map(get_offset, positions))
+        ends = map(base.__add__, map(get_offset, map((1).__add__, positions)))
+        chunks = map(self.buffer.__getitem__, map(slice, starts, ends))
+        return list(map(bytes.decode, chunks))
+
+    def _all_bytes(self):
+        # Срезы mmap - это bytes, сравнение идет без раскодирования
+        base = self.heap_offset
+        starts = map(base.__add__, self.offsets[:-1])
+        ends = map(base.__add__, self.offsets[1:])
+        return map(self.buffer.__getitem__, map(slice, starts, ends))
+
+    def _equal_mask(self, value):
+        target = value.encode('utf-8')
+        if not target:
+            flags = bytes(map(target.__eq__, self._all_bytes()))
+            return mask_from_flags(flags) & self.not_null_mask(len(self))
+
+        # Вхождение в кучу - совпадение, если оно ровно от начала до конца строки
+        flags = bytearray(len(self))
+        start = self.heap_offset + self.offsets[0]
+        while True:
+            found = self.buffer.find(target, start, self.heap_end)
+            if found < 0:
+                break
+            relative = found - self.heap_offset
+            # Последняя строка, начинающаяся не позже вхождения: пустые
+            # строки и NULL перед ней начинаются с того же смещения
+            position = bisect.bisect_right(self.offsets, relative) - 1
+            if (
+                position < len(flags)
+                and self.offsets[position] == relative
+                and self.offsets[position + 1] == relative + len(target)
+            ):
+                flags[position] = 1
+            start = found + 1
+        return mask_from_flags(flags)
+
+    def compare(self, op, const):
+        if op in ("=", "!="):
+            equal = self._equal_mask(const) if isinstance(const, str) else 0
+            return equal if op == "=" else all_rows_mask(len(self)) ^ equal
+
+        if const.__class__ is not str:
+            return 0
+
+        method = getattr(const.encode('utf-8'), _CONST_METHODS[op])
+        flags = bytes(map(method, self._all_bytes()))
+        return mask_from_flags(flags) & self.not_null_mask(len(self))
+
+    def contains(self, values):
+        mask = 0
+        for value in set(values):
+            if isinstance(value, str):
+                mask |= self._equal_mask(value)
+        return mask
+
+    def thaw(self):
+        column = StrColumn()
+        for position in range(len(self)):
+            column.append(self.get(position))
+        return column
+
+
+class PackedColumn(_MappedColumn):
+    """
+    Столбец сжатого файла (версия 3).
+
+    Части столбца распаковываются при первом обращении к нему, дальше
+    он работает как столбец в памяти: int - IntColumn, bool - BoolColumn,
+    str со словарем - StrColumn, где условия сравнивают коды словаря без
+    раскодирования строк, str без словаря - MappedStrColumn поверх
+    распакованной кучи.
+    """
+
+    def __init__(self, python_type, encoding, codec, width, rows, null_count,
+                 buffer, parts, swap):
+        self.python_type = python_type
+        self.encoding = encoding
+        self.codec = codec
+        self.width = width
+        self.rows = rows
+        self.null_count = null_count
+        self.buffer = buffer
+        # [(смещение, размер)] сжатых карты NULL, значений и кучи
+        self.parts = parts
+        self.swap = swap
+        self._column = None
+
+    def __len__(self):
+        return self.rows
+
+    def _part(self, number):
+        offset, size = self.parts[number]
+        if not size:
+            return b""
+        if metrics.enabled:
+            metrics.inc("bytes_read_total", size, phase="load")
+        return DECOMPRESSORS[self.codec](self.buffer[offset:offset + size])
+
+    def _array(self, typecode, data):
+        values = array(typecode)
+        values.frombytes(data)
+        if self.swap:
+            values.byteswap()
+        return values
+
+    def _unpack(self):
+        if self.null_count:
+            nulls = bytearray(self._part(0))
+        else:
+            nulls = bytearray(self.rows)
+        values, heap = self._part(1), self._part(2)
+        if self.python_type is int:
+            column = IntColumn()
+            column.values = self._array('q', values)
+        elif self.python_type is bool:
+            column = BoolColumn()
+            column.values = unpack_bits(values, self.rows)
+        elif self.encoding == DICTIONARY:
+            column = StrColumn()
+            column.codes = array('l', self._array(
+                CODE_TYPECODES[self.width], values
+            ))
+            column.dictionary = json.loads(heap.decode('utf-8'))
+            column.lookup = {
+                value: code for code, value in enumerate(column.dictionary)
+            }
+        else:
+            offsets = self._array(OFFSET_TYPECODES[self.width], values)
+            return MappedStrColumn(
+                nulls, offsets, heap, 0, len(heap), self.null_count
+            )
+        column.nulls = nulls
+        return column
+
+    @property
+    def column(self):
+        """Распакованный столбец."""
+        if self._column is None:
+            self._column = self._unpack()
+        return self._column
+
+    @property
+    def values(self):
+        return self.column.values
+
+    @property
+    def nulls(self):
+        return self.column.nulls
+
+    def get(self, position):
+        return self.column.get(position)
+
+    def take(self, positions):
+        return self.column.take(positions)
+
+    def not_null_mask(self, count):
+        return self.column.not_null_mask(count)
+
+    def compare(self, op, const):
+        return self.column.compare(op, const)
+
+    def contains(self, values):
+        return self.column.contains(values)
+
+    def segment(self, start, stop):
+        return self.column.segment(start, stop)
+
+    def thaw(self):
+        column = self.column
+        return column.thaw() if isinstance(column, _MappedColumn) else column
+
+
+class TailedColumn(_MappedColumn):
+    """
+    Столбец файла и строки, добавленные после снимка.
+
+    Строки файла по-прежнему читаются из него (head), добавленные
+    хранятся в обычном столбце в памяти (tail): вставка не копирует
+    столбец файла в память. Маски условий склеиваются из масок обеих
+    частей.
+    """
+
+    def __init__(self, head, tail=None):
+        self.head = head
+        self.rows = len(head)
+        self.python_type = head.python_type
+        self.tail = tail if tail is not None else COLUMN_CLASSES[self.python_type]()
+
+    def __len__(self):
+        return self.rows + len(self.tail)
+
+    def append(self, value):
+        self.tail.append(value)
+
+    def get(self, position):
+        if position < self.rows:
+            return self.head.get(position)
+        return self.tail.get(position - self.rows)
+
+    def take(self, positions):
+        rows = self.rows
+        if not positions or max(positions) < rows:
+            return self.head.take(positions)
+        head = iter(self.head.take([position for position in positions
+                                    if position < rows]))
+        tail = iter(self.tail.take([position - rows for position in positions
+                                    if position >= rows]))
+        return [
+            next(head) if position < rows else next(tail) for position in positions
+        ]
+
+    def compare(self, op, const):
+        # Байт маски на строку: маска хвоста сдвигается за строки файла
+        return (
+            self.head.compare(op, const)
+            | self.tail.compare(op, const) << 8 * self.rows
+        )
+
+    def contains(self, values):
+        return self.head.contains(values) | self.tail.contains(values) << 8 * self.rows
+
+    def segment(self, start, stop):
+        rows = self.rows
+        if stop <= rows:
+            return self.head.segment(start, stop)
+        if start >= rows:
+            return self.tail.segment(start - rows, stop - rows)
+        return TailedColumn(
+            self.head.segment(start, rows), self.tail.segment(0, stop - rows)
+        )
+
+    def thaw(self):
+        column = self.head.thaw()
+        for position in range(len(self.tail)):
+            column.append(self.tail.get(position))
+        return column
+
+
+def _read_zones(buffer, offset, size, rows):
+    """Карты зон из файла: [(первая строка, конец, {столбец: зона})]."""
+    zones = json.loads(bytes(buffer[offset:offset + size]).decode('utf-8'))
+    segments = []
+    start = 0
+    for segment in zones["segments"]:
+        segments.append((start, start + segment["rows"], segment["columns"]))
+        start += segment["rows"]
+    if start != rows:
+        raise ValueError("Карты зон не совпадают с числом строк файла.")
+    return segments, zones["segment_rows"]
+
+
+def _read_columns(buffer, path):
+    """
+    Разбирает заголовок и каталог файла.
+
+    Возвращает ({столбец: столбец из mmap}, строк, карты зон сегментов,
+    строк в сегменте).
+    """
+    try:
+        magic, version, byte_order, column_count, rows = HEADER.unpack_from(buffer)
+    except struct.error:
+        raise ValueError(ERROR_BINARY_FILE.format(path))
+    if magic != MAGIC or version not in VERSIONS:
+        raise ValueError(ERROR_BINARY_FILE.format(path))
+
+    swap = byte_order != BYTE_ORDERS[sys.byteorder]
+    view = memoryview(buffer)
+    columns = {}
+    offset = HEADER.size
+    zones, segment_rows, zones_size = [], SEGMENT_ROWS, 0
+    if version >= 2:
+        zones_offset, zones_size = ZONES.unpack_from(buffer, offset)
+        offset += ZONES.size
+        zones, segment_rows = _read_zones(buffer, zones_offset, zones_size, rows)
+    for _ in range(column_count):
+        if version >= PACKED_VERSION:
+            (code, encoding, codec, width, name_size, null_count,
+             *sizes) = PACKED_COLUMN.unpack_from(buffer, offset)
+            offset += PACKED_COLUMN.size
+            name = bytes(buffer[offset:offset + name_size]).decode('utf-8')
+            offset += name_size
+            if codec not in DECOMPRESSORS:
+                raise ValueError(ERROR_BINARY_FILE.format(path))
+            columns[name] = PackedColumn(
+                CODE_TYPES[code], encoding, codec, width, rows, null_count,
+                buffer, list(zip(sizes[::2], sizes[1::2])), swap,
+            )
+            continue
+
+        (code, width, name_size, null_count, nulls_offset, values_offset,
+         heap_offset, heap_size) = COLUMN.unpack_from(buffer, offset)
+        offset += COLUMN.size
+        name = bytes(buffer[offset:offset + name_size]).decode('utf-8')
+        offset += name_size
+
+        python_type = CODE_TYPES[code]
+        if null_count:
+            nulls = view[nulls_offset:nulls_offset + rows]
+        else:
+            nulls = bytes(rows)
+        if python_type is str:
+            offsets = _view(
+                view, values_offset, (rows + 1) * width,
+                OFFSET_TYPECODES[width], swap,
+            )
+            columns[name] = MappedStrColumn(
+                nulls, offsets, buffer, heap_offset, heap_size, null_count
+            )
+        elif python_type is int:
+            values = _view(view, values_offset, rows * 8, 'q', swap)
+            columns[name] = MappedIntColumn(nulls, values, null_count)
+        else:
+            values = view[values_offset:values_offset + rows]
+            columns[name] = MappedBoolColumn(nulls, values, null_count)
+
+    if metrics.enabled:
+        metrics.inc("bytes_read_total", offset + zones_size, phase="load")
+    return columns, rows, zones, segment_rows
+
+
+def _segment_positions(columns, tree, start, stop, alive):
+    """Номера живых строк start..stop-1, удовлетворяющих условию tree."""
+    count = stop - start
+    if tree is None:
+        mask = mask_from_flags(alive)
+    else:
+        names = tree_columns(tree)
+        views = {
+            column: values.segment(start, stop)
+            for column, values in columns.items() if column in names
+        }
+        mask = tree_mask(views, tree, count) & mask_from_flags(alive)
+    return list(map(start.__add__, mask_positions(mask, count)))
+
+
+# Файлы, отображенные процессом пула: {путь: (версия файла, столбцы)}
+_worker_files = {}
+
+
+def _worker_columns(path):
+    stat = os.stat(path)
+    version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = _worker_files.get(path)
+    if cached is None or cached[0] != version:
+        if len(_worker_files) >= 16:
+            _worker_files.clear()
+        with open(path, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        cached = _worker_files[path] = (version, _read_columns(buffer, path)[0])
+    return cached[1]
+
+
+def scan_segment(task):
+    """
+    Просматривает сегмент файла в процессе пула.
+
+    task - (путь, начало, конец, карта живых строк сегмента, дерево
+    условия или None, нужные столбцы или None, свертка или None).
+    Возвращает подходящие записи сегмента или свертку reduce(записи).
+    """
+    path, start, stop, alive, tree, columns, reduce = task
+    file_columns = _worker_columns(path)
+    positions = _segment_positions(file_columns, tree, start, stop, alive)
+    names = [
+        name for name in file_columns if columns is None or name in columns
+    ]
+    value_lists = [file_columns[name].take(positions) for name in names]
+    rows = [dict(zip(names, values)) for values in zip(*value_lists)]
+    return rows if reduce is None else reduce(rows)
+
+
+class BinaryTable(ColumnarTable):
+    """
+    Колоночная таблица поверх двоичного файла, отображенного в память.
+
+    При загрузке читаются только заголовок, каталог и столбец ID для
+    первичного ключа; остальные столбцы раскодируются, лишь когда
+    запрос их касается, и только в нужных строках. Изменения после
+    снимка (журнал таблицы) применяются поверх: измененные столбцы
+    копируются в память, остальные продолжают читаться из файла, а
+    добавленные строки ложатся в хвосты столбцов в памяти (TailedColumn).
+    Столбцы сжатого файла (версия 3) вместо чтения из mmap распаковываются
+    целиком при первом обращении.
+
+    Просмотр по WHERE идет сегментами файла: сегмент, карта зон которого
+    исключает совпадение, пропускается целиком. Изменение строки снимка
+    помечает её сегмент, и его карта зон больше не используется; строки,
+    добавленные после снимка, просматриваются всегда.
+
+    Большой просмотр (см. parallel) делится по сегментам между
+    процессами пула: каждый отображает тот же файл, проверяет условие,
+    собирает нужные столбцы и, для агрегатов, частичные итоги.
+    Измененные сегменты и добавленные строки просматривает этот процесс.
+    """
+
+    def __init__(self, name, path, column_types=None):
+        with open(path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        self.name = name
+        self.columns, rows, self.zones, self.segment_rows = _read_columns(
+            self.buffer, path
+        )
+        self.changed_segments = set()
+        self.column_types = dict(column_types or {
+            column: values.python_type for column, values in self.columns.items()
+        })
+        self.indexes = {}
+        self.alive = bytearray(b'\x01' * rows)
+        self.by_id = dict(zip(self.columns['ID'].values, range(rows)))
+
+    @property
+    def mapped_columns(self):
+        """Столбцы, которые еще читаются прямо из файла."""
+        return [
+            column for column, values in self.columns.items()
+            if isinstance(values, _MappedColumn)
+        ]
+
+    def _thaw(self, columns=None):
+        for column in columns if columns is not None else list(self.columns):
+            values = self.columns.get(column)
+            if isinstance(values, _MappedColumn):
+                self.columns[column] = values.thaw()
+
+    def append(self, record):
+        """Добавляет запись; при повторе ID заменяет прежнюю версию строки."""
+        # Столбцы файла остаются в нем, новые строки ложатся в хвост в памяти
+        for column, values in self.columns.items():
+            if isinstance(values, _MappedColumn) and not isinstance(
+                values, TailedColumn
+            ):
+                self.columns[column] = TailedColumn(values)
+        old_position = self.by_id.get(record.get('ID'))
+        if old_position is not None:
+            self.alive[old_position] = 0
+        super().append(record)
+
+    def update_record(self, record, changes):
+        self._thaw(changes)
+        position = self.by_id[record.get('ID')]
+        if position < self._zones_end():
+            self.changed_segments.add(position // self.segment_rows)
+        super().update_record(record, changes)
+
+    def _compact(self):
+        self._thaw()
+        super()._compact()
+        # Номера строк сдвинулись: сегменты файла больше не совпадают с ними
+        self.zones = []
+        self.changed_segments = set()
+
+    def clear(self):
+        """Удаляет все записи; дальше таблица живет только в памяти."""
+        ColumnarTable.__init__(self, self.name, column_types=self.column_types)
+        self.zones = []
+        self.changed_segments = set()
+
+    def _zones_end(self):
+        return self.zones[-1][1] if self.zones else 0
+
+    def segments(self, where_clause):
+        """
+        Диапазоны строк [(начало, конец)], которые нужно просмотреть для
+        WHERE, и число сегментов, пропущенных по картам зон.
+        """
+        ranges = []
+        skipped = 0
+        for number, (start, stop, zones) in enumerate(self.zones):
+            if (
+                where_clause is None
+                or number in self.changed_segments
+                or zone_may_match(where_clause.tree, zones)
+            ):
+                ranges.append((start, stop))
+            else:
+                skipped += 1
+        end = self._zones_end()
+        if end < len(self.alive):
+            ranges.append((end, len(self.alive)))
+        return ranges, skipped
+
+    def _scan(self, where_clause):
+        """Номера подходящих строк: маска условия считается по сегментам."""
+        ranges, skipped = self.segments(where_clause)
+        if metrics.enabled:
+            metrics.inc("segments_skipped_total", skipped, table=self.name)
+        for start, stop in ranges:
+            if metrics.enabled:
+                metrics.inc(
+                    "rows_scanned_total", self.alive.count(1, start, stop),
+                    table=self.name,
+                )
+            yield from _segment_positions(
+                self.columns, where_clause.tree, start, stop, self.alive[start:stop]
+            )
+
+    def _uses_segments(self, where_clause):
+        return (
+            where_clause is not None
+            and self.access_path(where_clause)[0] == "scan"
+        )
+
+    def parallel_segments(self, where_clause):
+        """
+        Диапазоны строк для параллельного просмотра и число процессов,
+        или None, если просмотр короткий или идет по первичному ключу.
+        """
+        if where_clause is not None and not self._uses_segments(where_clause):
+            return None
+        ranges, skipped = self.segments(where_clause)
+        rows = sum(self.alive.count(1, start, stop) for start, stop in ranges)
+        workers = parallel.scan_workers(rows)
+        if not workers:
+            return None
+        return ranges, skipped, workers
+
+    def _iter_parallel(self, where_clause, columns=None, reduce=None):
+        """
+        Выдает части выборки по сегментам в порядке строк, или None, если
+        параллельный просмотр не нужен. С reduce вместо записей каждого
+        сегмента выдается reduce(записи).
+        """
+        plan = self.parallel_segments(where_clause)
+        if plan is None:
+            return None
+        ranges, skipped, _ = plan
+        if metrics.enabled:
+            metrics.inc("segments_skipped_total", skipped, table=self.name)
+        tree = where_clause.tree if where_clause is not None else None
+        columns = set(columns) if columns is not None else None
+        return self._parallel_chunks(ranges, tree, columns, reduce)
+
+    def _parallel_chunks(self, ranges, tree, columns, reduce):
+        end = self._zones_end()
+        here = [
+            stop > end or start // self.segment_rows in self.changed_segments
+            for start, stop in ranges
+        ]
+        tasks = (
+            (self.path, start, stop, bytes(self.alive[start:stop]), tree,
+             columns, reduce)
+            for (start, stop), local in zip(ranges, here) if not local
+        )
+        results = parallel.map_ordered(scan_segment, tasks)
+        try:
+            for (start, stop), local in zip(ranges, here):
+                if metrics.enabled:
+                    metrics.inc(
+                        "rows_scanned_total", self.alive.count(1, start, stop),
+                        table=self.name,
+                    )
+                with metrics.timer("phase_seconds", phase="filter"):
+                    if local:
+                        rows = self._rows(_segment_positions(
+                            self.columns, tree, start, stop, self.alive[start:stop]
+                        ), columns)
+                        result = rows if reduce is None else reduce(rows)
+                    else:
+                        result = next(results)
+                if reduce is not None:
+                    yield result
+                    continue
+                for offset in range(0, len(result), SCAN_CHUNK_SIZE):
+                    yield result[offset:offset + SCAN_CHUNK_SIZE]
+        finally:
+            results.close()
+
+    def filter(self, where_clause):
+        """Возвращает записи, удовлетворяющие условию (с пропуском сегментов)."""
+        chunks = self._iter_parallel(where_clause)
+        if chunks is not None:
+            return [row for chunk in chunks for row in chunk]
+        if not self._uses_segments(where_clause):
+            return super().filter(where_clause)
+        return [
+            row for chunk in self._iter_positions(self._scan(where_clause), None)
+            for row in chunk
+        ]
+
+    def iter_filter(self, where_clause, columns=None):
+        """Как у ColumnarTable, но просмотр пропускает исключенные сегменты."""
+        chunks = self._iter_parallel(where_clause, columns)
+        if chunks is not None:
+            return chunks
+        if not self._uses_segments(where_clause):
+            return super().iter_filter(where_clause, columns)
+        return self._iter_positions(self._scan(where_clause), columns)
+
+    def iter_reduce(self, where_clause, columns, reduce):
+        """
+        Выдает reduce(часть выборки) по частям; в большом просмотре
+        свертку (частичные агрегаты) считают процессы пула.
+        """
+        chunks = self._iter_parallel(where_clause, columns, reduce)
+        if chunks is not None:
+            return chunks
+        return map(reduce, self.iter_filter(where_clause, columns))
+
+    def estimate(self, where_clause):
+        """Число живых строк в сегментах, которые придется просмотреть."""
+        if not self._uses_segments(where_clause):
+            return super().estimate(where_clause)
+        ranges, _ = self.segments(where_clause)
+        return sum(self.alive.count(1, start, stop) for start, stop in ranges)
+
+    def apply_entries(self, entries):
+        """Применяет записи журнала таблицы, сделанные после снимка."""
+        for entry in entries:
+            op = entry.get("op")
+            if op == LOG_INSERT:
+                self.append(entry["row"])
+            elif op == LOG_UPDATE:
+                for record_id in entry["ids"]:
+                    position = self.by_id.get(record_id)
+                    if position is not None:
+                        self.update_record(self._row(position), entry["set"])
+            elif op == LOG_DELETE:
+                self.remove_records({'ID': record_id} for record_id in entry["ids"])
+            else:
+                raise ValueError(f"Неизвестная операция в журнале: {op}")
+
+
+@log_phase("load")
+def load_binary_table(name, table_file, column_types=None, data_dir=DATA_DIR):
+    """Открывает двоичный файл таблицы (без журнала изменений)."""
+    return BinaryTable(name, get_binary_path(table_file, data_dir), column_types)
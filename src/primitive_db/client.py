@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import queue
+import socket
+from contextlib import contextmanager
+from .constants import SERVER_HOST
+
+
+class Connection:
+    """Соединение с сервером базы данных."""
+
+    def __init__(self, port, host=SERVER_HOST, timeout=None):
+        self._socket = socket.create_connection((host, port), timeout=timeout)
+        self._file = self._socket.makefile('rb')
+
+    def _send(self, commands):
+        data = "".join(command.replace("\n", " ") + "\n" for command in commands)
+        self._socket.sendall(data.encode('utf-8'))
+
+    def _receive(self):
+        header = self._file.readline()
+        if not header:
+            raise ConnectionError("Сервер закрыл соединение.")
+        body = self._file.read(int(header))
+        return body.decode('utf-8')
+
+    def execute(self, command):
+        """Выполняет команду и возвращает её вывод."""
+        self._send([command])
+        return self._receive()
+
+    def pipeline(self, commands):
+        """
+        Отправляет все команды сразу и затем читает ответы.
+
+        Возвращает выводы в порядке команд; ожидание сети не повторяется
+        на каждую команду.
+        """
+        commands = list(commands)
+        self._send(commands)
+        return [self._receive() for _ in commands]
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Пул соединений для многопоточных клиентов.
+
+    Соединения создаются по требованию, но не больше size одновременно;
+    освобожденные соединения используются повторно.
+    """
+
+    def __init__(self, port, host=SERVER_HOST, size=4, timeout=None):
+        self.port = port
+        self.host = host
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = queue.Queue()
+        for _ in range(size):
+            self._slots.put(None)
+
+    @contextmanager
+    def connection(self):
+        """Выдает соединение из пула на время блока with."""
+        self._slots.get()
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                connection = Connection(self.port, self.host, self.timeout)
+            except OSError:
+                self._slots.put(None)
+                raise
+
+        try:
+            yield connection
+        except OSError:
+            # Сломанное соединение в пул не возвращаем
+            connection.close()
+            connection = None
+            raise
+        finally:
+            if connection is not None:
+                self._idle.put(connection)
+            self._slots.put(None)
+
+    def execute(self, command):
+        """Выполняет команду на свободном соединении."""
+        with self.connection() as connection:
+            return connection.execute(command)
+
+    def pipeline(self, commands):
+        """Выполняет команды конвейером на одном соединении."""
+        with self.connection() as connection:
+            return connection.pipeline(commands)
+
+    def close(self):
+        """Закрывает простаивающие соединения."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
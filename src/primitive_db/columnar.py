@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+
+from array import array
+from itertools import compress, islice
+from operator import itemgetter
+from .constants import SCAN_CHUNK_SIZE
+from .decorators import log_phase
+from .metrics import metrics
+from .table import iter_matching
+
+# Сравнение "значение op константа" через метод константы:
+# value > const  <=>  const < value  <=>  const.__lt__(value)
+_CONST_METHODS = {
+    "=": "__eq__",
+    "!=": "__ne__",
+    "<": "__gt__",
+    "<=": "__ge__",
+    ">": "__lt__",
+    ">=": "__le__",
+}
+
+
+def mask_from_flags(flags):
+    """
+    Переводит байтовые флаги (0/1 на строку) в маску-целое.
+
+    В маске каждой строке соответствует один байт, поэтому AND, OR и NOT
+    над масками выполняются целиком побитовыми операциями над int.
+    """
+    return int.from_bytes(flags, 'little')
+
+
+def all_rows_mask(count):
+    """Маска, в которой выбраны все строки."""
+    return mask_from_flags(b'\x01' * count)
+
+
+def mask_positions(mask, count):
+    """Возвращает номера строк, выбранных маской."""
+    return compress(range(count), mask.to_bytes(count, 'little'))
+
+
+def _take(values, positions):
+    """Выбирает элементы по номерам без цикла на Python."""
+    if not positions:
+        return []
+    if len(positions) == 1:
+        return [values[positions[0]]]
+    return list(itemgetter(*positions)(values))
+
+
+class _Column:
+    """Общая часть столбцов: битовая карта NULL и поэлементный запасной путь."""
+
+    def __init__(self):
+        self.nulls = bytearray()
+
+    def __len__(self):
+        return len(self.nulls)
+
+    def take(self, positions):
+        """Возвращает значения столбца для списка номеров строк."""
+        values = self._take_values(positions)
+        if 1 in self.nulls:
+            nulls = _take(self.nulls, positions)
+            values = [None if null else value for value, null in zip(values, nulls)]
+        return values
+
+    def not_null_mask(self, count):
+        return all_rows_mask(count) ^ mask_from_flags(self.nulls)
+
+    def generic_mask(self, op, const):
+        """Поэлементная проверка с той же семантикой, что у предиката строки."""
+        def check(position):
+            value = self.get(position)
+            if op == "=":
+                return value == const
+            if op == "!=":
+                return value != const
+            if value is None or value.__class__ is not const.__class__:
+                return False
+            return getattr(const, _CONST_METHODS[op])(value) is True
+
+        return mask_from_flags(bytes(map(check, range(len(self)))))
+
+    def compare(self, op, const):
+        return self.generic_mask(op, const)
+
+    def contains(self, values):
+        mask = 0
+        for value in values:
+            mask |= self.compare("=", value)
+        return mask
+
+
+class IntColumn(_Column):
+    """Столбец int в array('q')."""
+
+    python_type = int
+
+    def __init__(self):
+        super().__init__()
+        self.values = array('q')
+
+    def append(self, value):
+        if value is None:
+            self.values.append(0)
+            self.nulls.append(1)
+            return
+        if value.__class__ is not int:
+            raise ValueError(f"Ожидалось int, получено: {value}")
+        self.values.append(value)
+        self.nulls.append(0)
+
+    def get(self, position):
+        return None if self.nulls[position] else self.values[position]
+
+    def _take_values(self, positions):
+        return _take(self.values, positions)
+
+    def set(self, position, value):
+        if value is None:
+            self.values[position] = 0
+            self.nulls[position] = 1
+            return
+        if value.__class__ is not int:
+            raise ValueError(f"Ожидалось int, получено: {value}")
+        self.values[position] = value
+        self.nulls[position] = 0
+
+    def compare(self, op, const):
+        count = len(self)
+        if op in ("=", "!=") and isinstance(const, int):
+            method = getattr(int(const), "__eq__")
+            equal = mask_from_flags(bytes(map(method, self.values)))
+            equal &= self.not_null_mask(count)
+            return equal if op == "=" else all_rows_mask(count) ^ equal
+
+        if op in ("=", "!="):
+            return 0 if op == "=" else all_rows_mask(count)
+
+        if const.__class__ is not int:
+            return 0
+
+        method = getattr(const, _CONST_METHODS[op])
+        flags = bytes(map(method, self.values))
+        return mask_from_flags(flags) & self.not_null_mask(count)
+
+    def contains(self, values):
+        wanted = frozenset(value for value in values if isinstance(value, int))
+        flags = bytes(map(wanted.__contains__, self.values))
+        return mask_from_flags(flags) & self.not_null_mask(len(self))
+
+    def segment(self, start, stop):
+        """Столбец из строк start..stop-1 (для проверки условия по сегменту)."""
+        column = IntColumn()
+        column.values = self.values[start:stop]
+        column.nulls = self.nulls[start:stop]
+        return column
+
+    def compact(self, positions):
+        self.values = array('q', (self.values[i] for i in positions))
+        self.nulls = bytearray(self.nulls[i] for i in positions)
+
+
+class BoolColumn(_Column):
+    """Столбец bool в виде байтовой карты 0/1."""
+
+    python_type = bool
+
+    def __init__(self):
+        super().__init__()
+        self.values = bytearray()
+
+    def append(self, value):
+        if value is None:
+            self.values.append(0)
+            self.nulls.append(1)
+            return
+        if value.__class__ is not bool:
+            raise ValueError(f"Ожидалось bool, получено: {value}")
+        self.values.append(value)
+        self.nulls.append(0)
+
+    def get(self, position):
+        return None if self.nulls[position] else bool(self.values[position])
+
+    def _take_values(self, positions):
+        return list(map(bool, _take(self.values, positions)))
+
+    def set(self, position, value):
+        if value is None:
+            self.values[position] = 0
+            self.nulls[position] = 1
+            return
+        if value.__class__ is not bool:
+            raise ValueError(f"Ожидалось bool, получено: {value}")
+        self.values[position] = value
+        self.nulls[position] = 0
+
+    def compare(self, op, const):
+        if op not in ("=", "!="):
+            return self.generic_mask(op, const)
+
+        count = len(self)
+        true_mask = mask_from_flags(self.values)
+        if const == 1:
+            equal = true_mask
+        elif const == 0 and not isinstance(const, str):
+            equal = true_mask ^ self.not_null_mask(count)
+        else:
+            equal = 0
+        return equal if op == "=" else all_rows_mask(count) ^ equal
+
+    def segment(self, start, stop):
+        column = BoolColumn()
+        column.values = self.values[start:stop]
+        column.nulls = self.nulls[start:stop]
+        return column
+
+    def compact(self, positions):
+        self.values = bytearray(self.values[i] for i in positions)
+        self.nulls = bytearray(self.nulls[i] for i in positions)
+
+
+class StrColumn(_Column):
+    """Столбец str со словарным кодированием: коды в array('l') + словарь."""
+
+    python_type = str
+
+    def __init__(self):
+        super().__init__()
+        self.codes = array('l')
+        self.dictionary = []
+        self.lookup = {}
+
+    def _encode(self, value):
+        code = self.lookup.get(value)
+        if code is None:
+            code = len(self.dictionary)
+            self.dictionary.append(value)
+            self.lookup[value] = code
+        return code
+
+    def append(self, value):
+        if value is None:
+            self.codes.append(-1)
+            self.nulls.append(1)
+            return
+        if value.__class__ is not str:
+            raise ValueError(f"Ожидалось str, получено: {value}")
+        self.codes.append(self._encode(value))
+        self.nulls.append(0)
+
+    def get(self, position):
+        code = self.codes[position]
+        return None if code < 0 else self.dictionary[code]
+
+    def _take_values(self, positions):
+        # Код -1 (NULL) попадает на добавленный в конец None
+        decode = (self.dictionary + [None]).__getitem__
+        return list(map(decode, _take(self.codes, positions)))
+
+    def set(self, position, value):
+        if value is None:
+            self.codes[position] = -1
+            self.nulls[position] = 1
+            return
+        if value.__class__ is not str:
+            raise ValueError(f"Ожидалось str, получено: {value}")
+        self.codes[position] = self._encode(value)
+        self.nulls[position] = 0
+
+    def _codes_mask(self, wanted_codes):
+        flags = bytes(map(frozenset(wanted_codes).__contains__, self.codes))
+        return mask_from_flags(flags)
+
+    def compare(self, op, const):
+        # Условие проверяется по словарю один раз, строки сравниваются кодами
+        if op in ("=", "!="):
+            code = self.lookup.get(const) if isinstance(const, str) else None
+            equal = 0 if code is None else self._codes_mask((code,))
+            return equal if op == "=" else all_rows_mask(len(self)) ^ equal
+
+        if const.__class__ is not str:
+            return 0
+
+        method = getattr(const, _CONST_METHODS[op])
+        return self._codes_mask(
+            code for value, code in self.lookup.items() if method(value)
+        )
+
+    def contains(self, values):
+        return self._codes_mask(
+            self.lookup[value] for value in values
+            if isinstance(value, str) and value in self.lookup
+        )
+
+    def segment(self, start, stop):
+        # Словарь общий: коды сегмента те же, что у всего столбца
+        column = StrColumn.__new__(StrColumn)
+        column.codes = self.codes[start:stop]
+        column.nulls = self.nulls[start:stop]
+        column.dictionary = self.dictionary
+        column.lookup = self.lookup
+        return column
+
+    def compact(self, positions):
+        self.codes = array('l', (self.codes[i] for i in positions))
+        self.nulls = bytearray(self.nulls[i] for i in positions)
+
+
+COLUMN_CLASSES = {int: IntColumn, bool: BoolColumn, str: StrColumn}
+
+
+def tree_mask(columns, node, count):
+    """Маска строк, удовлетворяющих условию node, по столбцам {имя: столбец}."""
+    kind = node[0]
+    if kind == "and":
+        return tree_mask(columns, node[1], count) & tree_mask(columns, node[2], count)
+    if kind == "or":
+        return tree_mask(columns, node[1], count) | tree_mask(columns, node[2], count)
+    if kind == "not":
+        return all_rows_mask(count) ^ tree_mask(columns, node[1], count)
+
+    column = columns.get(node[1])
+    if kind == "in":
+        return column.contains(node[2]) if column is not None else 0
+
+    _, _, op, value = node
+    if column is None:
+        # Столбца нет: значение None, как у предиката строки
+        return all_rows_mask(count) if op == "!=" else 0
+    return column.compare(op, value)
+
+
+class ColumnarTable:
+    """
+    Таблица в колоночном представлении.
+
+    Каждый столбец хранится в отдельном массиве, удаленные строки
+    помечаются в карте alive и вычищаются, когда их становится больше
+    половины. WHERE вычисляется столбец за столбцом в маску строк.
+    Вторичные индексы не поддерживаются: их заменяет векторная фильтрация.
+    """
+
+    def __init__(self, name, records=None, column_types=None):
+        self.name = name
+        self.column_types = dict(column_types or {'ID': int})
+        self.columns = {
+            column: COLUMN_CLASSES[python_type]()
+            for column, python_type in self.column_types.items()
+        }
+        self.indexes = {}
+        self.alive = bytearray()
+        self.by_id = {}
+
+        for record in records or []:
+            self.append(record)
+
+    def __iter__(self):
+        return iter(self._rows(self.by_id.values()))
+
+    def __len__(self):
+        return len(self.by_id)
+
+    @property
+    def records(self):
+        """Список всех записей в порядке добавления."""
+        return list(self)
+
+    def max_id(self):
+        """Возвращает наибольший ID в таблице (0 для пустой)."""
+        return max(self.by_id, default=0)
+
+    def add_index(self, column, kind="hash"):
+        raise ValueError("Индексы не поддерживаются для колоночных таблиц.")
+
+    def drop_index(self, column):
+        pass
+
+    def ordered_candidates(self, where_clause, column, descending=False):
+        return None
+
+    def access_path(self, where_clause):
+        """Как у Table: первичный ключ для ID, иначе векторный просмотр."""
+        if where_clause:
+            equalities = dict(where_clause.equalities)
+            if 'ID' in equalities:
+                return "key", 'ID', set(equalities['ID'])
+        return "scan", None, None
+
+    def key_lookup(self, column):
+        """Как у Table: поиск записей по ID, других индексов нет."""
+        if column != 'ID':
+            return None
+        by_id = self.by_id
+        return lambda value: [self._row(by_id[value])] if value in by_id else []
+
+    def estimate(self, where_clause):
+        """Число кандидатов для WHERE, посчитанное без их выборки."""
+        kind, _, argument = self.access_path(where_clause)
+        if kind == "key":
+            return sum(1 for value in argument if value in self.by_id)
+        return len(self.by_id)
+
+    def _row(self, position):
+        return {
+            column: values.get(position) for column, values in self.columns.items()
+        }
+
+    def _rows(self, positions, columns=None):
+        """
+        Собирает записи по номерам строк, читая каждый столбец целиком.
+
+        columns ограничивает записи нужными столбцами (проекция).
+        """
+        positions = list(positions)
+        if columns is None:
+            names = list(self.columns)
+        else:
+            names = [name for name in self.columns if name in columns]
+        value_lists = [self.columns[name].take(positions) for name in names]
+        return [dict(zip(names, values)) for values in zip(*value_lists)]
+
+    def _mask(self, node, count):
+        return tree_mask(self.columns, node, count)
+
+    @log_phase("filter")
+    def filter(self, where_clause):
+        """Возвращает записи, удовлетворяющие условию."""
+        if where_clause is None:
+            if metrics.enabled:
+                metrics.inc("rows_scanned_total", len(self.by_id), table=self.name)
+            return self.records
+
+        kind, _, ids = self.access_path(where_clause)
+        if kind == "key":
+            rows = [
+                self._row(self.by_id[value]) for value in ids
+                if value in self.by_id
+            ]
+            if metrics.enabled:
+                metrics.inc("rows_scanned_total", len(rows), table=self.name)
+            return [row for row in rows if where_clause.predicate(row)]
+
+        count = len(self.alive)
+        if metrics.enabled:
+            metrics.inc("rows_scanned_total", len(self.by_id), table=self.name)
+        mask = self._mask(where_clause.tree, count) & mask_from_flags(self.alive)
+        return self._rows(mask_positions(mask, count))
+
+    def iter_filter(self, where_clause, columns=None):
+        """
+        Как filter, но потоково: выдает списки совпавших записей по частям.
+
+        Маска строк вычисляется сразу, а записи собираются частями и
+        только из столбцов columns.
+        """
+        if where_clause is None:
+            positions = self.by_id.values()
+            scanned = len(self.by_id)
+        else:
+            kind, _, ids = self.access_path(where_clause)
+            if kind == "key":
+                # Кандидатов мало: проверяем их предикатом, как filter
+                rows = [
+                    self._row(self.by_id[value]) for value in ids
+                    if value in self.by_id
+                ]
+                return iter_matching(self.name, rows, where_clause)
+
+            with metrics.timer("phase_seconds", phase="filter"):
+                count = len(self.alive)
+                mask = self._mask(where_clause.tree, count)
+                mask &= mask_from_flags(self.alive)
+            positions = mask_positions(mask, count)
+            scanned = len(self.by_id)
+
+        if metrics.enabled:
+            metrics.inc("rows_scanned_total", scanned, table=self.name)
+        return self._iter_positions(positions, columns)
+
+    def _iter_positions(self, positions, columns):
+        positions = iter(positions)
+        while True:
+            with metrics.timer("phase_seconds", phase="filter"):
+                chunk = self._rows(islice(positions, SCAN_CHUNK_SIZE), columns)
+            if not chunk:
+                return
+            yield chunk
+
+    def append(self, record):
+        """Добавляет запись в конец столбцов."""
+        position = len(self.alive)
+        for column, values in self.columns.items():
+            values.append(record.get(column))
+        self.alive.append(1)
+        self.by_id[record.get('ID')] = position
+
+    def update_record(self, record, changes):
+        """Изменяет запись (по её ID) и переданную копию."""
+        position = self.by_id[record.get('ID')]
+        for column, value in changes.items():
+            if column in self.columns:
+                self.columns[column].set(position, value)
+        record.update(changes)
+
+    def remove_records(self, records):
+        """Помечает записи удаленными и при необходимости уплотняет столбцы."""
+        for record in records:
+            position = self.by_id.pop(record.get('ID'), None)
+            if position is not None:
+                self.alive[position] = 0
+
+        if len(self.by_id) * 2 < len(self.alive):
+            self._compact()
+
+    def _compact(self):
+        positions = list(self.by_id.values())
+        for values in self.columns.values():
+            values.compact(positions)
+        self.alive = bytearray(b'\x01' * len(positions))
+        self.by_id = {
+            record_id: position for position, record_id in enumerate(self.by_id)
+        }
+
+    def clear(self):
+        """Удаляет все записи."""
+        self.__init__(self.name, column_types=self.column_types)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import threading
+from .constants import BINARY_FORMATS
+from .binary import load_binary_table, write_binary
+from .storage import iter_log, remove_table_files
+from .utils import load_table_data, save_table_data
+
+
+def write_snapshot(table_name, storage_format, old_file, new_file, size,
+                   column_types, data_dir):
+    """
+    Пишет снимок таблицы из файлов старого поколения в файлы нового.
+
+    Читаются только первые size байт журнала старого поколения (и его
+    двоичный снимок): эти байты уже опубликованы и не меняются.
+    """
+    remove_table_files(new_file, data_dir)
+    if storage_format in BINARY_FORMATS:
+        table = load_binary_table(table_name, old_file, column_types, data_dir)
+        table.apply_entries(list(iter_log(old_file, data_dir, size)))
+        write_binary(
+            new_file, table, column_types, data_dir,
+            compression=BINARY_FORMATS[storage_format],
+        )
+    else:
+        records = load_table_data(old_file, data_dir, size)
+        save_table_data(new_file, records, data_dir)
+
+
+class Compaction(threading.Thread):
+    """
+    Фоновое сжатие таблицы (vacuum) в отдельном потоке.
+
+    Поток работает только с файлами: читает опубликованную версию
+    таблицы и пишет файлы следующего поколения. Таблицы в памяти и
+    метаданные он не трогает, поэтому запросы во время сжатия идут как
+    обычно. Новое поколение публикует основной поток
+    (TableManager.finish_vacuum), дописав в него изменения, сделанные
+    за время сжатия.
+    """
+
+    def __init__(self, table_name, storage_format, old_file, new_file, size,
+                 column_types, data_dir):
+        super().__init__(name=f"vacuum-{table_name}", daemon=True)
+        self.table_name = table_name
+        self.storage_format = storage_format
+        self.old_file = old_file
+        self.new_file = new_file
+        self.size = size
+        self.column_types = column_types
+        self.data_dir = data_dir
+        self.error = None
+
+    def run(self):
+        try:
+            write_snapshot(
+                self.table_name, self.storage_format, self.old_file,
+                self.new_file, self.size, self.column_types, self.data_dir,
+            )
+        except Exception as e:
+            # Сжатие не удалось: останутся старые файлы, новые удалятся
+            self.error = e
@@ -3,10 +3,127 @@
 # Файлы и пути
 META_FILE = "db_meta.json"
 DATA_DIR = "data"
+LOG_EXTENSION = ".jsonl"
+LEGACY_EXTENSION = ".json"
+BINARY_EXTENSION = ".bin"
+WAL_FILE = "wal.log"
+LOCK_FILE = "db.lock"
+
+# Служебный раздел метаданных
+SYSTEM_KEY = "__system__"
+INDEXES_KEY = "indexes"
+SEQUENCES_KEY = "sequences"
+LAYOUTS_KEY = "layouts"
+LOG_SIZES_KEY = "log_sizes"
+FORMATS_KEY = "formats"
+GENERATIONS_KEY = "generations"
+DEAD_ROWS_KEY = "dead_rows"
+
+# Сжатие файлов таблицы (vacuum): фоновое сжатие начинается, когда
+# мертвых версий строк (удаленных и замененных обновлением) в файлах не
+# меньше порога и их доля не меньше VACUUM_DEAD_RATIO
+VACUUM_DEAD_RATIO = 0.5
+VACUUM_MIN_DEAD_ROWS = 10_000
+
+# Отложенная запись изменений (0 - отключить правило)
+FLUSH_EVERY_OPS = 1000
+FLUSH_INTERVAL = 5.0
+
+# Политика fsync журнала упреждающей записи: always, off или <N>ms
+DEFAULT_DURABILITY = "always"
+
+# Режим сервера
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 7780
+SERVER_LINE_LIMIT = 16 * 1024 * 1024
+
+# Метрики: сбор по умолчанию, префикс имен и границы корзин задержек (с)
+METRICS_ENABLED = True
+METRICS_PREFIX = "primitive_db"
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Кэш результатов select
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_ROWS = 100_000
+
+# Кэш скомпилированных условий WHERE
+WHERE_CACHE_SIZE = 512
+
+# Кэш подготовленных запросов соединения Python API
+STATEMENT_CACHE_SIZE = 256
+
+# Размер пачки при загрузке из файла
+LOAD_BATCH_SIZE = 10_000
+
+# Строк в сегменте двоичного файла таблицы; у каждого сегмента своя
+# карта зон (min/max, число NULL и true по столбцам)
+SEGMENT_ROWS = 65_536
+
+# Параллельный просмотр двоичных таблиц пулом процессов: с какого числа
+# просматриваемых строк он включается и сколько процессов (None - по
+# числу ядер, 0 или 1 - без пула)
+PARALLEL_SCAN_MIN_ROWS = 500_000
+PARALLEL_SCAN_WORKERS = None
+
+# Потоковая выборка: строк-кандидатов за шаг просмотра и строк на
+# страницу вывода
+SCAN_CHUNK_SIZE = 1000
+OUTPUT_PAGE_SIZE = 1000
+
+# Форматы вывода select (select ... format csv)
+OUTPUT_FORMATS = ["table", "csv", "jsonl"]
+
+# Агрегатные функции select; sum и avg - только для столбцов int
+AGGREGATE_FUNCTIONS = ["count", "sum", "avg", "min", "max"]
+NUMERIC_AGGREGATES = ["sum", "avg"]
+
+# Операции журнала таблицы
+LOG_INSERT = "insert"
+LOG_UPDATE = "update"
+LOG_DELETE = "delete"
+
+# Все команды (метки метрик берутся только из них)
+COMMANDS = {
+    "exit", "help", "create_table", "drop_table", "list_tables", "insert",
+    "load", "select", "update", "delete", "info", "flush", "checkpoint",
+    "create_index", "drop_index", "cache_info", "set_layout", "begin",
+    "commit", "rollback", "durability", "stats", "explain", "profile",
+    "set_format", "vacuum",
+}
+
+# Команды, которым нужна блокировка записи
+WRITE_COMMANDS = {
+    "insert", "load", "update", "delete", "create_table", "drop_table",
+    "create_index", "drop_index", "set_layout", "set_format", "vacuum",
+}
+
+# Запросы, для которых explain показывает план, и команды для profile
+EXPLAIN_COMMANDS = ["select", "update", "delete"]
+PROFILE_COMMANDS = ["select", "insert", "update", "delete"]
+
+# Фазы выполнения команды в порядке вывода profile
+PROFILE_PHASES = [
+    "parse", "load", "filter", "join", "sort", "format", "commit", "save",
+]
 
 # Поддерживаемые типы данных
 VALID_TYPES = ["int", "str", "bool"]
 
+# Виды индексов
+INDEX_KINDS = ["hash", "sorted"]
+SORTED_INDEX_TYPES = ["int", "str"]
+
+# Представления таблиц в памяти
+LAYOUTS = ["rows", "columnar"]
+
+# Форматы файлов таблиц: журнал JSONL или двоичный файл (+ журнал изменений)
+STORAGE_FORMATS = ["jsonl", "binary", "zlib", "lzma"]
+# Форматы с двоичным файлом и способ сжатия его столбцов
+BINARY_FORMATS = {"binary": None, "zlib": "zlib", "lzma": "lzma"}
+
 # Сообщения
 ERROR_TABLE_EXISTS = 'Таблица "{}" уже существует.'
 ERROR_TABLE_NOT_FOUND = 'Таблица "{}" не существует.'
@@ -14,6 +131,61 @@ ERROR_COLUMN_FORMAT = 'Некорректный формат столбца: {}'
 ERROR_DATA_TYPE = 'Неподдерживаемый тип данных: {}'
 ERROR_WHERE_FORMAT = "Некорректный формат условия WHERE"
 ERROR_SET_FORMAT = "Некорректный формат условия SET"
+ERROR_COLUMN_NOT_FOUND = 'Столбец "{}" не существует в таблице "{}".'
+ERROR_SET_ID = "Столбец ID - первичный ключ таблицы, его нельзя изменять."
+ERROR_INDEX_EXISTS = 'Индекс по столбцу "{}" таблицы "{}" уже существует.'
+ERROR_INDEX_NOT_FOUND = 'Индекса по столбцу "{}" таблицы "{}" нет.'
+ERROR_INDEX_KIND = 'Неизвестный вид индекса: {}'
+ERROR_LAYOUT = 'Неизвестное представление таблицы: {}'
+ERROR_COLUMNAR_INDEX = 'Индексы не поддерживаются для колоночной таблицы "{}".'
+ERROR_STORAGE_FORMAT = (
+    'Неизвестный формат хранения таблицы: {} (jsonl, binary, zlib или lzma)'
+)
+ERROR_BINARY_INDEX = 'Индексы не поддерживаются для таблицы "{}" в формате {}.'
+ERROR_BINARY_LAYOUT = (
+    'Таблица "{}" в формате {} читается по столбцам из файла; '
+    'сначала выполните set_format {} jsonl'
+)
+ERROR_FORMAT_TRANSACTION = "Формат хранения нельзя менять внутри транзакции."
+ERROR_VACUUM_TRANSACTION = "Сжимать таблицу внутри транзакции нельзя."
+ERROR_BINARY_FILE = 'Файл "{}" не является двоичным файлом таблицы.'
+ERROR_DURABILITY = 'Неизвестная политика надежности: {} (always, off или <N>ms)'
+ERROR_SELECT = (
+    "Используйте: select [<столбец>|<функция>(<столбец>|*), ...|*] "
+    "from <таблица> [join <таблица> on <столбец> = <столбец>] "
+    "[where <условие>] [group by <столбец>, ...] "
+    "[order by <столбец> [asc|desc]] [limit N [offset M]] "
+    "[format table|csv|jsonl]"
+)
+ERROR_LIMIT = "Некорректный формат LIMIT: {}"
+ERROR_COLUMNS = "Некорректный список столбцов: {}"
+ERROR_AGGREGATE_FUNCTION = "Неизвестная агрегатная функция: {}"
+ERROR_AGGREGATE_TYPE = 'Функция {} применима только к столбцам int, а не к "{}"'
+ERROR_GROUP_COLUMN = (
+    'Столбец "{}" должен быть в GROUP BY или внутри агрегатной функции'
+)
+ERROR_RESULT_COLUMN = 'Столбца "{}" нет в результате запроса'
+ERROR_OUTPUT_FORMAT = "Неизвестный формат вывода: {} (table, csv или jsonl)"
+ERROR_JOIN = (
+    "Используйте: from <таблица> [<псевдоним>] join <таблица> [<псевдоним>] "
+    "on <таблица>.<столбец> = <таблица>.<столбец>"
+)
+ERROR_JOIN_ALIAS = 'Псевдоним "{}" занят обеими таблицами соединения'
+ERROR_JOIN_COLUMN = 'Условие ON должно связывать столбцы разных таблиц: {}'
+ERROR_AMBIGUOUS_COLUMN = 'Столбец "{}" есть в обеих таблицах: укажите <таблица>.{}'
+ERROR_PARAMS = "Параметры ? допустимы только в запросах через Python API"
+ERROR_PARAM_COUNT = "Ожидается параметров: {}, получено: {}"
+ERROR_PARAM_TYPE = "Параметр {}: значение должно быть int, str или bool, получено: {!r}"
+ERROR_STATEMENT = (
+    "Неподдерживаемый запрос: {} (select, insert, update, delete, "
+    "create_table, drop_table, create_index, drop_index)"
+)
+ERROR_CONNECTION_CLOSED = "Соединение с базой данных закрыто."
+ERROR_EXECUTEMANY = "executemany выполняет только insert, update и delete"
+ERROR_DDL = "Используйте: {}"
+ERROR_EXPLAIN = "Используйте: explain select|update|delete ..."
+ERROR_PROFILE = "Используйте: profile select|insert|update|delete ..."
+ERROR_SORTED_INDEX_TYPE = 'Упорядоченный индекс строится только по int и str, а не {}'
 
 # Команды
 EXIT_COMMAND = "exit"
@@ -26,3 +198,18 @@ SELECT_COMMAND = "select"
 UPDATE_COMMAND = "update"
 DELETE_COMMAND = "delete"
 INFO_COMMAND = "info"
+FLUSH_COMMAND = "flush"
+CHECKPOINT_COMMAND = "checkpoint"
+CREATE_INDEX_COMMAND = "create_index"
+DROP_INDEX_COMMAND = "drop_index"
+CACHE_INFO_COMMAND = "cache_info"
+SET_LAYOUT_COMMAND = "set_layout"
+SET_FORMAT_COMMAND = "set_format"
+LOAD_COMMAND = "load"
+BEGIN_COMMAND = "begin"
+COMMIT_COMMAND = "commit"
+ROLLBACK_COMMAND = "rollback"
+DURABILITY_COMMAND = "durability"
+STATS_COMMAND = "stats"
+EXPLAIN_COMMAND = "explain"
+PROFILE_COMMAND = "profile"
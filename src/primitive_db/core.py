@@ -1,23 +1,38 @@
 #!/usr/bin/env python3
 
+import heapq
+from functools import partial
+from itertools import chain
 from prettytable import PrettyTable
+from .columnar import ColumnarTable
 from .decorators import handle_db_errors, confirm_action, log_time
+from .metrics import metrics
+from .table import iter_matching
+from .parser import Aggregate
 from .constants import(
+    NUMERIC_AGGREGATES, ERROR_AGGREGATE_TYPE,
+    ERROR_GROUP_COLUMN, ERROR_RESULT_COLUMN,
     ERROR_TABLE_EXISTS, ERROR_COLUMN_FORMAT,
-    ERROR_DATA_TYPE,
+    ERROR_DATA_TYPE, ERROR_TABLE_NOT_FOUND, ERROR_COLUMN_NOT_FOUND, ERROR_SET_ID,
+    ERROR_INDEX_EXISTS, ERROR_INDEX_NOT_FOUND, ERROR_INDEX_KIND,
+    ERROR_SORTED_INDEX_TYPE, INDEX_KINDS, SORTED_INDEX_TYPES,
+    ERROR_LAYOUT, ERROR_COLUMNAR_INDEX, LAYOUTS, SCAN_CHUNK_SIZE,
+    ERROR_STORAGE_FORMAT, ERROR_BINARY_INDEX, ERROR_BINARY_LAYOUT,
+    STORAGE_FORMATS, SYSTEM_KEY, INDEXES_KEY, SEQUENCES_KEY, LAYOUTS_KEY,
+    BINARY_FORMATS, LOG_SIZES_KEY, FORMATS_KEY, GENERATIONS_KEY, DEAD_ROWS_KEY,
 )
 
 @handle_db_errors
 def create_table(metadata, table_name, columns):
     """Создает таблицу в метаданных."""
-    if table_name in metadata:
-        raise ValueError(ERROR_COLUMN_FORMAT.format(table_name))
+    if table_name in metadata or table_name == SYSTEM_KEY:
+        raise ValueError(ERROR_TABLE_EXISTS.format(table_name))
 
     validated_columns = ["ID:int"]
 
     for column in columns:
         if ':' not in column:
-            raise ValueError(ERROR_TABLE_EXISTS.format(column))
+            raise ValueError(ERROR_COLUMN_FORMAT.format(column))
 
         col_name, col_type = column.split(':', 1)
         if col_type not in ['int', 'str', 'bool']:
@@ -36,12 +51,210 @@ def drop_table(metadata, table_name):
         raise ValueError(f'Таблица "{table_name}" не существует.')
 
     del metadata[table_name]
+    # Служебные разделы устроены как {таблица: настройки}
+    for section in metadata.get(SYSTEM_KEY, {}).values():
+        section.pop(table_name, None)
     return metadata
 
 @handle_db_errors
 def list_tables(metadata):
     """Возвращает список таблиц."""
-    return list(metadata.keys())
+    return [name for name in metadata if name != SYSTEM_KEY]
+
+PYTHON_TYPES = {'int': int, 'str': str, 'bool': bool}
+
+def get_column_types(metadata, table_name):
+    """Возвращает словарь {столбец: тип Python} для таблицы."""
+    column_types = {}
+    for column_def in metadata.get(table_name, []):
+        name, type_ = column_def.split(':')
+        column_types[name] = PYTHON_TYPES.get(type_)
+    return column_types
+
+def get_table_indexes(metadata, table_name):
+    """Возвращает словарь {столбец: вид индекса} для таблицы."""
+    indexes = metadata.get(SYSTEM_KEY, {}).get(INDEXES_KEY, {})
+    return dict(indexes.get(table_name, {}))
+
+def get_table_layout(metadata, table_name):
+    """Возвращает представление таблицы в памяти: rows или columnar."""
+    layouts = metadata.get(SYSTEM_KEY, {}).get(LAYOUTS_KEY, {})
+    return layouts.get(table_name, "rows")
+
+@handle_db_errors
+def set_table_layout(metadata, table_name, layout):
+    """Задает представление таблицы в памяти."""
+    if table_name not in metadata or table_name == SYSTEM_KEY:
+        raise ValueError(ERROR_TABLE_NOT_FOUND.format(table_name))
+
+    if layout not in LAYOUTS:
+        raise ValueError(ERROR_LAYOUT.format(layout))
+
+    storage_format = get_table_format(metadata, table_name)
+    if storage_format in BINARY_FORMATS:
+        raise ValueError(
+            ERROR_BINARY_LAYOUT.format(table_name, storage_format, table_name)
+        )
+
+    if layout == "columnar" and get_table_indexes(metadata, table_name):
+        raise ValueError(ERROR_COLUMNAR_INDEX.format(table_name))
+
+    layouts = metadata.setdefault(SYSTEM_KEY, {}).setdefault(LAYOUTS_KEY, {})
+    if layout == "rows":
+        layouts.pop(table_name, None)
+    else:
+        layouts[table_name] = layout
+    return metadata
+
+def get_table_format(metadata, table_name):
+    """Возвращает формат файлов таблицы: jsonl, binary, zlib или lzma."""
+    formats = metadata.get(SYSTEM_KEY, {}).get(FORMATS_KEY, {})
+    return formats.get(table_name, "jsonl")
+
+def get_table_file(metadata, table_name):
+    """
+    Возвращает имя файлов таблицы (без расширения).
+
+    Смена формата пишет файлы нового поколения рядом со старыми, поэтому
+    читатель опубликованной версии не видит наполовину записанный файл.
+    Нулевое поколение - просто имя таблицы.
+    """
+    generations = metadata.get(SYSTEM_KEY, {}).get(GENERATIONS_KEY, {})
+    generation = generations.get(table_name, 0)
+    return f"{table_name}.{generation}" if generation else table_name
+
+def set_table_format(metadata, table_name, storage_format):
+    """Задает формат файлов таблицы и переводит её на новое поколение файлов."""
+    if table_name not in metadata or table_name == SYSTEM_KEY:
+        raise ValueError(ERROR_TABLE_NOT_FOUND.format(table_name))
+
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(ERROR_STORAGE_FORMAT.format(storage_format))
+
+    if storage_format in BINARY_FORMATS and get_table_indexes(metadata, table_name):
+        raise ValueError(ERROR_BINARY_INDEX.format(table_name, storage_format))
+
+    system = metadata.setdefault(SYSTEM_KEY, {})
+    formats = system.setdefault(FORMATS_KEY, {})
+    if storage_format == "jsonl":
+        formats.pop(table_name, None)
+    else:
+        formats[table_name] = storage_format
+    # Двоичная таблица читается из файла по столбцам
+    system.get(LAYOUTS_KEY, {}).pop(table_name, None)
+    return next_table_generation(metadata, table_name)
+
+def next_table_generation(metadata, table_name):
+    """
+    Переводит таблицу на новое поколение файлов.
+
+    Файлы нового поколения пишутся снимком, поэтому мертвых строк в них
+    нет.
+    """
+    system = metadata.setdefault(SYSTEM_KEY, {})
+    generations = system.setdefault(GENERATIONS_KEY, {})
+    generations[table_name] = generations.get(table_name, 0) + 1
+    system.get(DEAD_ROWS_KEY, {}).pop(table_name, None)
+    return metadata
+
+def get_dead_rows(metadata, table_name):
+    """Сколько мертвых версий строк (удаленных и замененных) в файлах таблицы."""
+    return metadata.get(SYSTEM_KEY, {}).get(DEAD_ROWS_KEY, {}).get(table_name, 0)
+
+def add_dead_rows(metadata, table_name, count):
+    """Учитывает новые мертвые версии строк в файлах таблицы."""
+    if count:
+        dead_rows = metadata.setdefault(SYSTEM_KEY, {}).setdefault(DEAD_ROWS_KEY, {})
+        dead_rows[table_name] = dead_rows.get(table_name, 0) + count
+
+def sync_table_sequence(metadata, table_name, max_id):
+    """
+    Поднимает счетчик ID таблицы до max_id, если он отстает.
+
+    Возвращает True, если счетчик изменился.
+    """
+    sequences = metadata.setdefault(SYSTEM_KEY, {}).setdefault(SEQUENCES_KEY, {})
+    if sequences.get(table_name, 0) >= max_id:
+        return False
+
+    sequences[table_name] = max_id
+    return True
+
+def reserve_table_ids(metadata, table_name, count):
+    """Выделяет непрерывный диапазон из count ID, возвращает первый из них."""
+    sequences = metadata.setdefault(SYSTEM_KEY, {}).setdefault(SEQUENCES_KEY, {})
+    first_id = sequences.get(table_name, 0) + 1
+    sequences[table_name] = first_id + count - 1
+    return first_id
+
+def get_published_size(metadata, table_name):
+    """
+    Возвращает опубликованный размер журнала таблицы в байтах.
+
+    None - размер не записан, журнал читается целиком.
+    """
+    sizes = metadata.get(SYSTEM_KEY, {}).get(LOG_SIZES_KEY, {})
+    return sizes.get(table_name)
+
+def set_published_size(metadata, table_name, size):
+    """Запоминает размер журнала таблицы в опубликованной версии."""
+    sizes = metadata.setdefault(SYSTEM_KEY, {}).setdefault(LOG_SIZES_KEY, {})
+    sizes[table_name] = size
+
+def table_signature(metadata, table_name):
+    """Все, от чего зависит загруженная в память таблица."""
+    system = metadata.get(SYSTEM_KEY, {})
+    return (
+        metadata.get(table_name),
+        get_published_size(metadata, table_name),
+        system.get(INDEXES_KEY, {}).get(table_name),
+        system.get(LAYOUTS_KEY, {}).get(table_name),
+        system.get(FORMATS_KEY, {}).get(table_name),
+        system.get(GENERATIONS_KEY, {}).get(table_name),
+    )
+
+@handle_db_errors
+def create_index(metadata, table_name, column, kind="hash"):
+    """Регистрирует индекс (hash или sorted) по столбцу в метаданных."""
+    if table_name not in metadata or table_name == SYSTEM_KEY:
+        raise ValueError(ERROR_TABLE_NOT_FOUND.format(table_name))
+
+    if kind not in INDEX_KINDS:
+        raise ValueError(ERROR_INDEX_KIND.format(kind))
+
+    column_types = dict(get_table_schema(metadata, table_name))
+    if column not in column_types:
+        raise ValueError(ERROR_COLUMN_NOT_FOUND.format(column, table_name))
+
+    if get_table_layout(metadata, table_name) == "columnar":
+        raise ValueError(ERROR_COLUMNAR_INDEX.format(table_name))
+
+    storage_format = get_table_format(metadata, table_name)
+    if storage_format in BINARY_FORMATS:
+        raise ValueError(ERROR_BINARY_INDEX.format(table_name, storage_format))
+
+    if kind == "sorted" and column_types[column] not in SORTED_INDEX_TYPES:
+        raise ValueError(ERROR_SORTED_INDEX_TYPE.format(column_types[column]))
+
+    system = metadata.setdefault(SYSTEM_KEY, {})
+    table_indexes = system.setdefault(INDEXES_KEY, {}).setdefault(table_name, {})
+    if column in table_indexes:
+        raise ValueError(ERROR_INDEX_EXISTS.format(column, table_name))
+
+    table_indexes[column] = kind
+    return metadata
+
+@handle_db_errors
+def drop_index(metadata, table_name, column):
+    """Удаляет индекс по столбцу из метаданных."""
+    indexes = metadata.get(SYSTEM_KEY, {}).get(INDEXES_KEY, {})
+    if column not in indexes.get(table_name, []):
+        raise ValueError(ERROR_INDEX_NOT_FOUND.format(column, table_name))
+
+    del indexes[table_name][column]
+    if not indexes[table_name]:
+        del indexes[table_name]
+    return metadata
 
 @handle_db_errors
 def get_table_schema(metadata, table_name):
@@ -56,12 +269,13 @@ def get_table_schema(metadata, table_name):
 
     return schema
 
-@handle_db_errors
 def validate_data_types(schema, values):
     """Проверяет соответствие значений типам данных схемы."""
-    # Пропускаем ID (первый столбец)
+    # Пропускаем ID (первый столбец); bool не считается int
     for (col_name, col_type), value in zip(schema[1:], values):
-        if col_type == 'int' and not isinstance(value, int):
+        if col_type == 'int' and (
+            not isinstance(value, int) or isinstance(value, bool)
+        ):
             raise ValueError(f'Столбец "{col_name}" должен быть int, получено: {value}')
         elif col_type == 'str' and not isinstance(value, str):
             raise ValueError(f'Столбец "{col_name}" должен быть str, получено: {value}')
@@ -71,92 +285,516 @@ def validate_data_types(schema, values):
                 f'получено: {value}'
             )
 
+def validate_set_clause(table_data, set_clause):
+    """Проверяет столбцы и типы значений SET по схеме таблицы."""
+    # ID - ключ строк и журнала: новое значение могло бы совпасть с чужим
+    if 'ID' in set_clause:
+        raise ValueError(ERROR_SET_ID)
+
+    column_types = table_data.column_types
+    for column in set_clause:
+        if column not in column_types:
+            raise ValueError(ERROR_COLUMN_NOT_FOUND.format(column, table_data.name))
+
+    schema = [('ID', 'int')] + [
+        (column, column_types[column].__name__) for column in set_clause
+    ]
+    validate_data_types(schema, list(set_clause.values()))
+
 @handle_db_errors
 @log_time
-def insert(metadata, table_name, values):
-    """Добавляет новую запись в таблицу."""
+def insert_many(metadata, table_name, rows):
+    """
+    Добавляет пачку записей в таблицу.
+
+    Схема читается один раз, все строки проверяются до выделения ID,
+    затем пачка получает непрерывный диапазон ID.
+    """
     if table_name not in metadata:
         raise ValueError(f'Таблица "{table_name}" не существует.')
 
     schema = get_table_schema(metadata, table_name)
+    expected = len(schema) - 1
 
-    # Проверяем количество значений (без ID)
-    if len(values) != len(schema) - 1:
-        raise ValueError(f'Ожидается {len(schema)-1} значений, получено {len(values)}')
-
-    # Валидируем типы данных
-    validate_data_types(schema, values)
+    for number, values in enumerate(rows, 1):
+        if len(values) != expected:
+            raise ValueError(
+                f'Строка {number}: ожидается {expected} значений, '
+                f'получено {len(values)}'
+            )
+        try:
+            validate_data_types(schema, values)
+        except ValueError as e:
+            raise ValueError(f"Строка {number}: {e}")
+
+    first_id = reserve_table_ids(metadata, table_name, len(rows))
+    columns = [col_name for col_name, _ in schema[1:]]
+    if metrics.enabled:
+        metrics.inc("rows_affected_total", len(rows), table=table_name)
+
+    return [
+        {'ID': new_id, **dict(zip(columns, values))}
+        for new_id, values in enumerate(rows, first_id)
+    ]
+
+def _value_key(value):
+    """
+    Ключ сравнения значения, устойчивый к None и разным типам: для ORDER BY,
+    MIN/MAX и порядка групп.
+    """
+    return (value is None, type(value).__name__, value)
 
-    # Создаем новую запись
-    new_id = 1
+@handle_db_errors
+@log_time
+def select(table_data, where_clause=None, order_by=None, limit=None, offset=0):
+    """
+    Выбирает записи из таблицы с опциональными WHERE и ORDER BY.
+
+    order_by - кортеж (столбец, по_убыванию). Если по столбцу есть
+    упорядоченный индекс, записи берутся из него и не сортируются.
+    С limit или offset выборка идет через iter_select и останавливается
+    досрочно.
+    """
+    if limit is not None or offset:
+        return list(chain.from_iterable(
+            iter_select(table_data, where_clause, order_by, limit, offset)
+        ))
+
+    candidates = None
+    if order_by is not None:
+        candidates = table_data.ordered_candidates(where_clause, *order_by)
+
+    if candidates is not None:
+        if metrics.enabled:
+            metrics.inc("rows_scanned_total", len(candidates), table=table_data.name)
+        if where_clause is None:
+            result = list(candidates)
+        else:
+            predicate = where_clause.predicate
+            result = [record for record in candidates if predicate(record)]
+    else:
+        result = table_data.filter(where_clause)
+        if order_by is not None:
+            column, descending = order_by
+            with metrics.timer("phase_seconds", phase="sort"):
+                result.sort(
+                    key=lambda record: _value_key(record.get(column)),
+                    reverse=descending,
+                )
+
+    if metrics.enabled:
+        metrics.inc("rows_returned_total", len(result), table=table_data.name)
+    return result
+
+def iter_select(table_data, where_clause=None, order_by=None, limit=None,
+                offset=0, columns=None):
+    """
+    Потоково выбирает записи: выдает списки записей по частям.
+
+    Без ORDER BY (или по упорядоченному индексу его столбца) просмотр
+    останавливается, как только набрано offset + limit строк. Сортировка
+    в памяти с небольшим LIMIT держит только offset + limit лучших строк.
+    columns - нужные столбцы: колоночная таблица собирает записи только
+    из них.
+    """
+    if limit == 0:
+        return
+    stop = None if limit is None else offset + limit
+
+    if columns is not None and order_by is not None:
+        columns = set(columns) | {order_by[0]}
+
+    candidates = None
+    if order_by is not None:
+        candidates = table_data.ordered_candidates(where_clause, *order_by)
+
+    if order_by is None or candidates is not None:
+        if candidates is None:
+            chunks = table_data.iter_filter(where_clause, columns)
+        else:
+            chunks = iter_matching(table_data.name, candidates, where_clause)
+    else:
+        column, descending = order_by
+        def key(record):
+            return _value_key(record.get(column))
+
+        rows = []
+        for chunk in table_data.iter_filter(where_clause, columns):
+            with metrics.timer("phase_seconds", phase="sort"):
+                if stop is not None and stop <= SCAN_CHUNK_SIZE:
+                    # Лучшие stop строк; nsmallest и nlargest устойчивы,
+                    # как sorted
+                    pick = heapq.nlargest if descending else heapq.nsmallest
+                    rows = pick(stop, rows + chunk, key=key)
+                else:
+                    rows.extend(chunk)
+        if stop is None or stop > SCAN_CHUNK_SIZE:
+            with metrics.timer("phase_seconds", phase="sort"):
+                rows.sort(key=key, reverse=descending)
+        chunks = [rows]
+
+    returned = 0
+    skip = offset
+    try:
+        for chunk in chunks:
+            if skip:
+                if skip >= len(chunk):
+                    skip -= len(chunk)
+                    continue
+                chunk = chunk[skip:]
+                skip = 0
+            if limit is not None and returned + len(chunk) >= limit:
+                chunk = chunk[:limit - returned]
+                returned += len(chunk)
+                yield chunk
+                return
+            returned += len(chunk)
+            yield chunk
+    finally:
+        if metrics.enabled:
+            metrics.inc("rows_returned_total", returned, table=table_data.name)
+
+def _partial(function, column, column_type, records):
+    """Состояние агрегата по части записей."""
+    if column == "*":
+        return len(records)
+
+    values = [record.get(column) for record in records]
+    if function == "count":
+        return len(values) - values.count(None)
+
+    # Пустые значения и значения другого типа не учитываются
+    typed = [value for value in values if value.__class__ is column_type]
+    if not typed:
+        return (0, 0) if function == "avg" else None
+    if function == "sum":
+        return sum(typed)
+    if function == "avg":
+        return sum(typed), len(typed)
+    return min(typed) if function == "min" else max(typed)
+
+
+def _merge(function, state, other):
+    """Объединяет два состояния агрегата."""
+    if function == "count":
+        return state + other
+    if function == "avg":
+        return state[0] + other[0], state[1] + other[1]
+    if state is None:
+        return other
+    if other is None:
+        return state
+    if function == "sum":
+        return state + other
+    return min(state, other) if function == "min" else max(state, other)
+
+
+def _initial(function):
+    return {"count": 0, "avg": (0, 0)}.get(function)
+
+
+def _final(function, state):
+    if function == "avg":
+        total, count = state
+        return total / count if count else None
+    return state
+
+
+def _group_chunk(group_by, specs, records):
+    """
+    Частичные агрегаты по части записей: {значения группы: состояния}.
+
+    Функция уровня модуля: её вызывают и процессы пула при параллельном
+    просмотре.
+    """
+    if group_by:
+        parts = {}
+        for record in records:
+            key = tuple([record.get(name) for name in group_by])
+            parts.setdefault(key, []).append(record)
+    else:
+        parts = {(): records}
+
+    return {
+        key: [
+            _partial(function, column, column_type, part)
+            for function, column, column_type in specs
+        ]
+        for key, part in parts.items()
+    }
+
+
+def _aggregate_shortcut(table_data, where_clause, aggregates, group_by):
+    """
+    Можно ли получить агрегаты без просмотра строк.
+
+    "size" - только count(*) без условия и групп: это размер таблицы;
+    "index" - группировка без условия по одному индексированному
+    столбцу только с count(*): это размеры корзин индекса;
+    "bounds" - без условия и групп, только count(*) и min/max по
+    столбцам с упорядоченным индексом: это его крайние ключи.
+    None - нужен один проход по строкам.
+    """
+    if where_clause is not None:
+        return None
+
+    only_count = all(item == ("count", "*") for item in aggregates)
+    if not group_by:
+        if only_count:
+            return "size"
+        if all(
+            item == ("count", "*")
+            or (
+                item.function in ("min", "max")
+                and getattr(table_data.indexes.get(item.column), "kind", None)
+                == "sorted"
+            )
+            for item in aggregates
+        ):
+            return "bounds"
+        return None
 
-    record = {'ID': new_id}
-    for (col_name, _), value in zip(schema[1:], values):
-        record[col_name] = value
+    if only_count and len(group_by) == 1 and group_by[0] in table_data.indexes:
+        return "index"
+    return None
 
-    return record
 
 @handle_db_errors
 @log_time
-def select(table_data, where_clause=None):
-    """Выбирает записи из таблицы с опциональным условием WHERE."""
-    if where_clause is None:
-        return table_data
-
-    filtered_data = []
-    for record in table_data:
-        match = True
-        for column, value in where_clause.items():
-            if record.get(column) != value:
-                match = False
-                break
-        if match:
-            filtered_data.append(record)
+def aggregate(table_data, columns, where_clause=None, group_by=None,
+              order_by=None, limit=None, offset=0):
+    """
+    Вычисляет COUNT/SUM/AVG/MIN/MAX по таблице, с GROUP BY - по группам.
+
+    Строки проходят один раз через тот же путь WHERE, что и у select
+    (первичный ключ, индексы, векторный просмотр), частями; группы
+    собираются в словарь {значения группы: состояния агрегатов}, так что
+    в памяти остается только результат. Большую двоичную таблицу части
+    сворачивают процессы пула (iter_reduce). Когда хватает размера таблицы
+    или индекса, строки не просматриваются (см. _aggregate_shortcut).
+    Возвращает список записей {заголовок столбца: значение}, по
+    умолчанию упорядоченный по значениям группы.
+    """
+    group_by = list(group_by or [])
+    columns = list(columns or group_by)
+    aggregates = [item for item in columns if isinstance(item, Aggregate)]
+    column_types = table_data.column_types
+
+    for item in columns:
+        name = item.column if isinstance(item, Aggregate) else item
+        if name != "*" and name not in column_types:
+            raise ValueError(ERROR_COLUMN_NOT_FOUND.format(name, table_data.name))
+        if not isinstance(item, Aggregate) and item not in group_by:
+            raise ValueError(ERROR_GROUP_COLUMN.format(item))
+        if (
+            isinstance(item, Aggregate)
+            and item.function in NUMERIC_AGGREGATES
+            and column_types[name] is not int
+        ):
+            raise ValueError(ERROR_AGGREGATE_TYPE.format(item.function, name))
+    for name in group_by:
+        if name not in column_types:
+            raise ValueError(ERROR_COLUMN_NOT_FOUND.format(name, table_data.name))
+
+    shortcut = _aggregate_shortcut(table_data, where_clause, aggregates, group_by)
+    if shortcut == "size":
+        groups = {(): [len(table_data)] * len(aggregates)}
+    elif shortcut == "bounds":
+        groups = {(): [
+            len(table_data) if item.column == "*"
+            else getattr(table_data.indexes[item.column], f"{item.function}_key")()
+            for item in aggregates
+        ]}
+    elif shortcut == "index":
+        counts = table_data.indexes[group_by[0]].counts()
+        groups = {
+            (value,): [count] * len(aggregates) for value, count in counts.items()
+        }
+    else:
+        groups = {} if group_by else {
+            (): [_initial(item.function) for item in aggregates]
+        }
+        # count(*) без группировки не читает столбцов, но строки все равно
+        # нужно собрать: берется хотя бы ID
+        needed = (
+            set(group_by) | {item.column for item in aggregates} - {"*"}
+        ) or {"ID"}
+        specs = [
+            (item.function, item.column, column_types.get(item.column))
+            for item in aggregates
+        ]
+
+        # Хэш-группировка каждой части, затем слияние с накопленным
+        reduce = partial(_group_chunk, group_by, specs)
+        if hasattr(table_data, "iter_reduce"):
+            parts = table_data.iter_reduce(where_clause, needed, reduce)
+        else:
+            parts = map(reduce, table_data.iter_filter(where_clause, needed))
+
+        for part in parts:
+            for key, part_states in part.items():
+                states = groups.get(key)
+                if states is None:
+                    states = groups[key] = [
+                        _initial(function) for function, _, _ in specs
+                    ]
+                for position, (function, _, _) in enumerate(specs):
+                    states[position] = _merge(
+                        function, states[position], part_states[position]
+                    )
+
+    result = []
+    for key in sorted(groups, key=lambda key: [_value_key(value) for value in key]):
+        values = dict(zip(group_by, key))
+        states = iter(groups[key])
+        row = {}
+        for item in columns:
+            if isinstance(item, Aggregate):
+                row[str(item)] = _final(item.function, next(states))
+            else:
+                row[item] = values[item]
+        result.append(row)
+
+    if order_by is not None:
+        column, descending = order_by
+        if result and column not in result[0]:
+            raise ValueError(ERROR_RESULT_COLUMN.format(column))
+        result.sort(
+            key=lambda record: _value_key(record.get(column)), reverse=descending
+        )
+
+    result = result[offset:] if limit is None else result[offset:offset + limit]
+    if metrics.enabled:
+        metrics.inc("rows_returned_total", len(result), table=table_data.name)
+    return result
+
+
+def explain_aggregate(table_data, columns, where_clause=None, group_by=None):
+    """Описывает, как будут вычислены агрегаты (для explain)."""
+    aggregates = [item for item in columns or [] if isinstance(item, Aggregate)]
+    shortcut = _aggregate_shortcut(table_data, where_clause, aggregates, group_by)
+    if shortcut == "size":
+        return "из размера таблицы, без просмотра строк"
+    if shortcut == "bounds":
+        return "по крайним ключам упорядоченных индексов, без просмотра строк"
+    if shortcut == "index":
+        return f'по размерам корзин индекса "{group_by[0]}", без просмотра строк'
+    if group_by:
+        return f"хэш-группировка за один проход (группы: {', '.join(group_by)})"
+    return "за один проход"
 
-    return filtered_data
 
 @handle_db_errors
 def update(table_data, set_clause, where_clause):
-    """Обновляет записи в таблице."""
-    updated_count = 0
+    """Обновляет записи в таблице. Возвращает данные и ID измененных записей."""
+    # Проверка до изменений: ошибка не оставляет строки измененными частично
+    validate_set_clause(table_data, set_clause)
 
-    for record in table_data:
-        match = True
-        for column, value in where_clause.items():
-            if record.get(column) != value:
-                match = False
-                break
+    updated_ids = []
 
-        if match:
-            for column, new_value in set_clause.items():
-                record[column] = new_value
-            updated_count += 1
+    for record in table_data.filter(where_clause):
+        # В журнал попадает ID до изменения: по нему запись найдется при проигрывании
+        updated_ids.append(record.get('ID'))
+        table_data.update_record(record, set_clause)
 
-    return table_data, updated_count
+    if metrics.enabled:
+        metrics.inc("rows_affected_total", len(updated_ids), table=table_data.name)
+    return table_data, updated_ids
 
 @handle_db_errors
 @confirm_action("удаление записей")
 def delete(table_data, where_clause):
-    """Удаляет записи из таблицы."""
+    """Удаляет записи из таблицы. Возвращает таблицу и ID удаленных записей."""
     if where_clause is None:
-        return [], len(table_data)
-
-    remaining_data = []
-    deleted_count = 0
-
-    for record in table_data:
-        match = True
-        for column, value in where_clause.items():
-            if record.get(column) != value:
-                match = False
-                break
-
-        if not match:
-            remaining_data.append(record)
+        deleted_ids = [record.get('ID') for record in table_data]
+        table_data.clear()
+    else:
+        deleted_records = table_data.filter(where_clause)
+        table_data.remove_records(deleted_records)
+        deleted_ids = [record.get('ID') for record in deleted_records]
+
+    if metrics.enabled:
+        metrics.inc("rows_affected_total", len(deleted_ids), table=table_data.name)
+    return table_data, deleted_ids
+
+def explain_select(table_data, where_clause=None, order_by=None, limit=None,
+                   offset=0):
+    """
+    Описывает, как будет выполнена выборка, не выполняя её.
+
+    Возвращает список пар (пункт, значение): способ доступа к строкам,
+    оценку числа кандидатов (по индексам, без чтения строк), проверку
+    условия, способ сортировки и действие LIMIT/OFFSET.
+    """
+    total = len(table_data)
+    index = None
+    if order_by is not None:
+        index = table_data.indexes.get(order_by[0])
+        if index is not None and index.kind != "sorted":
+            index = None
+
+    if index is not None:
+        # Так же, как Table.ordered_candidates
+        column, descending = order_by
+        bounds = where_clause.bounds(column, index.value_type) if where_clause else None
+        if bounds is not None:
+            access = f'диапазон упорядоченного индекса по "{column}"'
+            estimate = index.count_range(*bounds)
         else:
-            deleted_count += 1
-
-    return remaining_data, deleted_count
+            access = f'обход упорядоченного индекса по "{column}"'
+            estimate = total
+    else:
+        kind, column, argument = table_data.access_path(where_clause)
+        estimate = table_data.estimate(where_clause)
+        if kind == "key":
+            access = f"первичный ключ ID (значений: {len(argument)})"
+        elif kind == "index":
+            access = (
+                f'индекс {table_data.indexes[column].kind} по "{column}" '
+                f"(значений: {len(argument)})"
+            )
+        elif kind == "range":
+            access = f'диапазон упорядоченного индекса по "{column}"'
+        elif isinstance(table_data, ColumnarTable):
+            access = "векторный просмотр столбцов"
+        else:
+            access = "полный просмотр"
+
+    return [
+        ("Доступ", access),
+        ("Строк в таблице", total),
+        ("Оценка кандидатов", estimate),
+        ("Условие", where_clause if where_clause else "нет"),
+    ] + explain_order(order_by, limit, offset, index)
+
+def explain_order(order_by=None, limit=None, offset=0, index=None):
+    """
+    Описывает сортировку и действие LIMIT/OFFSET (для explain).
+
+    index - упорядоченный индекс, по которому строки идут уже в порядке
+    order_by.
+    """
+    if index is not None:
+        sort = "не нужна: строки идут в порядке индекса"
+    elif order_by is None:
+        sort = "нет"
+    else:
+        direction = "по убыванию" if order_by[1] else "по возрастанию"
+        sort = f'в памяти по "{order_by[0]}" {direction}'
+
+    plan = [("Сортировка", sort)]
+    if limit is not None:
+        stop = offset + limit
+        if order_by is None or index is not None:
+            action = f"просмотр остановится после {stop} подходящих строк"
+        elif stop <= SCAN_CHUNK_SIZE:
+            action = f"при сортировке хранятся только {stop} лучших строк"
+        else:
+            action = "полная сортировка, затем срез"
+        plan.append(("LIMIT", f"{limit} OFFSET {offset}: {action}"))
+    elif offset:
+        plan.append(("OFFSET", offset))
+    return plan
 
 @handle_db_errors
 def format_table_output(data, schema):
@@ -184,8 +822,14 @@ def get_table_info(metadata, table_data, table_name):
     schema = get_table_schema(metadata, table_name)
     column_info = ', '.join(metadata[table_name])
     record_count = len(table_data)
+    index_info = ', '.join(
+        f"{column} ({kind})"
+        for column, kind in get_table_indexes(metadata, table_name).items()
+    ) or "нет"
 
     return (
         f"Таблица: {table_name}\nСтолбцы: {column_info}\n"
-        f"Количество записей: {record_count}\nСхема: {schema}"
+        f"Количество записей: {record_count}\nСхема: {schema}\n"
+        f"Индексы: {index_info}\n"
+        f"Мертвых строк в файлах: {get_dead_rows(metadata, table_name)}"
     )
@@ -1,35 +1,81 @@
 #!/usr/bin/env python3
 
+import threading
 import time
 import prompt
+from collections import OrderedDict
 from functools import wraps
+from .constants import CACHE_MAX_ENTRIES, CACHE_MAX_ROWS
+from .metrics import metrics
+
+
+# Режим встраиваемого API (в своем потоке): ошибки поднимаются
+# исключениями, подтверждения не спрашиваются
+_embedded = threading.local()
+
+
+class embedded:
+    """Включает режим встраиваемого API на время блока with."""
+
+    def __enter__(self):
+        self.previous = getattr(_embedded, "active", False)
+        _embedded.active = True
+
+    def __exit__(self, *exc_info):
+        _embedded.active = self.previous
+
+
+def is_embedded():
+    """Включен ли режим встраиваемого API в текущем потоке."""
+    return getattr(_embedded, "active", False)
 
 
 def handle_db_errors(func):
-    """Декоратор для обработки ошибок базы данных."""
+    """
+    Декоратор для обработки ошибок базы данных.
+
+    Печатает ошибку и возвращает None; в режиме встраиваемого API
+    ошибка поднимается дальше.
+    """
     @wraps(func)
     def wrapper(*args, **kwargs):
         try:
             return func(*args, **kwargs)
-        except FileNotFoundError:
-            print(
-                "Ошибка: Файл данных не найден. "
-                "Возможно, база данных не инициализирована."
-            )
-        except KeyError as e:
-            print(f"Ошибка: Таблица или столбец {e} не найден.")
-        except ValueError as e:
-            print(f"Ошибка валидации: {e}")
         except Exception as e:
-            print(f"Произошла непредвиденная ошибка: {e}")
+            if is_embedded():
+                raise
+            if isinstance(e, FileNotFoundError):
+                print(
+                    "Ошибка: Файл данных не найден. "
+                    "Возможно, база данных не инициализирована."
+                )
+            elif isinstance(e, KeyError):
+                print(f"Ошибка: Таблица или столбец {e} не найден.")
+            elif isinstance(e, ValueError):
+                print(f"Ошибка валидации: {e}")
+            else:
+                print(f"Произошла непредвиденная ошибка: {e}")
     return wrapper
 
 
+# Режим без подтверждений (project --yes)
+_auto_confirm = False
+
+
+def set_auto_confirm(enabled):
+    """Включает или выключает автоматическое подтверждение операций."""
+    global _auto_confirm
+    _auto_confirm = enabled
+
+
 def confirm_action(action_name):
     """Декоратор для подтверждения опасных операций."""
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
+            if _auto_confirm or is_embedded():
+                return func(*args, **kwargs)
+
             # Для drop_table первый аргумент - table_name
             table_name = args[1] if len(args) > 1 else "неизвестная таблица"
 
@@ -48,37 +94,125 @@ def confirm_action(action_name):
 
 
 def log_time(func):
-    """Декоратор для замера времени выполнения функции."""
+    """
+    Декоратор для замера времени выполнения функции.
+
+    Время попадает в гистограмму метрик function_seconds; при
+    выключенных метриках функция вызывается без замера.
+    """
+    name = func.__name__
+
     @wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.monotonic()
-        result = func(*args, **kwargs)
-        end_time = time.monotonic()
-
-        execution_time = end_time - start_time
-        print(f"Функция {func.__name__} выполнилась за {execution_time:.3f} секунд.")
+        if not metrics.enabled:
+            return func(*args, **kwargs)
 
-        return result
+        start_time = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metrics.observe(
+                "function_seconds", time.perf_counter() - start_time, function=name
+            )
     return wrapper
 
 
-def create_cacher():
-    """Фабрика функций для кэширования."""
-    cache = {}
+def log_phase(phase):
+    """Декоратор: время функции попадает в гистограмму фазы phase_seconds."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return func(*args, **kwargs)
+
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.observe(
+                    "phase_seconds", time.perf_counter() - start_time, phase=phase
+                )
+        return wrapper
+    return decorator
+
+
+def create_cacher(max_entries=CACHE_MAX_ENTRIES, max_rows=CACHE_MAX_ROWS):
+    """
+    Фабрика LRU-кэша результатов запросов.
 
-    def cache_result(key, value_func):
-        """Кэширует результат выполнения функции."""
-        if key in cache:
-            return cache[key]
+    Кэш ограничен числом записей и суммарным числом строк в результатах.
+    У каждой таблицы есть счетчик версий: invalidate(table) увеличивает
+    его и удаляет из кэша только результаты этой таблицы.
+    """
+    cache = OrderedDict()
+    table_keys = {}
+    versions = {}
+    stats = {
+        "hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "rows": 0,
+    }
 
+    def _weight(result):
+        try:
+            return len(result) + 1
+        except TypeError:
+            return 1
+
+    def _drop(full_key):
+        _, weight = cache.pop(full_key)
+        stats["rows"] -= weight
+        keys = table_keys.get(full_key[0])
+        if keys is not None:
+            keys.discard(full_key)
+
+    def cache_result(table, key, value_func):
+        """Возвращает результат из кэша или вычисляет и кэширует его."""
+        full_key = (table, versions.get(table, 0), key)
+        if full_key in cache:
+            cache.move_to_end(full_key)
+            stats["hits"] += 1
+            return cache[full_key][0]
+
+        stats["misses"] += 1
         result = value_func()
-        cache[key] = result
+        weight = _weight(result)
+        if result is None or weight > max_rows:
+            return result
+
+        cache[full_key] = (result, weight)
+        table_keys.setdefault(table, set()).add(full_key)
+        stats["rows"] += weight
+
+        while len(cache) > max_entries or stats["rows"] > max_rows:
+            _drop(next(iter(cache)))
+            stats["evictions"] += 1
+
         return result
 
+    def contains(table, key):
+        """Есть ли результат в кэше (не меняет статистику и порядок LRU)."""
+        return (table, versions.get(table, 0), key) in cache
+
+    def invalidate(table):
+        """Сбрасывает кэшированные результаты одной таблицы."""
+        versions[table] = versions.get(table, 0) + 1
+        for full_key in list(table_keys.pop(table, ())):
+            _drop(full_key)
+        stats["invalidations"] += 1
+
     def clear_cache():
         """Очищает кэш."""
         cache.clear()
+        table_keys.clear()
+        stats["rows"] = 0
+
+    def get_stats():
+        """Возвращает статистику попаданий, промахов и вытеснений."""
+        return dict(
+            stats, entries=len(cache), max_entries=max_entries, max_rows=max_rows,
+        )
 
-    # Возвращаем обе функции
+    cache_result.contains = contains
+    cache_result.invalidate = invalidate
     cache_result.clear = clear_cache
+    cache_result.stats = get_stats
     return cache_result
@@ -1,15 +1,36 @@
 #!/usr/bin/env python3
 
+import contextlib
 import prompt
 import shlex
+import sys
+import time
+from prettytable import PrettyTable
 from .core import (
-    create_table, drop_table, list_tables, insert, select,
-    update, delete, get_table_info, format_table_output, get_table_schema
+    create_table, drop_table, list_tables, select,
+    update, delete, get_table_info, get_table_schema,
+    create_index, drop_index, set_table_layout, insert_many, explain_select,
+    get_table_layout, iter_select, aggregate, explain_aggregate,
+    get_table_format, explain_order,
 )
-from .utils import load_metadata, save_metadata, load_table_data, save_table_data
-from .parser import parse_where_condition, parse_set_clause, parse_values
-from .decorators import create_cacher
-select_cache = create_cacher ()
+from .constants import (
+    DEFAULT_DURABILITY, WRITE_COMMANDS, COMMANDS, EXPLAIN_COMMANDS,
+    PROFILE_COMMANDS, PROFILE_PHASES, ERROR_EXPLAIN, ERROR_PROFILE,
+    ERROR_TABLE_NOT_FOUND, ERROR_COLUMN_NOT_FOUND, CACHE_MAX_ROWS,
+    BINARY_FORMATS,
+)
+from . import parallel
+from .binary import BinaryTable
+from .join import HashJoin
+from .manager import TableManager
+from .metrics import metrics
+from .storage import insert_entry, update_entry, delete_entry
+from .parser import (
+    parse_where_condition, parse_set_clause, parse_values_list, split_keyword,
+    parse_select, SelectQuery, Aggregate,
+)
+from .loader import iter_batches, iter_file_rows
+from .output import iter_output
 
 def show_help():
     """Показывает справку по командам."""
@@ -24,7 +45,34 @@ def show_help():
         "<command> select from <имя_таблицы> where "
         "<столбец> = <значение> - прочитать записи по условию"
     )
+    print(
+        "<command> insert into <имя_таблицы> values (...), (...) "
+        "- создать несколько записей"
+    )
+    print(
+        "<command> load <имя_таблицы> from <файл.csv|файл.jsonl> "
+        "- загрузить записи из файла"
+    )
     print("<command> select from <имя_таблицы> - прочитать все записи")
+    print(
+        "<command> select from <имя_таблицы> [where <условие>] "
+        "order by <столбец> [asc|desc] - прочитать записи по порядку"
+    )
+    print(
+        "<command> select <столбец>, count(*), sum|avg|min|max(<столбец>) "
+        "from <имя_таблицы> [where <условие>] group by <столбец> "
+        "- агрегаты по группам"
+    )
+    print(
+        "<command> select <столбец1>, <столбец2> from <имя_таблицы> ... "
+        "[limit N [offset M]] [format table|csv|jsonl] - выбрать столбцы, "
+        "часть строк и формат вывода"
+    )
+    print(
+        "<command> select ... from <таблица> [<псевдоним>] join <таблица> "
+        "[<псевдоним>] on <столбец> = <столбец> ... - соединить две таблицы; "
+        "столбцы: <псевдоним>.<столбец>"
+    )
     print(
         "<command> update <имя_таблицы> set <столбец1> = <новое_значение1> where "
         "<столбец_условия> = <значение_условия> - обновить запись"
@@ -34,273 +82,1054 @@ def show_help():
         "<столбец> = <значение> - удалить запись"
     )
     print("<command> info <имя_таблицы> - вывести информацию о таблице")
+    print(
+        "Условие WHERE: =, !=, <, <=, >, >=, in (...), and, or, not, скобки. "
+        "Пример: age >= 18 and (name = \"lock\" or ID in (1, 2))"
+    )
     print(
         "<command> create_table <имя_таблицы> <столбец1:тип> <столбец2:тип> .. "
         "- создать таблицу"
     )
     print("<command> list_tables - показать список всех таблиц")
     print("<command> drop_table <имя_таблицы> - удалить таблицу")
+    print(
+        "<command> create_index <имя_таблицы> <столбец> [using hash|sorted] "
+        "- создать индекс по столбцу"
+    )
+    print("<command> drop_index <имя_таблицы> <столбец> - удалить индекс")
+    print(
+        "<command> set_layout <имя_таблицы> rows|columnar "
+        "- хранить таблицу в памяти по строкам или по столбцам"
+    )
+    print(
+        "<command> set_format <имя_таблицы> jsonl|binary|zlib|lzma "
+        "- хранить таблицу в журнале JSONL или в двоичном файле "
+        "(zlib, lzma - со сжатыми столбцами)"
+    )
+    print(
+        "<command> vacuum <имя_таблицы> - сжать файлы таблицы, убрав "
+        "удаленные и замененные версии строк"
+    )
+    print(
+        "<command> explain select|update|delete ... - план запроса: способ "
+        "доступа, кэш, оценка строк"
+    )
+    print(
+        "<command> profile select|insert|update|delete ... - выполнить "
+        "команду и показать время, строки и байты по фазам"
+    )
+    print("<command> cache_info - статистика кэша выборок")
+    print(
+        "<command> stats [reset|on|off|json <файл>|prometheus <файл>] "
+        "- метрики команд и фаз"
+    )
+    print("<command> flush (checkpoint) - записать изменения на диск")
+    print(
+        "<command> begin / commit / rollback - начать, зафиксировать "
+        "или отменить транзакцию"
+    )
+    print(
+        "<command> durability always|off|<N>ms - политика fsync журнала "
+        "(N мс - групповой коммит)"
+    )
     print("<command> exit - выход из программы")
     print("<command> help - справочная информация")
     print()
 
 
-def run():
+def run(durability=DEFAULT_DURABILITY, auto_vacuum=False):
     """Основной цикл программы."""
     show_help()
+    manager = TableManager(durability=durability, auto_vacuum=auto_vacuum)
+
+    try:
+        _loop(manager)
+    finally:
+        manager.close()
 
+
+def run_script(stream, durability=DEFAULT_DURABILITY, auto_vacuum=False):
+    """
+    Выполняет команды из файла или stdin без интерактивного ввода.
+
+    Пустые строки и комментарии (# или --) пропускаются. Данные
+    держатся в памяти весь сценарий и записываются один раз в конце.
+    """
+    manager = TableManager(
+        flush_every=0, flush_interval=0, durability=durability,
+        auto_vacuum=auto_vacuum,
+    )
+    executed = 0
+    start_time = time.monotonic()
+
+    try:
+        for line in iter(stream.readline, ''):
+            command = line.strip()
+            if not command or command.startswith(('#', '--')):
+                continue
+
+            executed += 1
+            if not execute_command(manager, command):
+                break
+    finally:
+        manager.close()
+
+    elapsed = time.monotonic() - start_time
+    rate = executed / elapsed if elapsed > 0 else 0
+    print(
+        f"Выполнено команд: {executed} за {elapsed:.2f} с "
+        f"({rate:.0f} команд/с)."
+    )
+
+
+def _loop(manager):
+    """Читает и выполняет команды, пока не будет введен exit."""
     while True:
+        manager.idle()
         try:
             user_input = prompt.string("Введите команду: ")
-            if not user_input.strip():
-                continue
+        except EOFError:
+            break
+
+        if not execute_command(manager, user_input):
+            break
+
+
+def execute_command(manager, user_input):
+    """Выполняет одну команду. Возвращает False, если введен exit."""
+    if not metrics.enabled:
+        return _run_command(manager, user_input)
+
+    words = user_input.split(None, 1)
+    command = words[0].lower() if words else ""
+    if command not in COMMANDS:
+        # Метка только из известных команд, чтобы не плодить ряды
+        command = "unknown"
+
+    start_time = time.perf_counter()
+    try:
+        return _run_command(manager, user_input, command)
+    finally:
+        metrics.inc("commands_total", command=command)
+        metrics.observe(
+            "command_seconds", time.perf_counter() - start_time, command=command
+        )
+
+
+def _gauges(manager):
+    """Текущие значения кэша выборок и журнала для вывода статистики."""
+    gauges = {
+        f"select_cache_{name}": value
+        for name, value in manager.select_cache.stats().items()
+    }
+    gauges["wal_commits"] = manager.wal.commits
+    gauges["wal_fsyncs"] = manager.wal.fsyncs
+    return gauges
+
+
+def show_stats(manager):
+    """Печатает метрики: счетчики, задержки и состояние кэша."""
+    if not metrics.enabled:
+        print("Сбор метрик выключен (stats on - включить).")
+
+    counters = metrics.counters()
+    if counters:
+        table = PrettyTable()
+        table.field_names = ["счетчик", "метки", "значение"]
+        for name, labels, value in counters:
+            table.add_row([name, _format_labels(labels), value])
+        table.align = "l"
+        print(table)
+
+    histograms = metrics.histograms()
+    if histograms:
+        table = PrettyTable()
+        table.field_names = [
+            "задержка", "метки", "число", "среднее мс", "p50 мс", "p95 мс",
+            "p99 мс",
+        ]
+        for name, labels, histogram in histograms:
+            table.add_row([
+                name,
+                _format_labels(labels),
+                histogram.count,
+                f"{histogram.sum / histogram.count * 1000:.3f}",
+                f"{histogram.quantile(0.50) * 1000:g}",
+                f"{histogram.quantile(0.95) * 1000:g}",
+                f"{histogram.quantile(0.99) * 1000:g}",
+            ])
+        table.align = "l"
+        print(table)
+
+    for name, value in _gauges(manager).items():
+        print(f"{name}: {value}")
+
+
+def _format_labels(labels):
+    return ", ".join(f"{key}={value}" for key, value in labels.items())
+
+
+def _select_cache_key(query):
+    key = f"{query.where}|{query.order_by}|{query.limit}|{query.offset}"
+    if _aggregates(query):
+        key += f"|{[str(item) for item in query.columns or []]}|{query.group_by}"
+    return key
+
+
+def _aggregates(query):
+    """Агрегатный ли запрос: есть GROUP BY или агрегатные функции."""
+    return query.group_by is not None or any(
+        isinstance(item, Aggregate) for item in query.columns or []
+    )
+
+
+def _output_columns(schema, query):
+    """Столбцы вывода select: из списка запроса или все столбцы схемы."""
+    names = [name for name, _ in schema]
+    if query.columns is None:
+        return names
+
+    for column in query.columns:
+        if column not in names:
+            raise ValueError(ERROR_COLUMN_NOT_FOUND.format(column, query.table))
+    return query.columns
+
+
+def _join(manager, query):
+    """
+    Соединение таблиц из FROM ... JOIN запроса.
+
+    Проверяет, что обе таблицы существуют, и столбцы вывода и ORDER BY
+    (кроме агрегатов - их проверяет aggregate).
+    """
+    for table_name in (query.table, query.join.table):
+        if table_name not in list_tables(manager.metadata):
+            raise ValueError(ERROR_TABLE_NOT_FOUND.format(table_name))
+
+    relation = HashJoin(
+        manager.get_table(query.table), manager.get_table(query.join.table),
+        query.join,
+    )
+    if not _aggregates(query):
+        relation.check_columns(query.columns or [])
+        if query.order_by is not None:
+            relation.check_columns([query.order_by[0]])
+    return relation
+
+
+def _streams(table_data, query):
+    """
+    Выводить ли результат потоково, минуя кэш выборок.
+
+    Так выводятся выборки без LIMIT, которые по оценке больше предела
+    кэша: кэш их все равно не сохранил бы, а собирать их в памяти
+    ради вывода незачем.
+    """
+    return query.limit is None and table_data.estimate(query.where) > CACHE_MAX_ROWS
+
+
+def _parse_query(query):
+    """
+    Разбирает select, update или delete для explain.
+
+    Возвращает (команда, SelectQuery); для update и delete в нем
+    заполнены только таблица и условие WHERE.
+    """
+    parts = shlex.split(query)
+    command = parts[0].lower() if parts else ""
+    if command not in EXPLAIN_COMMANDS:
+        raise ValueError(ERROR_EXPLAIN)
+    if command == "select":
+        return command, parse_select(query)
+
+    # update <таблица> ..., delete from <таблица> ...
+    if command == "update" and len(parts) >= 2:
+        table_name = parts[1]
+    elif len(parts) >= 3 and parts[1].lower() == "from":
+        table_name = parts[2]
+    else:
+        raise ValueError(ERROR_EXPLAIN)
+
+    where_parts = split_keyword(query, "where")
+    where_clause = parse_where_condition(where_parts[1]) if where_parts else None
+    return command, SelectQuery(table_name, None, where_clause, None, None, 0, None)
+
+
+def _explain_segments(table_data, where_clause):
+    """Сколько сегментов двоичного файла пропустит запрос (для explain)."""
+    total = len(table_data.zones)
+    if not total:
+        return "карт зон нет: просматриваются все строки"
+    described = f"{total} по {table_data.segment_rows} строк"
+    if where_clause is None:
+        return f"{described}, просматриваются все"
+    if table_data.access_path(where_clause)[0] != "scan":
+        return f"{described}, не нужны: доступ по первичному ключу"
+    _, skipped = table_data.segments(where_clause)
+    return (
+        f"{described}, пропущено по картам зон: {skipped}, "
+        f"изменено после снимка: {len(table_data.changed_segments)}"
+    )
+
+
+def _explain_parallel(table_data, where_clause):
+    """Будет ли просмотр двоичной таблицы идти в пуле процессов (для explain)."""
+    if not parallel.worker_count():
+        return "выключен"
+    plan = table_data.parallel_segments(where_clause)
+    if plan is None:
+        return "нет: просмотр короткий или по первичному ключу"
+    ranges, _, workers = plan
+    return f"процессов: {workers}, частей: {len(ranges)}"
+
+
+def show_plan(manager, query_text):
+    """Печатает план select, update или delete, не выполняя запрос."""
+    command, query = _parse_query(query_text)
+    if command == "select" and query.join is not None:
+        _show_join_plan(manager, query)
+        return
+
+    table_name = query.table
+    metadata = manager.metadata
+    if table_name not in list_tables(metadata):
+        raise ValueError(ERROR_TABLE_NOT_FOUND.format(table_name))
+
+    storage_format = get_table_format(metadata, table_name)
+    if manager.is_loaded(table_name):
+        source = "в памяти"
+    elif storage_format == "binary":
+        source = (
+            f"отображение файла {manager.table_file(table_name)}.bin в память "
+            f"(журнал изменений: {manager.log_size(table_name)} байт)"
+        )
+    elif storage_format in BINARY_FORMATS:
+        source = (
+            f"сжатый файл {manager.table_file(table_name)}.bin, столбцы "
+            f"распаковываются при первом обращении "
+            f"(журнал изменений: {manager.log_size(table_name)} байт)"
+        )
+    else:
+        source = f"загрузка с диска (журнал: {manager.log_size(table_name)} байт)"
+
+    if storage_format in BINARY_FORMATS:
+        layout = storage_format
+    else:
+        layout = get_table_layout(metadata, table_name)
+    plan = [
+        ("Запрос", command),
+        ("Таблица", f"{table_name} ({layout})"),
+        ("Данные", source),
+    ]
+    table_data = manager.get_table(table_name)
+    if isinstance(table_data, BinaryTable):
+        mapped = ", ".join(table_data.mapped_columns) or "нет"
+        plan.append(("Столбцы из файла", mapped))
+        plan.append(("Сегменты", _explain_segments(table_data, query.where)))
+        plan.append((
+            "Параллельный просмотр", _explain_parallel(table_data, query.where)
+        ))
+    if command == "select":
+        if _streams(table_data, query) and not _aggregates(query):
+            cache = "не используется: результат выводится потоково"
+        elif manager.select_cache.contains(table_name, _select_cache_key(query)):
+            cache = "попадание: результат берется из кэша"
+        else:
+            cache = "промах"
+        plan.append(("Кэш выборок", cache))
+
+    if _aggregates(query):
+        plan.extend(explain_select(table_data, query.where))
+        plan.append(("Агрегация", explain_aggregate(
+            table_data, query.columns, query.where, query.group_by
+        )))
+    else:
+        plan.extend(explain_select(
+            table_data, query.where, query.order_by, query.limit, query.offset
+        ))
+    if command == "select":
+        columns = [str(item) for item in query.columns or ["все"]]
+        plan.append(("Столбцы", ", ".join(columns)))
+        plan.append(("Вывод", query.output_format))
+    else:
+        plan.append((
+            "Запись",
+            f"журнал упреждающей записи (durability {manager.wal.policy}), "
+            "журнал таблицы - при контрольной точке",
+        ))
+
+    for name, value in plan:
+        print(f"{name}: {value}")
+
+
+def _show_join_plan(manager, query):
+    """Печатает план select с соединением таблиц."""
+    relation = _join(manager, query)
+    plan = [("Запрос", "select"), ("Таблицы", relation.name)]
+    for alias, table_data in relation.sides:
+        if manager.is_loaded(table_data.name):
+            source = "в памяти"
+        else:
+            size = manager.log_size(table_data.name)
+            source = f"загрузка с диска (журнал: {size} байт)"
+        plan.append((f"Данные ({alias})", source))
+    plan.append(("Кэш выборок", "не используется: соединение"))
+    plan.extend(relation.explain(query.where))
+
+    if _aggregates(query):
+        plan.append(("Агрегация", explain_aggregate(
+            relation, query.columns, query.where, query.group_by
+        )))
+    else:
+        plan.extend(explain_order(query.order_by, query.limit, query.offset))
+    columns = [str(item) for item in query.columns or ["все"]]
+    plan.append(("Столбцы", ", ".join(columns)))
+    plan.append(("Вывод", query.output_format))
+
+    for name, value in plan:
+        print(f"{name}: {value}")
 
-            # Разбиваем ввод на команду и аргументы
+
+class _CountingWriter:
+    """Пропускает вывод в stdout и считает его объем в байтах."""
+
+    def __init__(self, target):
+        self.target = target
+        self.bytes = 0
+
+    def write(self, text):
+        self.bytes += len(text.encode('utf-8'))
+        return self.target.write(text)
+
+    def flush(self):
+        self.target.flush()
+
+
+def show_profile(manager, query):
+    """
+    Выполняет команду и печатает её профиль.
+
+    Время, строки (просмотренные, возвращенные, измененные) и байты
+    чтения и записи считаются по фазам из метрик, собранных только за
+    время этой команды; остаток времени показан как "прочее".
+    """
+    words = query.split(None, 1)
+    if not words or words[0].lower() not in PROFILE_COMMANDS:
+        raise ValueError(ERROR_PROFILE)
+
+    hits = manager.select_cache.stats()["hits"]
+    writer = _CountingWriter(sys.stdout)
+    with metrics.capture() as capture:
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(writer):
+            execute_command(manager, query)
+        elapsed = time.perf_counter() - start_time
+
+    phases = {
+        labels["phase"]: histogram
+        for name, labels, histogram in capture.histograms()
+        if name == "phase_seconds"
+    }
+    table = PrettyTable()
+    table.field_names = ["фаза", "вызовов", "мс", "доля", "прочитано байт",
+                         "записано байт"]
+    accounted = 0.0
+    for phase in PROFILE_PHASES + sorted(set(phases) - set(PROFILE_PHASES)):
+        histogram = phases.get(phase)
+        read = capture.total("bytes_read_total", phase=phase)
+        written = capture.total("bytes_written_total", phase=phase)
+        if histogram is None and not read and not written:
+            continue
+        seconds = histogram.sum if histogram is not None else 0.0
+        accounted += seconds
+        table.add_row([
+            phase,
+            histogram.count if histogram is not None else 0,
+            f"{seconds * 1000:.3f}",
+            f"{seconds / elapsed:.0%}" if elapsed > 0 else "-",
+            read,
+            written,
+        ])
+    other = max(elapsed - accounted, 0.0)
+    table.add_row([
+        "прочее", "", f"{other * 1000:.3f}",
+        f"{other / elapsed:.0%}" if elapsed > 0 else "-", "", "",
+    ])
+    table.align = "l"
+
+    print(f"Время выполнения: {elapsed * 1000:.3f} мс")
+    print(
+        f"Строк просмотрено: {capture.total('rows_scanned_total')}, "
+        f"возвращено: {capture.total('rows_returned_total')}, "
+        f"изменено: {capture.total('rows_affected_total')}"
+    )
+    if words[0].lower() == "select":
+        hit = manager.select_cache.stats()["hits"] > hits
+        print(f"Кэш выборок: {'попадание' if hit else 'промах'}")
+    print(f"Вывод: {writer.bytes} байт")
+    print(table)
+
+
+def _run_command(manager, user_input, command_label=None):
+    """Разбирает и выполняет команду (без учета в метриках команд)."""
+    try:
+        if not user_input.strip():
+            return True
+
+        # Разбиваем ввод на команду и аргументы
+        with metrics.timer("phase_seconds", phase="parse"):
             parts = shlex.split(user_input)
-            command = parts[0].lower()
-            args = parts[1:]
+        command = parts[0].lower()
+        args = parts[1:]
 
-            # Загружаем актуальные метаданные
-            metadata = load_metadata()
+        # Писатели по очереди, читатели видят последнюю опубликованную версию
+        if command in WRITE_COMMANDS:
+            manager.acquire_write()
+        else:
+            manager.refresh()
 
-            if command == "exit":
-                print("Выход из программы...")
-                break
+        # Метаданные сессии
+        metadata = manager.metadata
 
-            elif command == "help":
-                show_help()
+        if command == "exit":
+            if manager.in_transaction:
+                manager.rollback()
+                print("Незавершенная транзакция отменена.")
+            print("Выход из программы...")
+            return False
 
-            # CRUD операции
-            elif command == "insert":
-                if (
-                    len(args) < 4
-                    or args[0].lower() != "into"
-                    or args[2].lower() != "values"
-                ):
-                    print(
-                        "Ошибка: Используйте: insert into <таблица> "
-                        "values (<значение1>, <значение2>, ...)"
-                    )
-                    continue
+        elif command == "help":
+            show_help()
+
+        elif command == "set_layout":
+            if len(args) != 2:
+                print("Ошибка: Используйте: set_layout <имя_таблицы> rows|columnar")
+                return True
 
-                table_name = args[1]
-                values_str = ' '.join(args[3:])
+            table_name, layout = args[0], args[1].lower()
+            metadata = set_table_layout(metadata, table_name, layout)
+            if metadata is None:
+                return True
+            manager.set_metadata(metadata)
+            manager.reload_table(table_name)
 
-                try:
-                    # Загружаем данные таблицы
-                    table_data = load_table_data(table_name)
+            try:
+                manager.get_table(table_name)
+            except ValueError as e:
+                # Данные не укладываются в типы столбцов - оставляем строки
+                manager.set_metadata(
+                    set_table_layout(metadata, table_name, "rows")
+                )
+                manager.forget_table(table_name)
+                print(f"Ошибка: {e}")
+                return True
 
-                    # Парсим значения
-                    values = parse_values(values_str)
+            print(f'Таблица "{table_name}" хранится в представлении {layout}.')
 
-                    # Вставляем новую запись
-                    metadata = load_metadata()
-                    new_record = insert(metadata, table_name, values)
+        elif command == "set_format":
+            if len(args) != 2:
+                print(
+                    "Ошибка: Используйте: "
+                    "set_format <имя_таблицы> jsonl|binary|zlib|lzma"
+                )
+                return True
 
-                    # Генерируем ID (максимальный ID + 1)
-                    if table_data:
-                        max_id = max(record.get('ID', 0) for record in table_data)
-                        new_record['ID'] = max_id + 1
-                    else:
-                        new_record['ID'] = 1
+            table_name, storage_format = args[0], args[1].lower()
+            try:
+                manager.convert_table(table_name, storage_format)
+            except ValueError as e:
+                print(f"Ошибка: {e}")
+                return True
+
+            print(f'Таблица "{table_name}" хранится в формате {storage_format}.')
+
+        elif command == "vacuum":
+            if len(args) != 1:
+                print("Ошибка: Используйте: vacuum <имя_таблицы>")
+                return True
+
+            table_name = args[0]
+            if table_name not in list_tables(metadata):
+                print(f"Ошибка: {ERROR_TABLE_NOT_FOUND.format(table_name)}")
+                return True
+            try:
+                reclaimed, size_before, size_after = manager.vacuum(table_name)
+            except ValueError as e:
+                print(f"Ошибка: {e}")
+                return True
 
+            print(
+                f'Таблица "{table_name}" сжата: мертвых строк убрано: '
+                f"{reclaimed}, файлы: {size_before} -> {size_after} байт."
+            )
+
+        elif command == "explain":
+            if not args:
+                print(f"Ошибка: {ERROR_EXPLAIN}")
+                return True
+
+            try:
+                show_plan(manager, user_input.split(None, 1)[1])
+            except ValueError as e:
+                print(f"Ошибка: {e}")
+                return True
+
+        elif command == "profile":
+            if not args:
+                print(f"Ошибка: {ERROR_PROFILE}")
+                return True
+
+            try:
+                show_profile(manager, user_input.split(None, 1)[1])
+            except ValueError as e:
+                print(f"Ошибка: {e}")
+                return True
+
+        elif command == "cache_info":
+            for name, value in manager.select_cache.stats().items():
+                print(f"{name}: {value}")
+
+        elif command == "stats":
+            if not args:
+                show_stats(manager)
+            elif args[0].lower() == "reset" and len(args) == 1:
+                metrics.reset()
+                print("Метрики сброшены.")
+            elif args[0].lower() in ("on", "off") and len(args) == 1:
+                metrics.enabled = args[0].lower() == "on"
+                state = "включен" if metrics.enabled else "выключен"
+                print(f"Сбор метрик {state}.")
+            elif args[0].lower() in ("json", "prometheus") and len(args) == 2:
+                if args[0].lower() == "json":
+                    text = metrics.to_json(_gauges(manager))
+                else:
+                    text = metrics.to_prometheus(_gauges(manager))
+                with open(args[1], 'w', encoding='utf-8') as file:
+                    file.write(text)
+                print(f"Метрики записаны в {args[1]}.")
+            else:
+                print(
+                    "Ошибка: Используйте: stats [reset|on|off|"
+                    "json <файл>|prometheus <файл>]"
+                )
+                return True
+
+        elif command in ("flush", "checkpoint"):
+            manager.flush()
+            print("Изменения записаны на диск.")
+
+        elif command == "begin":
+            try:
+                manager.begin()
+                print("Транзакция начата.")
+            except ValueError as e:
+                print(f"Ошибка: {e}")
+                return True
+
+        elif command == "commit":
+            if not manager.in_transaction:
+                print("Ошибка: Нет открытой транзакции.")
+                return True
+            changes = manager.commit()
+            print(f"Транзакция зафиксирована. Изменений: {changes}")
+
+        elif command == "rollback":
+            try:
+                changes = manager.rollback()
+                print(f"Транзакция отменена. Изменений: {changes}")
+            except ValueError as e:
+                print(f"Ошибка: {e}")
+                return True
+
+        elif command == "durability":
+            if len(args) > 1:
+                print("Ошибка: Используйте: durability [always|off|<N>ms]")
+                return True
+
+            try:
+                if args:
+                    manager.set_durability(args[0])
+                for name, value in manager.wal.stats().items():
+                    print(f"{name}: {value}")
+            except ValueError as e:
+                print(f"Ошибка: {e}")
+                return True
+
+        # CRUD операции
+        elif command == "insert":
+            if (
+                len(args) < 4
+                or args[0].lower() != "into"
+                or args[2].lower() != "values"
+            ):
+                print(
+                    "Ошибка: Используйте: insert into <таблица> "
+                    "values (<значение1>, <значение2>, ...)"
+                )
+                return True
+
+            table_name = args[1]
+            values_str = split_keyword(user_input, "values")[1]
+
+            try:
+                # Загружаем данные таблицы
+                table_data = manager.get_table(table_name)
+
+                # Парсим один или несколько наборов значений
+                rows = parse_values_list(values_str)
+
+                # Вставляем записи, ID выдает счетчик таблицы
+                new_records = insert_many(metadata, table_name, rows)
+                if new_records is None:
+                    return True
+
+                for new_record in new_records:
                     table_data.append(new_record)
-                    save_table_data(table_name, table_data)
+                manager.set_metadata(metadata)
+                manager.record_many(
+                    table_name, [insert_entry(record) for record in new_records]
+                )
 
+                if len(new_records) == 1:
                     print(
-                        f'Запись с ID={new_record["ID"]} успешно '
+                        f'Запись с ID={new_records[0]["ID"]} успешно '
                         f'добавлена в таблицу "{table_name}". '
                     )
+                else:
+                    print(
+                        f'В таблицу "{table_name}" добавлено записей: '
+                        f'{len(new_records)} (ID {new_records[0]["ID"]}'
+                        f'-{new_records[-1]["ID"]}).'
+                    )
 
-                except ValueError as e:
-                    print(f"Ошибка: {e}")
+            except ValueError as e:
+                print(f"Ошибка: {e}")
 
-            elif command == "select":
-                if len(args) < 2 or args[0].lower() != "from":
-                    print(
-                        "Ошибка: Используйте: select from <таблица> "
-                        "[where <условие>]"
+        elif command == "load":
+            if len(args) != 3 or args[1].lower() != "from":
+                print(
+                    "Ошибка: Используйте: load <таблица> from "
+                    "<файл.csv|файл.jsonl>"
+                )
+                return True
+
+            table_name, filepath = args[0], args[2]
+            schema = get_table_schema(metadata, table_name)
+            if schema is None:
+                return True
+
+            table_data = manager.get_table(table_name)
+            loaded = 0
+            start_time = time.monotonic()
+
+            try:
+                # Файл читается потоково, каждая пачка пишется одним блоком
+                rows = iter_file_rows(filepath, schema)
+                for batch in iter_batches(rows):
+                    new_records = insert_many(metadata, table_name, batch)
+                    if new_records is None:
+                        break
+
+                    for new_record in new_records:
+                        table_data.append(new_record)
+                    manager.set_metadata(metadata)
+                    manager.record_many(
+                        table_name,
+                        [insert_entry(record) for record in new_records],
+                    )
+                    if not manager.in_transaction:
+                        manager.flush()
+                    loaded += len(new_records)
+
+            except (ValueError, OSError) as e:
+                print(f"Ошибка: {e}")
+
+            elapsed = time.monotonic() - start_time
+            rate = loaded / elapsed if elapsed > 0 else 0
+            print(
+                f'Загружено записей в таблицу "{table_name}": {loaded} '
+                f'за {elapsed:.2f} с ({rate:.0f} записей/с).'
+            )
+
+        elif command == "select":
+            try:
+                query = parse_select(user_input)
+            except ValueError as e:
+                print(f"Ошибка: {e}")
+                return True
+
+            schema = get_table_schema(metadata, query.table)
+            if schema is None:
+                return True
+
+            try:
+                if query.join is not None:
+                    # Соединение не кэшируется: оно зависит от двух таблиц
+                    relation = _join(manager, query)
+                    if _aggregates(query):
+                        result_data = aggregate(
+                            relation, query.columns, query.where,
+                            query.group_by, query.order_by, query.limit,
+                            query.offset,
+                        )
+                        if result_data is None:
+                            return True
+                        columns = [
+                            str(item) for item in query.columns or query.group_by
+                        ]
+                        chunks = [result_data]
+                    else:
+                        columns = query.columns or relation.output_columns
+                        chunks = iter_select(
+                            relation, query.where, query.order_by, query.limit,
+                            query.offset, columns,
                         )
-                    continue
-                table_name = args[1]
-                where_clause = None
-
-                # Обрабатываем WHERE если есть
-                if len(args) > 2 and args[2].lower() == "where":
-                    where_str = ' '.join(args[3:])
-                    try:
-                        where_clause = parse_where_condition(where_str)
-                    except ValueError as e:
-                        print(f"Ошибка: {e}")
-                        continue
-
-                try:
-                    # Загружаем данные таблицы
-                    table_data = load_table_data(table_name)
-                    metadata = load_metadata()
-
-                    cache_key = f"{table_name}:{str(where_clause)}"
+                    for page in iter_output(chunks, columns, query.output_format):
+                        print(page)
+                    return True
 
-                    def get_selected_data():
-                        return select(table_data, where_clause)
+                # Загружаем данные таблицы
+                table_data = manager.get_table(query.table)
 
-                    # Выбираем данные
-                    result_data = select_cache(cache_key, get_selected_data)
+                if _aggregates(query):
+                    def get_aggregated():
+                        return aggregate(
+                            table_data, query.columns, query.where,
+                            query.group_by, query.order_by, query.limit,
+                            query.offset,
+                        )
 
-                    # Форматируем вывод
-                    schema = get_table_schema(metadata, table_name)
-                    table_output = format_table_output(result_data, schema)
-                    print(table_output)
+                    # Агрегаты считаются за один проход; в кэш идет итог
+                    result_data = manager.select_cache(
+                        query.table, _select_cache_key(query), get_aggregated
+                    )
+                    if result_data is None:
+                        return True
+                    columns = [str(item) for item in query.columns or query.group_by]
+                    chunks = [result_data]
+                elif _streams(table_data, query):
+                    columns = _output_columns(schema, query)
+                    # Большой результат идет страницами, не собираясь в памяти
+                    chunks = iter_select(
+                        table_data, query.where, query.order_by, query.limit,
+                        query.offset, columns,
+                    )
+                else:
+                    columns = _output_columns(schema, query)
 
-                except ValueError as e:
-                    print(f"Ошибка: {e}")
+                    def get_selected_data():
+                        return select(
+                            table_data, query.where, query.order_by,
+                            query.limit, query.offset,
+                        )
 
-            elif command == "update":
-                if (
-                    len(args) < 6
-                    or args[1].lower() != "set"
-                    or "where" not in [arg.lower() for arg in args]
-                ):
-                    print(
-                        "Ошибка: Используйте: update <таблица> set "
-                        "<столбец>=<значение> where <условие>"
+                    # Выбираем данные (кэш сбрасывается при изменении таблицы)
+                    result_data = manager.select_cache(
+                        query.table, _select_cache_key(query), get_selected_data
                     )
-                    continue
+                    chunks = [result_data or []]
+
+                # Выводим по страницам
+                for page in iter_output(chunks, columns, query.output_format):
+                    print(page)
 
-                table_name = args[0]
+            except ValueError as e:
+                print(f"Ошибка: {e}")
 
-                # Находим индексы SET и WHERE
-                set_index = args.index("set") if "set" in args else args.index("SET")
-                where_index = (
-                    args.index("where")
-                    if "where" in args
-                    else args.index("WHERE")
+        elif command == "update":
+            # SET и WHERE берутся из исходного текста: в args кавычки уже сняты
+            where_parts = split_keyword(user_input, "where")
+            set_parts = (
+                split_keyword(where_parts[0], "set")
+                if where_parts is not None else None
+            )
+            if len(args) < 6 or args[1].lower() != "set" or set_parts is None:
+                print(
+                    "Ошибка: Используйте: update <таблица> set "
+                    "<столбец>=<значение> where <условие>"
                 )
+                return True
 
-                set_str = ' '.join(args[set_index+1:where_index])
-                where_str = ' '.join(args[where_index+1:])
+            table_name = args[0]
+            set_str = set_parts[1]
+            where_str = where_parts[1]
 
-                try:
-                    # Парсим условия
-                    set_clause = parse_set_clause(set_str)
-                    where_clause = parse_where_condition(where_str)
+            try:
+                # Парсим условия
+                set_clause = parse_set_clause(set_str)
+                where_clause = parse_where_condition(where_str)
 
-                    # Загружаем данные таблицы
-                    table_data = load_table_data(table_name)
-                    metadata = load_metadata()
+                # Загружаем данные таблицы
+                table_data = manager.get_table(table_name)
 
-                    # Обновляем данные
-                    updated_data, updated_count = update(
-                        table_data,
-                        set_clause,
-                        where_clause
-                    )
-                    save_table_data(table_name, updated_data)
+                # Обновляем данные
+                result = update(table_data, set_clause, where_clause)
+                if result is None:
+                    return True
 
-                    print(
-                        f'Записей в таблице "{table_name}" успешно '
-                        f'обновлено: {updated_count}'
+                updated_data, updated_ids = result
+                if updated_ids:
+                    manager.record(
+                        table_name, update_entry(updated_ids, set_clause)
                     )
 
-                except ValueError as e:
-                    print(f"Ошибка: {e}")
+                print(
+                    f'Записей в таблице "{table_name}" успешно '
+                    f'обновлено: {len(updated_ids)}'
+                )
 
-            elif command == "delete":
-                if (
-                    len(args) < 3
-                    or args[0].lower() != "from"
-                    or args[2].lower() != "where"
-                ):
-                    print(
-                        "Ошибка: Используйте: delete from <таблица> "
-                        "where <условие>"
-                    )
-                    continue
+            except ValueError as e:
+                print(f"Ошибка: {e}")
 
-                table_name = args[1]
-                where_str = ' '.join(args[3:])
+        elif command == "delete":
+            if (
+                len(args) < 3
+                or args[0].lower() != "from"
+                or args[2].lower() != "where"
+            ):
+                print(
+                    "Ошибка: Используйте: delete from <таблица> "
+                    "where <условие>"
+                )
+                return True
 
-                try:
-                    # Парсим условие
-                    where_clause = parse_where_condition(where_str)
+            table_name = args[1]
+            where_str = split_keyword(user_input, "where")[1]
 
-                    # Загружаем данные таблицы
-                    table_data = load_table_data(table_name)
+            try:
+                # Парсим условие
+                where_clause = parse_where_condition(where_str)
 
-                    # Удаляем данные
-                    remaining_data, deleted_count = delete(table_data, where_clause)
-                    save_table_data(table_name, remaining_data)
+                # Загружаем данные таблицы
+                table_data = manager.get_table(table_name)
 
-                    print(f'Записей удалено из таблицы "{table_name}": {deleted_count}')
+                # Удаляем данные
+                result = delete(table_data, where_clause)
+                if result is None:
+                    return True
 
-                except ValueError as e:
-                    print(f"Ошибка: {e}")
+                table_data, deleted_ids = result
+                if deleted_ids:
+                    manager.record(table_name, delete_entry(deleted_ids))
 
-            elif command == "info":
-                if len(args) != 1:
-                    print("Ошибка: Используйте: info <имя_таблицы>")
-                    continue
+                print(
+                    f'Записей удалено из таблицы "{table_name}": '
+                    f'{len(deleted_ids)}'
+                )
 
-                table_name = args[0]
+            except ValueError as e:
+                print(f"Ошибка: {e}")
 
-                try:
-                    metadata = load_metadata()
-                    table_data = load_table_data(table_name)
-                    info = get_table_info(metadata, table_data, table_name)
-                    print(info)
+        elif command == "info":
+            if len(args) != 1:
+                print("Ошибка: Используйте: info <имя_таблицы>")
+                return True
 
-                except ValueError as e:
-                    print(f"Ошибка: {e}")
+            table_name = args[0]
 
-            # Команды управления таблицами (из предыдущей версии)
-            elif command == "create_table":
-                if len(args) < 2:
-                    print(
-                        "Ошибка: Недостаточно аргументов. " \
-                        "Используйте: create_table <имя> <столбец1:тип> ..."
-                    )
-                    continue
+            try:
+                table_data = manager.get_table(table_name)
+                info = get_table_info(metadata, table_data, table_name)
+                print(info)
 
-                table_name = args[0]
-                columns = args[1:]
+            except ValueError as e:
+                print(f"Ошибка: {e}")
 
-                try:
-                    metadata = create_table(metadata, table_name, columns)
-                    save_metadata(metadata)
-                    column_list = ", ".join(metadata[table_name])
-                    print(
-                        f'Таблица "{table_name}" успешно создана '
-                        f'со столбцами: {column_list}'
-                    )
-                except ValueError as e:
-                    print(f"Ошибка: {e}")
-
-            elif command == "list_tables":
-                tables = list_tables(metadata)
-                if tables:
-                    for table in tables:
-                        print(f"- {table}")
-                else:
-                    print("Нет созданных таблиц.")
+        # Команды управления таблицами (из предыдущей версии)
+        elif command == "create_table":
+            if len(args) < 2:
+                print(
+                    "Ошибка: Недостаточно аргументов. " \
+                    "Используйте: create_table <имя> <столбец1:тип> ..."
+                )
+                return True
 
-            elif command == "drop_table":
-                if len(args) != 1:
-                    print("Ошибка: Используйте: drop_table <имя_таблицы>")
-                    continue
+            table_name = args[0]
+            columns = args[1:]
 
-                table_name = args[0]
-                try:
-                    metadata = drop_table(metadata, table_name)
-                    save_metadata(metadata)
-                    print(f'Таблица "{table_name}" успешно удалена.')
-                except ValueError as e:
-                    print(f"Ошибка: {e}")
+            try:
+                metadata = create_table(metadata, table_name, columns)
+                if metadata is None:
+                    return True
+                manager.set_metadata(metadata)
+                column_list = ", ".join(metadata[table_name])
+                print(
+                    f'Таблица "{table_name}" успешно создана '
+                    f'со столбцами: {column_list}'
+                )
+            except ValueError as e:
+                print(f"Ошибка: {e}")
 
+        elif command == "list_tables":
+            tables = list_tables(metadata)
+            if tables:
+                for table in tables:
+                    print(f"- {table}")
             else:
-                print(f"Функции '{command}' нет. Попробуйте снова.")
+                print("Нет созданных таблиц.")
+
+        elif command == "drop_table":
+            if len(args) != 1:
+                print("Ошибка: Используйте: drop_table <имя_таблицы>")
+                return True
+
+            table_name = args[0]
+            try:
+                metadata = drop_table(metadata, table_name)
+                if metadata is None:
+                    return True
+                manager.set_metadata(metadata)
+                manager.forget_table(table_name)
+                print(f'Таблица "{table_name}" успешно удалена.')
+            except ValueError as e:
+                print(f"Ошибка: {e}")
+
+        elif command == "create_index":
+            if len(args) not in (2, 4) or (
+                len(args) == 4 and args[2].lower() != "using"
+            ):
+                print(
+                    "Ошибка: Используйте: create_index <имя_таблицы> "
+                    "<столбец> [using hash|sorted]"
+                )
+                return True
+
+            table_name, column = args[:2]
+            kind = args[3].lower() if len(args) == 4 else "hash"
+            metadata = create_index(metadata, table_name, column, kind)
+            if metadata is None:
+                return True
+            manager.set_metadata(metadata)
+            manager.get_table(table_name).add_index(column, kind)
+            print(
+                f'Индекс ({kind}) по столбцу "{column}" '
+                f'таблицы "{table_name}" создан.'
+            )
+
+        elif command == "drop_index":
+            if len(args) != 2:
+                print("Ошибка: Используйте: drop_index <имя_таблицы> <столбец>")
+                return True
+
+            table_name, column = args
+            metadata = drop_index(metadata, table_name, column)
+            if metadata is None:
+                return True
+            manager.set_metadata(metadata)
+            manager.get_table(table_name).drop_index(column)
+            print(f'Индекс по столбцу "{column}" таблицы "{table_name}" удален.')
+
+        else:
+            print(f"Функции '{command}' нет. Попробуйте снова.")
+            return True
+
+        manager.operation_done()
+
+    except Exception as e:
+        metrics.inc("command_errors_total", command=command_label or "unknown")
+        print(f"Произошла ошибка: {e}. Попробуйте снова.")
 
-        except Exception as e:
-            print(f"Произошла ошибка: {e}. Попробуйте снова.")
+    return True
 
 
 def welcome():
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+from .constants import WHERE_CACHE_SIZE
+
+# Лексемы условия WHERE
+_TOKEN_RE = re.compile(
+    r"""
+    \s*(?:
+        (?P<string>"[^"]*"|'[^']*')
+      | (?P<op><=|>=|!=|<>|=|<|>)
+      | (?P<punct>[(),])
+      | (?P<param>\?(?![^\s()<>=!,"']))
+      | (?P<word>[^\s()<>=!,"']+)
+    )
+    """,
+    re.VERBOSE,
+)
+
+_KEYWORDS = {"and", "or", "not", "in"}
+
+
+class Param(namedtuple("Param", "index")):
+    """Параметр ? запроса; значение подставляется при выполнении."""
+
+    def __str__(self):
+        return "?"
+
+
+def tokenize(text):
+    """Разбивает текст условия на лексемы (вид, значение)."""
+    tokens = []
+    position = 0
+    text = text.strip()
+
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Неожиданный символ: {text[position:]}")
+        position = match.end()
+
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "word" and value.lower() in _KEYWORDS:
+            kind, value = "keyword", value.lower()
+        elif kind == "op" and value == "<>":
+            value = "!="
+        tokens.append((kind, value))
+
+    return tokens
+
+
+def literal_value(kind, value):
+    """Преобразует лексему в значение (str, int или bool)."""
+    if kind == "string":
+        return value[1:-1]
+    if kind != "word":
+        raise ValueError(f"Ожидалось значение, получено: {value}")
+
+    try:
+        return int(value)
+    except ValueError:
+        pass
+
+    if value.lower() == "true":
+        return True
+    if value.lower() == "false":
+        return False
+    return value
+
+
+class _Parser:
+    """
+    Рекурсивный разбор условия в дерево из кортежей.
+
+    Узлы: ("cmp", столбец, оператор, значение), ("in", столбец, значения),
+    ("and", левый, правый), ("or", левый, правый), ("not", узел).
+    Вместо значения может стоять Param - параметр ? по порядку.
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+        self.params = 0
+
+    def _peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return (None, None)
+
+    def _take(self):
+        token = self._peek()
+        if token[0] is None:
+            raise ValueError("Неожиданный конец условия")
+        self.position += 1
+        return token
+
+    def _expect(self, kind, value):
+        token = self._take()
+        if token != (kind, value):
+            raise ValueError(f'Ожидалось "{value}", получено: {token[1]}')
+
+    def parse(self):
+        tree = self._or()
+        if self._peek()[0] is not None:
+            raise ValueError(f"Лишний текст в условии: {self._peek()[1]}")
+        return tree
+
+    def _or(self):
+        tree = self._and()
+        while self._peek() == ("keyword", "or"):
+            self._take()
+            tree = ("or", tree, self._and())
+        return tree
+
+    def _and(self):
+        tree = self._not()
+        while self._peek() == ("keyword", "and"):
+            self._take()
+            tree = ("and", tree, self._not())
+        return tree
+
+    def _not(self):
+        if self._peek() == ("keyword", "not"):
+            self._take()
+            return ("not", self._not())
+        return self._primary()
+
+    def _primary(self):
+        if self._peek() == ("punct", "("):
+            self._take()
+            tree = self._or()
+            self._expect("punct", ")")
+            return tree
+
+        kind, column = self._take()
+        if kind != "word":
+            raise ValueError(f"Ожидалось имя столбца, получено: {column}")
+
+        if self._peek() == ("keyword", "in"):
+            self._take()
+            return ("in", column, self._value_list())
+
+        kind, op = self._take()
+        if kind != "op":
+            raise ValueError(f"Ожидался оператор сравнения, получено: {op}")
+        return ("cmp", column, op, self._value())
+
+    def _value(self):
+        kind, value = self._take()
+        if kind != "param":
+            return literal_value(kind, value)
+        self.params += 1
+        return Param(self.params - 1)
+
+    def _value_list(self):
+        self._expect("punct", "(")
+        values = [self._value()]
+        while self._peek() == ("punct", ","):
+            self._take()
+            values.append(self._value())
+        self._expect("punct", ")")
+        return tuple(values)
+
+
+def parse_expression(text):
+    """Разбирает текст условия WHERE в дерево."""
+    return _Parser(tokenize(text)).parse()
+
+
+def _compile_node(node, names, preamble=None):
+    """
+    Генерирует выражение Python для узла дерева.
+
+    Константы попадают в names; значения параметров ? и то, что из них
+    вычисляется, - в строки preamble, которые выполняются один раз при
+    подстановке параметров (см. compile_predicate_factory).
+    """
+    def const(value):
+        if value.__class__ is Param:
+            return derived(f"_p[{value.index}]")
+        name = f"_c{len(names)}"
+        names[name] = value
+        return name
+
+    def derived(expression):
+        name = f"_d{len(preamble)}"
+        preamble.append(f"{name} = {expression}")
+        return name
+
+    kind = node[0]
+    if kind == "and":
+        return (
+            f"({_compile_node(node[1], names, preamble)} and "
+            f"{_compile_node(node[2], names, preamble)})"
+        )
+    if kind == "or":
+        return (
+            f"({_compile_node(node[1], names, preamble)} or "
+            f"{_compile_node(node[2], names, preamble)})"
+        )
+    if kind == "not":
+        return f"(not {_compile_node(node[1], names, preamble)})"
+
+    column = const(node[1])
+    if kind == "in":
+        if not any(value.__class__ is Param for value in node[2]):
+            return f"(_get({column}) in {const(frozenset(node[2]))})"
+        values = ", ".join(const(value) for value in node[2])
+        return f"(_get({column}) in {derived(f'frozenset(({values},))')})"
+
+    _, _, op, value = node
+    if op == "=":
+        return f"(_get({column}) == {const(value)})"
+    if op == "!=":
+        return f"(_get({column}) != {const(value)})"
+
+    # Порядковые сравнения только для значений того же типа
+    var = f"_v{len(names)}"
+    if value.__class__ is Param:
+        value_name = const(value)
+        value_type = derived(f"{value_name}.__class__")
+    else:
+        value_name, value_type = const(value), const(type(value))
+    return (
+        f"(({var} := _get({column})).__class__ is {value_type} "
+        f"and {var} {op} {value_name})"
+    )
+
+
+def compile_predicate(tree):
+    """Компилирует дерево условия в функцию record -> bool."""
+    names = {}
+    body = _compile_node(tree, names)
+    source = f"def _predicate(_record):\n    _get = _record.get\n    return {body}\n"
+    exec(compile(source, "<where>", "exec"), names)
+    return names["_predicate"]
+
+
+def compile_predicate_factory(tree):
+    """
+    Компилирует дерево условия с параметрами ? в фабрику предикатов.
+
+    Фабрика принимает значения параметров и возвращает функцию
+    record -> bool; текст условия компилируется один раз, а подстановка
+    параметров стоит одного вызова.
+    """
+    names = {}
+    preamble = []
+    body = _compile_node(tree, names, preamble)
+    lines = [f"    {line}\n" for line in preamble]
+    source = (
+        "def _factory(_p):\n"
+        + "".join(lines)
+        + "    def _predicate(_record):\n"
+        f"        _get = _record.get\n        return {body}\n"
+        "    return _predicate\n"
+    )
+    exec(compile(source, "<where>", "exec"), names)
+    return names["_factory"]
+
+
+def tree_params(tree):
+    """Число параметров ? в условии."""
+    kind = tree[0]
+    if kind in ("and", "or"):
+        return tree_params(tree[1]) + tree_params(tree[2])
+    if kind == "not":
+        return tree_params(tree[1])
+    values = tree[2] if kind == "in" else (tree[3],)
+    return sum(value.__class__ is Param for value in values)
+
+
+def bind_params(tree, params):
+    """Возвращает дерево условия, где параметры ? заменены значениями."""
+    kind = tree[0]
+    if kind in ("and", "or"):
+        return (kind, bind_params(tree[1], params), bind_params(tree[2], params))
+    if kind == "not":
+        return ("not", bind_params(tree[1], params))
+    if kind == "in":
+        return ("in", tree[1], tuple(
+            params[value.index] if value.__class__ is Param else value
+            for value in tree[2]
+        ))
+    value = tree[3]
+    if value.__class__ is Param:
+        value = params[value.index]
+    return ("cmp", tree[1], tree[2], value)
+
+
+def equality_conjuncts(tree):
+    """
+    Возвращает равенства верхнего уровня (через AND) как (столбец, значения).
+
+    Используется для выбора индекса: "a = 1" дает ("a", (1,)),
+    "a in (1, 2)" дает ("a", (1, 2)).
+    """
+    kind = tree[0]
+    if kind == "and":
+        return equality_conjuncts(tree[1]) + equality_conjuncts(tree[2])
+    if kind == "cmp" and tree[2] == "=":
+        return [(tree[1], (tree[3],))]
+    if kind == "in":
+        return [(tree[1], tree[2])]
+    return []
+
+
+def range_conjuncts(tree):
+    """Возвращает сравнения <, <=, >, >= верхнего уровня как (столбец, оп, значение)."""
+    kind = tree[0]
+    if kind == "and":
+        return range_conjuncts(tree[1]) + range_conjuncts(tree[2])
+    if kind == "cmp" and tree[2] in ("<", "<=", ">", ">="):
+        return [(tree[1], tree[2], tree[3])]
+    return []
+
+
+def conjuncts(tree):
+    """Делит условие на части, соединенные AND на верхнем уровне."""
+    if tree[0] == "and":
+        return conjuncts(tree[1]) + conjuncts(tree[2])
+    return [tree]
+
+
+def tree_columns(tree):
+    """Возвращает множество столбцов, упомянутых в условии."""
+    kind = tree[0]
+    if kind in ("and", "or"):
+        return tree_columns(tree[1]) | tree_columns(tree[2])
+    if kind == "not":
+        return tree_columns(tree[1])
+    return {tree[1]}
+
+
+def rename_columns(tree, names):
+    """Возвращает условие, где столбцы заменены по словарю {было: стало}."""
+    kind = tree[0]
+    if kind in ("and", "or"):
+        return (kind, rename_columns(tree[1], names), rename_columns(tree[2], names))
+    if kind == "not":
+        return ("not", rename_columns(tree[1], names))
+    return (kind, names.get(tree[1], tree[1])) + tree[2:]
+
+
+def _format_value(value):
+    if value.__class__ is Param:
+        return "?"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    # Строка условия не может содержать кавычку, которой она ограничена
+    return f"'{value}'" if '"' in value else f'"{value}"'
+
+
+def format_tree(tree):
+    """Записывает дерево условия текстом, который разбирается в то же дерево."""
+    kind = tree[0]
+    if kind == "and":
+        return f"{format_tree(tree[1])} and {format_tree(tree[2])}"
+    if kind == "or":
+        return f"({format_tree(tree[1])} or {format_tree(tree[2])})"
+    if kind == "not":
+        return f"not ({format_tree(tree[1])})"
+    if kind == "in":
+        values = ", ".join(_format_value(value) for value in tree[2])
+        return f"{tree[1]} in ({values})"
+    return f"{tree[1]} {tree[2]} {_format_value(tree[3])}"
+
+
+class Condition:
+    """
+    Скомпилированное условие WHERE.
+
+    Условие с параметрами ? - шаблон: его предикат None, а bind(params)
+    возвращает готовое условие с подставленными значениями.
+    """
+
+    def __init__(self, text, tree, predicate=None):
+        self.text = text
+        self.tree = tree
+        self.params = tree_params(tree)
+        self._factory = None
+        if predicate is None and not self.params:
+            predicate = compile_predicate(tree)
+        self.predicate = predicate
+        self.equalities = equality_conjuncts(tree)
+        self.ranges = range_conjuncts(tree)
+
+    def __call__(self, record):
+        return self.predicate(record)
+
+    def __str__(self):
+        if self.text is None:
+            self.text = format_tree(self.tree)
+        return self.text
+
+    def bind(self, params):
+        """Подставляет значения параметров ? (последовательность по порядку)."""
+        if self._factory is None:
+            self._factory = compile_predicate_factory(self.tree)
+
+        # Дерево не разбирается заново: равенства и сравнения шаблона
+        # получают значения параметров на своих местах
+        bound = Condition.__new__(Condition)
+        bound.text = None
+        bound.tree = bind_params(self.tree, params)
+        bound.params = 0
+        bound._factory = None
+        bound.predicate = self._factory(params)
+        bound.equalities = [
+            (column, tuple([
+                params[value.index] if value.__class__ is Param else value
+                for value in values
+            ]))
+            for column, values in self.equalities
+        ]
+        bound.ranges = [
+            (column, op, params[value.index] if value.__class__ is Param else value)
+            for column, op, value in self.ranges
+        ]
+        return bound
+
+    def bounds(self, column, value_type):
+        """
+        Сводит сравнения по столбцу в диапазон (low, low_inc, high, high_inc).
+
+        Учитываются только значения типа value_type. Возвращает None,
+        если ограничений по столбцу нет.
+        """
+        low = high = None
+        low_inclusive = high_inclusive = True
+        found = False
+
+        for name, op, value in self.ranges:
+            if name != column or value.__class__ is not value_type:
+                continue
+            found = True
+            if op in (">", ">="):
+                inclusive = op == ">="
+                if low is None or value > low or (value == low and not inclusive):
+                    low, low_inclusive = value, inclusive
+            else:
+                inclusive = op == "<="
+                if high is None or value < high or (value == high and not inclusive):
+                    high, high_inclusive = value, inclusive
+
+        if not found:
+            return None
+        return low, low_inclusive, high, high_inclusive
+
+
+@lru_cache(maxsize=WHERE_CACHE_SIZE)
+def compile_condition(text):
+    """Разбирает и компилирует условие; результат кэшируется по тексту."""
+    return Condition(text, parse_expression(text))
+
+
+def condition_from_parts(parts):
+    """Собирает условие из частей через AND; без частей - None."""
+    if not parts:
+        return None
+    tree = parts[0]
+    for part in parts[1:]:
+        tree = ("and", tree, part)
+    return compile_condition(format_tree(tree))
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+import bisect
+
+
+class HashIndex:
+    """Хэш-индекс по столбцу: значение -> {ID: запись}."""
+
+    kind = "hash"
+
+    def __init__(self, column):
+        self.column = column
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def build(self, records):
+        """Строит индекс по всем записям таблицы."""
+        self._buckets = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        """Добавляет запись в индекс."""
+        value = record.get(self.column)
+        self._buckets.setdefault(value, {})[record.get('ID')] = record
+
+    def remove(self, record):
+        """Убирает запись из индекса."""
+        value = record.get(self.column)
+        bucket = self._buckets.get(value)
+        if bucket is None:
+            return
+
+        bucket.pop(record.get('ID'), None)
+        if not bucket:
+            del self._buckets[value]
+
+    def lookup(self, value):
+        """Возвращает записи с указанным значением столбца."""
+        bucket = self._buckets.get(value)
+        if bucket is None:
+            return []
+        return list(bucket.values())
+
+    def count(self, value):
+        """Число записей с указанным значением (без их выборки)."""
+        return len(self._buckets.get(value, ()))
+
+    def counts(self):
+        """Возвращает {значение: число записей} по всем корзинам."""
+        return {value: len(bucket) for value, bucket in self._buckets.items()}
+
+
+class SortedIndex(HashIndex):
+    """
+    Упорядоченный индекс по столбцу int или str.
+
+    Помимо корзин значение -> {ID: запись} хранит отсортированный список
+    различных значений, по которому бинарным поиском находятся границы
+    диапазона. Значения другого типа (например, None) в список не
+    попадают и выдаются только при полном обходе.
+    """
+
+    kind = "sorted"
+
+    def __init__(self, column, value_type):
+        super().__init__(column)
+        self.value_type = value_type
+        self._keys = []
+
+    def build(self, records):
+        """Строит индекс по всем записям таблицы."""
+        super().build(records)
+        self._keys = sorted(
+            value for value in self._buckets
+            if value.__class__ is self.value_type
+        )
+
+    def add(self, record):
+        """Добавляет запись в индекс."""
+        value = record.get(self.column)
+        if value not in self._buckets and value.__class__ is self.value_type:
+            bisect.insort(self._keys, value)
+        super().add(record)
+
+    def remove(self, record):
+        """Убирает запись из индекса."""
+        value = record.get(self.column)
+        super().remove(record)
+        if value not in self._buckets and value.__class__ is self.value_type:
+            position = bisect.bisect_left(self._keys, value)
+            if position < len(self._keys) and self._keys[position] == value:
+                del self._keys[position]
+
+    def _keys_between(self, low, low_inclusive, high, high_inclusive):
+        """Ключи из диапазона; граница None - нет ограничения."""
+        if low is None:
+            start = 0
+        elif low_inclusive:
+            start = bisect.bisect_left(self._keys, low)
+        else:
+            start = bisect.bisect_right(self._keys, low)
+
+        if high is None:
+            stop = len(self._keys)
+        elif high_inclusive:
+            stop = bisect.bisect_right(self._keys, high)
+        else:
+            stop = bisect.bisect_left(self._keys, high)
+
+        return self._keys[start:stop]
+
+    def range(self, low=None, low_inclusive=True, high=None, high_inclusive=True,
+              descending=False):
+        """
+        Возвращает записи со значениями в диапазоне в порядке ключа.
+
+        Граница None означает отсутствие ограничения с этой стороны.
+        """
+        keys = self._keys_between(low, low_inclusive, high, high_inclusive)
+        if descending:
+            keys.reverse()
+
+        found = []
+        for key in keys:
+            found.extend(self._buckets[key].values())
+        return found
+
+    def count_range(self, low=None, low_inclusive=True, high=None,
+                    high_inclusive=True):
+        """Число записей в диапазоне (без их выборки)."""
+        keys = self._keys_between(low, low_inclusive, high, high_inclusive)
+        return sum(len(self._buckets[key]) for key in keys)
+
+    def min_key(self):
+        """Наименьшее значение типа столбца (None для пустого индекса)."""
+        return self._keys[0] if self._keys else None
+
+    def max_key(self):
+        """Наибольшее значение типа столбца (None для пустого индекса)."""
+        return self._keys[-1] if self._keys else None
+
+    def ordered(self, descending=False):
+        """
+        Возвращает все записи в порядке ключа.
+
+        Нетипизированные значения идут в конце (при убывании - в начале).
+        """
+        typed = self.range(descending=descending)
+        untyped = []
+        for value, bucket in self._buckets.items():
+            if value.__class__ is not self.value_type:
+                untyped.extend(bucket.values())
+        return untyped + typed if descending else typed + untyped
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+
+from collections import Counter
+from itertools import chain
+from .constants import (
+    ERROR_AMBIGUOUS_COLUMN, ERROR_COLUMN_NOT_FOUND, ERROR_JOIN_COLUMN,
+)
+from .expressions import (
+    condition_from_parts, conjuncts, rename_columns, tree_columns,
+)
+from .metrics import metrics
+
+
+class HashJoin:
+    """
+    Соединение двух таблиц по равенству столбцов (inner join).
+
+    Ведет себя как таблица только для чтения, поэтому выборка, ORDER BY,
+    LIMIT и агрегаты работают поверх него без изменений. Столбцы
+    называются <псевдоним>.<столбец>; столбец, который есть только в
+    одной из таблиц, доступен и без псевдонима.
+
+    Части WHERE, касающиеся одной таблицы, проверяются до соединения, на
+    пути этой таблицы (ключ, индекс, векторный просмотр). Затем либо по
+    меньшей стороне строится хэш-таблица, а другая сторона
+    просматривается потоково частями, либо, если так дешевле, каждая
+    строка одной стороны ищет пару по первичному ключу или индексу
+    другой. NULL ни с чем не соединяется.
+    """
+
+    def __init__(self, left, right, clause):
+        self.sides = [(clause.left_alias, left), (clause.alias, right)]
+        self.name = f"{left.name} join {right.name}"
+        self.indexes = {}
+        self.column_types = {}
+        self.output_columns = []
+        # {имя в соединении: (сторона, столбец таблицы)}
+        self._owners = {}
+        self._ambiguous = set()
+
+        seen = Counter(
+            column for _, table in self.sides for column in table.column_types
+        )
+        for side, (alias, table) in enumerate(self.sides):
+            for column, python_type in table.column_types.items():
+                name = f"{alias}.{column}"
+                self.output_columns.append(name)
+                self.column_types[name] = python_type
+                self._owners[name] = (side, column)
+                if seen[column] == 1:
+                    self.column_types[column] = python_type
+                    self._owners[column] = (side, column)
+                else:
+                    self._ambiguous.add(column)
+
+        owners = [self._resolve(clause.on_left), self._resolve(clause.on_right)]
+        if owners[0][0] == owners[1][0]:
+            raise ValueError(ERROR_JOIN_COLUMN.format(
+                f"{clause.on_left} = {clause.on_right}"
+            ))
+        self.keys = [column for _, column in sorted(owners)]
+        self.on = f"{clause.on_left} = {clause.on_right}"
+
+    def _resolve(self, name):
+        """Возвращает (сторона, столбец) для имени столбца соединения."""
+        if name in self._ambiguous:
+            raise ValueError(ERROR_AMBIGUOUS_COLUMN.format(name, name))
+        if name not in self._owners:
+            raise ValueError(ERROR_COLUMN_NOT_FOUND.format(name, self.name))
+        return self._owners[name]
+
+    def check_columns(self, columns):
+        """Проверяет, что все столбцы есть в соединении и однозначны."""
+        for column in columns:
+            self._resolve(column)
+
+    def split_where(self, where_clause):
+        """
+        Делит WHERE на условия сторон и остаток после соединения.
+
+        Часть (через AND), все столбцы которой из одной таблицы,
+        переписывается на имена её столбцов. Возвращает
+        ([условие левой, условие правой], остаток); отсутствующие - None.
+        """
+        if where_clause is None:
+            return [None, None], None
+
+        pushed = [[], []]
+        residual = []
+        for part in conjuncts(where_clause.tree):
+            owners = {column: self._resolve(column) for column in tree_columns(part)}
+            sides = {side for side, _ in owners.values()}
+            if len(sides) == 1:
+                names = {name: column for name, (_, column) in owners.items()}
+                pushed[sides.pop()].append(rename_columns(part, names))
+            else:
+                residual.append(part)
+        return (
+            [condition_from_parts(parts) for parts in pushed],
+            condition_from_parts(residual),
+        )
+
+    def plan(self, where_clause):
+        """
+        Выбирает способ соединения.
+
+        Возвращает (вид, сторона, условия сторон, остаток): "hash" -
+        хэш-таблица строится по стороне side, "lookup" - строки другой
+        стороны ищут пары по ключу или индексу стороны side. Стоимость
+        считается по оценкам кандидатов: хэш-соединение читает обе
+        стороны, поиск по индексу - только другую.
+        """
+        pushed, residual = self.split_where(where_clause)
+        estimates = [
+            table.estimate(pushed[side])
+            for side, (_, table) in enumerate(self.sides)
+        ]
+        build = 0 if estimates[0] <= estimates[1] else 1
+        best = ("hash", build, sum(estimates))
+
+        for side, (_, table) in enumerate(self.sides):
+            if table.key_lookup(self.keys[side]) is not None:
+                cost = estimates[1 - side]
+                if cost <= best[2]:
+                    best = ("lookup", side, cost)
+        return best[0], best[1], pushed, residual
+
+    def _side_columns(self, side, columns):
+        """Столбцы таблицы стороны, нужные для соединения и вывода."""
+        needed = {self.keys[side]}
+        for name in columns:
+            owner = self._owners.get(name)
+            if owner is not None and owner[0] == side:
+                needed.add(owner[1])
+        return needed
+
+    def _combiner(self, columns):
+        """Функция (левая запись, правая запись) -> запись соединения."""
+        fields = [[], []]
+        for name, (side, column) in self._owners.items():
+            if name in columns:
+                fields[side].append((name, column))
+        left_names = [name for name, _ in fields[0]]
+        left_columns = [column for _, column in fields[0]]
+        right_names = [name for name, _ in fields[1]]
+        right_columns = [column for _, column in fields[1]]
+
+        def combine(left, right):
+            row = dict(zip(left_names, map(left.get, left_columns)))
+            row.update(zip(right_names, map(right.get, right_columns)))
+            return row
+        return combine
+
+    def iter_filter(self, where_clause, columns=None):
+        """
+        Выдает записи соединения, удовлетворяющие WHERE, по частям.
+
+        columns - нужные столбцы соединения (по умолчанию все с
+        псевдонимами); к ним добавляются столбцы остатка условия.
+        """
+        kind, side, pushed, residual = self.plan(where_clause)
+        columns = set(self.output_columns if columns is None else columns)
+        if residual is not None:
+            columns |= tree_columns(residual.tree)
+        return self._iter_join(kind, side, pushed, residual, columns)
+
+    def filter(self, where_clause):
+        """Возвращает все записи соединения, удовлетворяющие WHERE."""
+        return list(chain.from_iterable(self.iter_filter(where_clause)))
+
+    def _iter_join(self, kind, side, pushed, residual, columns):
+        probe = 1 - side
+        _, probe_table = self.sides[probe]
+        probe_key = self.keys[probe]
+        combine = self._combiner(columns)
+        check = residual.predicate if residual is not None else None
+
+        if kind == "lookup":
+            lookup = self.sides[side][1].key_lookup(self.keys[side])
+            condition = pushed[side]
+            if condition is None:
+                find = lookup
+            else:
+                predicate = condition.predicate
+
+                def find(value):
+                    return [record for record in lookup(value) if predicate(record)]
+        else:
+            find = self._build(side, pushed[side], columns).get
+
+        for chunk in probe_table.iter_filter(
+            pushed[probe], self._side_columns(probe, columns)
+        ):
+            with metrics.timer("phase_seconds", phase="join"):
+                rows = []
+                for record in chunk:
+                    value = record.get(probe_key)
+                    if value is None:
+                        continue
+                    for match in find(value) or ():
+                        if probe == 0:
+                            row = combine(record, match)
+                        else:
+                            row = combine(match, record)
+                        if check is None or check(row):
+                            rows.append(row)
+            if rows:
+                yield rows
+
+    def _build(self, side, condition, columns):
+        """Строит хэш-таблицу {значение ключа: записи} по стороне side."""
+        _, table = self.sides[side]
+        key = self.keys[side]
+        buckets = {}
+        for chunk in table.iter_filter(condition, self._side_columns(side, columns)):
+            with metrics.timer("phase_seconds", phase="join"):
+                for record in chunk:
+                    value = record.get(key)
+                    if value is not None:
+                        buckets.setdefault(value, []).append(record)
+        return buckets
+
+    def ordered_candidates(self, where_clause, column, descending=False):
+        return None
+
+    def estimate(self, where_clause):
+        """
+        Оценка числа строк соединения без его выполнения.
+
+        Берется большая из оценок сторон: так выходит для соединения по
+        ключу, когда каждой строке находится не больше одной пары.
+        """
+        pushed, _ = self.split_where(where_clause)
+        return max(
+            table.estimate(pushed[side])
+            for side, (_, table) in enumerate(self.sides)
+        )
+
+    def _key_counts(self, side):
+        _, table = self.sides[side]
+        key = self.keys[side]
+        index = table.indexes.get(key)
+        if index is not None:
+            return index.counts()
+        return Counter(
+            record.get(key)
+            for chunk in table.iter_filter(None, {key})
+            for record in chunk
+        )
+
+    def __len__(self):
+        """Число строк соединения: по числу строк на каждое значение ключа."""
+        left, right = self._key_counts(0), self._key_counts(1)
+        return sum(
+            count * right.get(value, 0)
+            for value, count in left.items()
+            if value is not None
+        )
+
+    def explain(self, where_clause):
+        """План соединения: способ, стороны, оценки и условия."""
+        kind, side, pushed, residual = self.plan(where_clause)
+        probe = 1 - side
+        build_alias, build_table = self.sides[side]
+        probe_alias, probe_table = self.sides[probe]
+        if kind == "lookup":
+            key = self.keys[side]
+            source = "первичный ключ" if key == 'ID' else f"индекс по \"{key}\""
+            method = f"поиск пар по ключу: {source} таблицы {build_alias}"
+            build = "не нужно: используется готовый индекс"
+        else:
+            method = "хэш-соединение"
+            build = (
+                f"хэш-таблица по {build_alias}.{self.keys[side]} "
+                f"(кандидатов: {build_table.estimate(pushed[side])})"
+            )
+
+        plan = [
+            ("Соединение", f"{method}, {self.on}"),
+            ("Построение", build),
+            ("Проба", (
+                f"{probe_alias} потоково по частям "
+                f"(кандидатов: {probe_table.estimate(pushed[probe])})"
+            )),
+        ]
+        for (alias, _), condition in zip(self.sides, pushed):
+            plan.append((
+                f"Условие до соединения ({alias})",
+                condition if condition is not None else "нет",
+            ))
+        plan.append((
+            "Условие после соединения",
+            residual if residual is not None else "нет",
+        ))
+        plan.append(("Оценка строк", self.estimate(where_clause)))
+        return plan
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import csv
+import json
+import os
+from itertools import islice
+from .constants import LOAD_BATCH_SIZE
+
+TRUE_STRINGS = {"true", "1", "yes", "да"}
+FALSE_STRINGS = {"false", "0", "no", "нет"}
+
+
+def convert_text(text, col_type):
+    """Преобразует строковое значение из файла к типу столбца."""
+    if col_type == 'int':
+        return int(text)
+    if col_type == 'bool':
+        lowered = text.strip().lower()
+        if lowered in TRUE_STRINGS:
+            return True
+        if lowered in FALSE_STRINGS:
+            return False
+        raise ValueError(f"Не удается прочитать bool: {text}")
+    return text
+
+
+def _iter_csv(file, schema):
+    """Строки CSV. Если первая строка - имена столбцов, порядок берется из неё."""
+    columns = [(name, type_) for name, type_ in schema if name != 'ID']
+    names = [name for name, _ in schema]
+    reader = csv.reader(file)
+
+    positions = None
+    for line_number, row in enumerate(reader, 1):
+        if not row:
+            continue
+
+        if line_number == 1 and set(row) <= set(names) and len(row) > 0:
+            positions = {name: row.index(name) for name, _ in columns if name in row}
+            if len(positions) != len(columns):
+                missing = [name for name, _ in columns if name not in positions]
+                raise ValueError(f"В заголовке CSV нет столбцов: {missing}")
+            continue
+
+        try:
+            if positions is None:
+                if len(row) != len(columns):
+                    raise ValueError(
+                        f"ожидается {len(columns)} значений, получено {len(row)}"
+                    )
+                texts = row
+            else:
+                texts = [row[positions[name]] for name, _ in columns]
+            yield [
+                convert_text(text, type_)
+                for text, (_, type_) in zip(texts, columns)
+            ]
+        except (ValueError, IndexError) as e:
+            raise ValueError(f"Строка {line_number} файла: {e}")
+
+
+def _iter_jsonl(file, schema):
+    """Строки JSONL: объект {столбец: значение} или массив значений."""
+    columns = [name for name, _ in schema if name != 'ID']
+
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+            if isinstance(item, dict):
+                yield [item[name] for name in columns]
+            else:
+                yield list(item)
+        except (ValueError, KeyError) as e:
+            raise ValueError(f"Строка {line_number} файла: {e}")
+
+
+def iter_file_rows(filepath, schema):
+    """
+    Потоково читает строки файла CSV или JSONL в списки значений.
+
+    Значения идут в порядке столбцов схемы без ID.
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension == ".csv":
+        reader = _iter_csv
+    elif extension in (".jsonl", ".ndjson"):
+        reader = _iter_jsonl
+    else:
+        raise ValueError(f"Неподдерживаемый формат файла: {extension}")
+
+    with open(filepath, 'r', encoding='utf-8', newline='') as file:
+        yield from reader(file, schema)
+
+
+def iter_batches(rows, batch_size=LOAD_BATCH_SIZE):
+    """Делит поток строк на пачки не больше batch_size."""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
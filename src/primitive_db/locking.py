@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import os
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка между процессами недоступна
+    fcntl = None
+
+
+class FileLock:
+    """
+    Межпроцессная блокировка на файле (flock).
+
+    Блокировка снимается системой, если процесс завершился, поэтому
+    после сбоя писателя она не остается висеть.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.held = False
+        self._file = None
+
+    def acquire(self, blocking=True):
+        """Захватывает блокировку. Возвращает False, если она занята."""
+        if self.held:
+            return True
+
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+        if fcntl is not None:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(self._file.fileno(), flags)
+            except BlockingIOError:
+                return False
+
+        self.held = True
+        return True
+
+    def release(self):
+        """Освобождает блокировку."""
+        if not self.held:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self.held = False
+
+    def close(self):
+        self.release()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
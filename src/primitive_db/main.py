@@ -1,11 +1,99 @@
 #!/usr/bin/env python3
 
+import argparse
+import sys
 
-from .engine import run
+from . import parallel
+from .constants import DEFAULT_DURABILITY, SERVER_HOST, SERVER_PORT
+from .decorators import set_auto_confirm
+from .metrics import metrics
+from .engine import run, run_script
+from .server import run_server
+from .wal import parse_durability
 
 
-def main():
-    run()
+def _durability(value):
+    """Проверяет политику fsync из командной строки."""
+    try:
+        parse_durability(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
+def parse_args(argv=None):
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        prog="project", description="Простая база данных."
+    )
+    parser.add_argument(
+        "--script",
+        metavar="FILE",
+        help="выполнить команды из файла (без файла команды читаются из "
+             "stdin, если он не терминал)",
+    )
+    parser.add_argument(
+        "--yes", "-y",
+        action="store_true",
+        help="не спрашивать подтверждение опасных операций",
+    )
+    parser.add_argument(
+        "--no-metrics",
+        action="store_true",
+        help="не собирать метрики (команда stats on включит их)",
+    )
+    parser.add_argument(
+        "--durability",
+        default=DEFAULT_DURABILITY,
+        type=_durability,
+        metavar="POLICY",
+        help="политика fsync журнала: always, off или <N>ms "
+             f"(по умолчанию {DEFAULT_DURABILITY})",
+    )
+    parser.add_argument(
+        "--auto-vacuum",
+        action="store_true",
+        help="сжимать в фоне таблицы, где много удаленных и замененных строк",
+    )
+    parser.add_argument(
+        "--scan-workers",
+        type=int,
+        metavar="N",
+        help="процессов для параллельного просмотра больших двоичных таблиц "
+             "(0 - без пула, по умолчанию по числу ядер)",
+    )
+
+    commands = parser.add_subparsers(dest="mode")
+    serve = commands.add_parser(
+        "serve", help="обслуживать клиентов по TCP из одного процесса"
+    )
+    serve.add_argument(
+        "--port", type=int, default=SERVER_PORT,
+        help=f"порт (по умолчанию {SERVER_PORT})",
+    )
+    serve.add_argument(
+        "--host", default=SERVER_HOST,
+        help=f"адрес (по умолчанию {SERVER_HOST})",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    set_auto_confirm(args.yes)
+    metrics.enabled = not args.no_metrics
+    if args.scan_workers is not None:
+        parallel.configure(args.scan_workers)
+
+    if args.mode == "serve":
+        run_server(args.port, args.host, args.durability, args.auto_vacuum)
+    elif args.script:
+        with open(args.script, 'r', encoding='utf-8') as script:
+            run_script(script, args.durability, args.auto_vacuum)
+    elif not sys.stdin.isatty():
+        run_script(sys.stdin, args.durability, args.auto_vacuum)
+    else:
+        run(args.durability, args.auto_vacuum)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,645 @@
+#!/usr/bin/env python3
+
+import copy
+import os
+import time
+from .constants import (
+    META_FILE, DATA_DIR, FLUSH_EVERY_OPS, FLUSH_INTERVAL, WAL_FILE,
+    LOCK_FILE, DEFAULT_DURABILITY, ERROR_FORMAT_TRANSACTION,
+    ERROR_VACUUM_TRANSACTION, VACUUM_DEAD_RATIO, VACUUM_MIN_DEAD_ROWS,
+    BINARY_FORMATS,
+)
+from .storage import (
+    apply_entries, dead_rows, get_files_size, get_log_size, iter_log,
+    remove_table_files,
+)
+from .utils import (
+    load_metadata, save_metadata, load_table_data, append_table_changes,
+    save_table_data,
+)
+from .core import (
+    get_column_types, get_table_indexes, get_table_layout, sync_table_sequence,
+    get_published_size, set_published_size, table_signature, get_table_file,
+    get_table_format, set_table_format, next_table_generation, get_dead_rows,
+    add_dead_rows,
+)
+from .binary import BinaryTable, load_binary_table, write_binary
+from .compaction import Compaction
+from .columnar import ColumnarTable
+from .table import Table
+from .decorators import create_cacher, log_phase
+from .metrics import metrics
+from .locking import FileLock
+from .wal import WriteAheadLog
+
+
+class TableManager:
+    """
+    Держит метаданные и данные таблиц в памяти на время сессии.
+
+    Каждая команда (или группа команд между begin и commit) - это
+    транзакция. При коммите она одной строкой дописывается в журнал
+    упреждающей записи, а в файлы таблиц изменения переносятся при
+    flush() (контрольной точке): по числу операций, по интервалу
+    времени, по команде или при выходе. После контрольной точки журнал
+    очищается, а при запуске непримененные транзакции из него
+    восстанавливаются.
+
+    Несколько процессов могут работать с одним каталогом данных.
+    Писатель перед изменением захватывает блокировку записи и держит её
+    до контрольной точки. Контрольная точка публикует новую версию:
+    журналы таблиц дописываются, а затем db_meta.json с размерами
+    журналов атомарно подменяется. Читатели не блокируются: они читают
+    журналы только до опубликованных размеров и перечитывают таблицу,
+    лишь когда вышла новая версия.
+
+    Удаление и обновление только дописывают записи в журнал, а старые
+    версии строк остаются в файлах мертвыми; их число хранится в
+    метаданных. vacuum() переписывает таблицу снимком в новое поколение
+    файлов. С auto_vacuum таблица, где мертвых строк много, сжимается в
+    фоновом потоке (см. Compaction); на это время писатель держит
+    блокировку записи, читателей сжатие не задерживает.
+    """
+
+    def __init__(
+        self,
+        meta_file=META_FILE,
+        data_dir=DATA_DIR,
+        flush_every=FLUSH_EVERY_OPS,
+        flush_interval=FLUSH_INTERVAL,
+        durability=DEFAULT_DURABILITY,
+        auto_vacuum=False,
+    ):
+        self.meta_file = meta_file
+        self.data_dir = data_dir
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.auto_vacuum = auto_vacuum
+        self._vacuum = None
+
+        self._version = self._published_version()
+        self.metadata = load_metadata(meta_file)
+        self._tables = {}
+        self._pending = {}
+        self._metadata_dirty = False
+        self._tx_entries = []
+        self._tx_metadata = False
+        self._snapshot = None
+        self._ops_since_flush = 0
+        self._last_flush = time.monotonic()
+        self.select_cache = create_cacher()
+        self.wal = WriteAheadLog(os.path.join(data_dir, WAL_FILE), durability)
+        self._lock = FileLock(os.path.join(data_dir, LOCK_FILE))
+
+        # Занятая блокировка значит, что журнал принадлежит живому писателю
+        if self._lock.acquire(blocking=False):
+            if self._recover():
+                self._reload_published()
+            self._lock.release()
+
+    @property
+    def in_transaction(self):
+        """Открыта ли явная транзакция (begin без commit/rollback)."""
+        return self._snapshot is not None
+
+    def _recover(self):
+        """
+        Переносит в файлы таблиц транзакции, оставшиеся в журнале.
+
+        Если сбой случился посреди контрольной точки, часть изменений
+        попадет в журнал таблицы повторно. Это безопасно: повторное
+        проигрывание той же последовательности дает то же состояние.
+        """
+        transactions = self.wal.read()
+        if not transactions:
+            return False
+
+        metadata = load_metadata(self.meta_file)
+        pending = {}
+        for transaction in transactions:
+            for table_name, entry in transaction.get("changes", []):
+                pending.setdefault(table_name, []).append(entry)
+            if transaction.get("metadata") is not None:
+                metadata = transaction["metadata"]
+            _discard_dropped(pending, metadata)
+
+        self._publish(metadata, pending)
+        self.wal.truncate()
+        return True
+
+    def _published_version(self):
+        """Версия опубликованного состояния: db_meta.json подменяется целиком."""
+        try:
+            stat = os.stat(self.meta_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @log_phase("save")
+    def _publish(self, metadata, pending):
+        """Дописывает журналы таблиц и атомарно публикует метаданные."""
+        for table_name, entries in pending.items():
+            if not entries:
+                continue
+            table_file = get_table_file(metadata, table_name)
+            append_table_changes(table_file, entries, self.data_dir, sync=True)
+            set_published_size(
+                metadata, table_name, get_log_size(table_file, self.data_dir)
+            )
+            add_dead_rows(metadata, table_name, sum(map(dead_rows, entries)))
+
+        save_metadata(metadata, self.meta_file)
+
+    def _reload_published(self):
+        """Переходит на последнюю опубликованную версию, если она новее."""
+        version = self._published_version()
+        if version == self._version:
+            return
+
+        metadata = load_metadata(self.meta_file)
+        for table_name in list(self._tables):
+            if table_signature(metadata, table_name) != table_signature(
+                self.metadata, table_name
+            ):
+                del self._tables[table_name]
+                self.select_cache.invalidate(table_name)
+
+        self.metadata = metadata
+        self._version = version
+        for table_name, table in self._tables.items():
+            sync_table_sequence(self.metadata, table_name, table.max_id())
+        if self.in_transaction:
+            self._snapshot = copy.deepcopy(metadata)
+
+    def refresh(self):
+        """
+        Догоняет опубликованную версию перед чтением.
+
+        Писатель с блокировкой и явная транзакция продолжают видеть
+        свое состояние.
+        """
+        if not self._lock.held and not self.in_transaction:
+            self._reload_published()
+
+    def acquire_write(self):
+        """
+        Захватывает блокировку записи (ждет других писателей).
+
+        Затем применяет журнал упавшего писателя, если он остался,
+        и переходит на последнюю опубликованную версию.
+        """
+        if self._lock.held:
+            return
+
+        self._lock.acquire()
+        self._recover()
+        self._reload_published()
+
+    def get_table(self, table_name):
+        """Возвращает таблицу, загружая её с диска один раз."""
+        if table_name not in self.metadata:
+            # Несуществующую таблицу не кэшируем: её еще могут создать
+            return Table(table_name)
+
+        if table_name not in self._tables:
+            try:
+                table = self._load_table(table_name)
+            except FileNotFoundError:
+                # Пока читали метаданные, писатель перевел таблицу на
+                # новое поколение файлов и удалил старые
+                if self._lock.held or self.in_transaction:
+                    raise
+                self._reload_published()
+                table = self._load_table(table_name)
+            changed = sync_table_sequence(self.metadata, table_name, table.max_id())
+            if changed and self._lock.held:
+                self._tx_metadata = True
+            self._tables[table_name] = table
+        return self._tables[table_name]
+
+    def _load_table(self, table_name):
+        """Собирает таблицу из опубликованных файлов и незаписанных изменений."""
+        table_file = get_table_file(self.metadata, table_name)
+        published_size = get_published_size(self.metadata, table_name)
+        column_types = get_column_types(self.metadata, table_name)
+        # Изменения, еще не перенесенные в файл таблицы
+        entries = self._pending.get(table_name, []) + [
+            entry for name, entry in self._tx_entries if name == table_name
+        ]
+
+        if get_table_format(self.metadata, table_name) in BINARY_FORMATS:
+            table = load_binary_table(
+                table_name, table_file, column_types, self.data_dir
+            )
+            # Журнал двоичной таблицы - изменения после снимка
+            table.apply_entries(list(iter_log(
+                table_file, self.data_dir, published_size
+            )))
+            table.apply_entries(copy.deepcopy(entries))
+            return table
+
+        records = load_table_data(table_file, self.data_dir, published_size)
+        if entries:
+            records = apply_entries(records, copy.deepcopy(entries))
+
+        if get_table_layout(self.metadata, table_name) == "columnar":
+            return ColumnarTable(table_name, records, column_types)
+        return Table(
+            table_name,
+            records,
+            get_table_indexes(self.metadata, table_name),
+            column_types,
+        )
+
+    @log_phase("save")
+    def convert_table(self, table_name, storage_format):
+        """
+        Переписывает таблицу в формат jsonl, binary, zlib или lzma.
+
+        Сначала все изменения публикуются, затем снимок таблицы пишется в
+        файлы нового поколения, метаданные с новым поколением атомарно
+        подменяются, и только после этого старые файлы удаляются.
+        Перезапись в jsonl заодно сжимает журнал до снимка.
+        """
+        if self.in_transaction:
+            raise ValueError(ERROR_FORMAT_TRANSACTION)
+
+        self.finish_vacuum(wait=True)
+        self.flush()
+        table = self.get_table(table_name)
+        metadata = set_table_format(
+            copy.deepcopy(self.metadata), table_name, storage_format
+        )
+        self._rewrite_table(table_name, table, metadata)
+        self.forget_table(table_name)
+
+    def _rewrite_table(self, table_name, table, metadata):
+        """
+        Пишет снимок таблицы в файлы поколения из metadata и публикует их.
+
+        Метаданные с новым поколением атомарно подменяются, и только после
+        этого старые файлы удаляются.
+        """
+        old_file = get_table_file(self.metadata, table_name)
+        table_file = get_table_file(metadata, table_name)
+        column_types = get_column_types(metadata, table_name)
+        # Остатки поколения от прерванной смены формата
+        remove_table_files(table_file, self.data_dir)
+
+        storage_format = get_table_format(metadata, table_name)
+        if storage_format in BINARY_FORMATS:
+            write_binary(
+                table_file, table, column_types, self.data_dir,
+                compression=BINARY_FORMATS[storage_format],
+            )
+        else:
+            save_table_data(table_file, table, self.data_dir)
+        set_published_size(
+            metadata, table_name, get_log_size(table_file, self.data_dir)
+        )
+
+        save_metadata(metadata, self.meta_file)
+        self.metadata = metadata
+        self._version = self._published_version()
+        remove_table_files(old_file, self.data_dir)
+
+    @log_phase("save")
+    def vacuum(self, table_name):
+        """
+        Сжимает файлы таблицы: переписывает её снимком в новое поколение.
+
+        Мертвые версии строк (удаленные и замененные) из файлов уходят,
+        формат и представление таблицы не меняются. Возвращает (мертвых
+        строк убрано, байт до, байт после).
+        """
+        if self.in_transaction:
+            raise ValueError(ERROR_VACUUM_TRANSACTION)
+
+        self.finish_vacuum(wait=True)
+        self.flush()
+        table = self.get_table(table_name)
+        old_file = get_table_file(self.metadata, table_name)
+        reclaimed = get_dead_rows(self.metadata, table_name)
+        size_before = get_files_size(old_file, self.data_dir)
+
+        metadata = next_table_generation(copy.deepcopy(self.metadata), table_name)
+        self._rewrite_table(table_name, table, metadata)
+        if isinstance(table, BinaryTable):
+            # Снимок в памяти отображает файл старого поколения
+            self.forget_table(table_name)
+        size_after = get_files_size(self.table_file(table_name), self.data_dir)
+        return reclaimed, size_before, size_after
+
+    def dead_ratio(self, table_name):
+        """Доля мертвых версий строк в файлах загруженной таблицы."""
+        dead = get_dead_rows(self.metadata, table_name)
+        if not dead:
+            return 0.0
+        return dead / (dead + len(self._tables[table_name]))
+
+    def _start_vacuum(self):
+        """
+        Начинает фоновое сжатие таблицы, где мертвых строк много.
+
+        Вызывается после контрольной точки, пока блокировка записи еще
+        у этого процесса: её держат до конца сжатия.
+        """
+        if (
+            not self.auto_vacuum
+            or self._vacuum is not None
+            or self.in_transaction
+            or not self._lock.held
+        ):
+            return
+
+        for table_name in list(self._tables):
+            if (
+                table_name not in self.metadata
+                or get_published_size(self.metadata, table_name) is None
+            ):
+                continue
+            if (
+                get_dead_rows(self.metadata, table_name) < VACUUM_MIN_DEAD_ROWS
+                or self.dead_ratio(table_name) < VACUUM_DEAD_RATIO
+            ):
+                continue
+
+            metadata = next_table_generation(
+                copy.deepcopy(self.metadata), table_name
+            )
+            self._vacuum = Compaction(
+                table_name,
+                get_table_format(self.metadata, table_name),
+                get_table_file(self.metadata, table_name),
+                get_table_file(metadata, table_name),
+                get_published_size(self.metadata, table_name),
+                get_column_types(self.metadata, table_name),
+                self.data_dir,
+            )
+            self._vacuum.start()
+            return
+
+    @property
+    def vacuum_running(self):
+        """Идет ли фоновое сжатие."""
+        return self._vacuum is not None
+
+    def finish_vacuum(self, wait=False):
+        """
+        Публикует результат фонового сжатия, если оно закончилось.
+
+        Изменения, опубликованные за время сжатия, переносятся из хвоста
+        журнала старого поколения в журнал нового; затем метаданные с
+        новым поколением подменяются, а старые файлы удаляются. Если
+        таблицу за это время удалили или перевели в другой формат,
+        результат отбрасывается. wait - дождаться конца сжатия.
+        """
+        job = self._vacuum
+        if job is None or self.in_transaction:
+            return
+        if wait:
+            job.join()
+        elif job.is_alive():
+            return
+
+        self._vacuum = None
+        table_name = job.table_name
+        if (
+            job.error is not None
+            or table_name not in self.metadata
+            or get_table_file(self.metadata, table_name) != job.old_file
+            or get_table_format(self.metadata, table_name) != job.storage_format
+        ):
+            remove_table_files(job.new_file, self.data_dir)
+            return
+
+        self.flush()
+        tail = list(iter_log(
+            job.old_file, self.data_dir,
+            get_published_size(self.metadata, table_name), job.size,
+        ))
+        if tail:
+            append_table_changes(job.new_file, tail, self.data_dir, sync=True)
+
+        metadata = next_table_generation(copy.deepcopy(self.metadata), table_name)
+        set_published_size(
+            metadata, table_name, get_log_size(job.new_file, self.data_dir)
+        )
+        add_dead_rows(metadata, table_name, sum(map(dead_rows, tail)))
+        save_metadata(metadata, self.meta_file)
+        self.metadata = metadata
+        self._version = self._published_version()
+        if isinstance(self._tables.get(table_name), BinaryTable):
+            self.forget_table(table_name)
+        remove_table_files(job.old_file, self.data_dir)
+
+    def table_file(self, table_name):
+        """Имя файлов таблицы в текущем поколении."""
+        return get_table_file(self.metadata, table_name)
+
+    def is_loaded(self, table_name):
+        """Загружена ли таблица в память."""
+        return table_name in self._tables
+
+    def log_size(self, table_name):
+        """Сколько байт журнала таблицы читается при её загрузке."""
+        size = get_published_size(self.metadata, table_name)
+        if size is None:
+            return get_log_size(self.table_file(table_name), self.data_dir)
+        return size
+
+    def record(self, table_name, entry):
+        """Запоминает изменение таблицы и сбрасывает её кэш выборок."""
+        self._tx_entries.append((table_name, entry))
+        self.select_cache.invalidate(table_name)
+
+    def record_many(self, table_name, entries):
+        """Запоминает пачку изменений таблицы."""
+        self._tx_entries.extend((table_name, entry) for entry in entries)
+        self.select_cache.invalidate(table_name)
+
+    def set_metadata(self, metadata):
+        """Заменяет метаданные и помечает их измененными."""
+        self.metadata = metadata
+        self._tx_metadata = True
+
+    def forget_table(self, table_name):
+        """
+        Выгружает таблицу из памяти.
+
+        Изменения удаленной таблицы отбрасываются при коммите.
+        """
+        self._tables.pop(table_name, None)
+        self.select_cache.invalidate(table_name)
+
+    def begin(self):
+        """Открывает явную транзакцию."""
+        if self.in_transaction:
+            raise ValueError("Транзакция уже начата.")
+        self.commit()
+        self._snapshot = copy.deepcopy(self.metadata)
+
+    def commit(self):
+        """
+        Фиксирует транзакцию: дописывает её в журнал упреждающей записи.
+
+        Возвращает число зафиксированных изменений таблиц.
+        """
+        changes = len(self._tx_entries)
+        if self._tx_entries or self._tx_metadata:
+            with metrics.timer("phase_seconds", phase="commit"):
+                self.wal.append({
+                    "changes": [[name, entry] for name, entry in self._tx_entries],
+                    "metadata": self.metadata if self._tx_metadata else None,
+                })
+            for table_name, entry in self._tx_entries:
+                self._pending.setdefault(table_name, []).append(entry)
+            if self._tx_metadata:
+                self._metadata_dirty = True
+            _discard_dropped(self._pending, self.metadata)
+
+        self._tx_entries = []
+        self._tx_metadata = False
+        self._snapshot = None
+        return changes
+
+    def rollback(self):
+        """
+        Отменяет явную транзакцию.
+
+        Метаданные возвращаются к снимку на момент begin, а таблицы
+        выгружаются и при следующем обращении собираются заново
+        из файлов и зафиксированных изменений.
+        """
+        if not self.in_transaction:
+            raise ValueError("Нет открытой транзакции.")
+
+        changes = len(self._tx_entries)
+        self.metadata = self._snapshot
+        self._tables.clear()
+        self.select_cache.clear()
+        self._tx_entries = []
+        self._tx_metadata = False
+        self._snapshot = None
+        return changes
+
+    def set_durability(self, policy):
+        """Меняет политику fsync журнала упреждающей записи."""
+        self.wal.set_durability(policy)
+
+    def reload_table(self, table_name):
+        """Записывает изменения таблицы и выгружает её из памяти."""
+        self.flush()
+        self.forget_table(table_name)
+
+    def dirty_tables(self):
+        """Возвращает имена таблиц с незаписанными изменениями."""
+        return [name for name, entries in self._pending.items() if entries]
+
+    def is_dirty(self):
+        """Есть ли зафиксированные изменения, не перенесенные в файлы."""
+        return self._metadata_dirty or bool(self.dirty_tables())
+
+    def flush(self):
+        """
+        Контрольная точка: переносит зафиксированные изменения в файлы.
+
+        Вне явной транзакции сначала фиксирует текущие изменения. Внутри
+        неё записывается только зафиксированное состояние.
+        """
+        if not self.in_transaction:
+            self.commit()
+
+        if self.is_dirty():
+            if self.in_transaction:
+                self._publish(self._snapshot, self._pending)
+                for table_name in self.dirty_tables():
+                    set_published_size(
+                        self.metadata,
+                        table_name,
+                        get_published_size(self._snapshot, table_name),
+                    )
+                    add_dead_rows(
+                        self.metadata, table_name,
+                        sum(map(dead_rows, self._pending[table_name])),
+                    )
+            else:
+                self._publish(self.metadata, self._pending)
+            # Своя публикация уже отражена в памяти
+            self._version = self._published_version()
+            self._pending.clear()
+            self._metadata_dirty = False
+
+            # Все из журнала уже в файлах таблиц
+            self.wal.truncate()
+
+        self._ops_since_flush = 0
+        self._last_flush = time.monotonic()
+
+    def operation_done(self):
+        """
+        Отмечает выполненную команду.
+
+        Вне явной транзакции команда фиксируется, а контрольная точка
+        выполняется по политике. После контрольной точки публикуется
+        закончившееся фоновое сжатие или начинается новое.
+        """
+        self._ops_since_flush += 1
+
+        if self.in_transaction:
+            return
+        self.commit()
+        self.finish_vacuum()
+
+        if not self.is_dirty():
+            self._start_vacuum()
+            self._release_lock()
+            return
+
+        by_count = self.flush_every and self._ops_since_flush >= self.flush_every
+        by_time = (
+            self.flush_interval
+            and time.monotonic() - self._last_flush >= self.flush_interval
+        )
+        if by_count or by_time:
+            self.flush()
+            self._start_vacuum()
+            self._release_lock()
+
+    def _release_lock(self):
+        # Во время фонового сжатия блокировка записи остается у писателя
+        if self._vacuum is None:
+            self._lock.release()
+
+    def idle(self):
+        """
+        Вызывается перед ожиданием ввода.
+
+        Публикует изменения и отпускает блокировку записи, чтобы не
+        задерживать других писателей, пока пользователь думает.
+        """
+        if self._lock.held and not self.in_transaction:
+            self.finish_vacuum()
+            self.flush()
+            self._start_vacuum()
+            self._release_lock()
+
+    def close(self):
+        """
+        Завершает сессию, записывая изменения.
+
+        Незавершенная явная транзакция откатывается.
+        """
+        if self.in_transaction:
+            self.rollback()
+        self.finish_vacuum(wait=True)
+        self.flush()
+        self.wal.close()
+        self._lock.close()
+
+
+def _discard_dropped(pending, metadata):
+    """Забывает изменения таблиц, которых больше нет в метаданных."""
+    for table_name in list(pending):
+        if table_name not in metadata:
+            del pending[table_name]
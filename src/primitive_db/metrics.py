@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+import bisect
+import json
+import time
+from contextlib import contextmanager, nullcontext
+from .constants import METRICS_ENABLED, METRICS_PREFIX, LATENCY_BUCKETS
+
+_NULL_TIMER = nullcontext()
+
+
+class Histogram:
+    """Гистограмма задержек с фиксированными границами корзин (секунды)."""
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, fraction):
+        """Оценка квантиля: верхняя граница корзины, где он находится."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class _Timer:
+    """Замер времени блока with в гистограмму."""
+
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(
+            self.name, time.perf_counter() - self.start, **self.labels
+        )
+
+
+class MetricsRegistry:
+    """
+    Счетчики и гистограммы задержек процесса.
+
+    Метрика задается именем и метками, например
+    observe("command_seconds", 0.01, command="select"). Когда сбор
+    выключен, вызывающий код проверяет только флаг enabled.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._counters = {}
+        self._histograms = {}
+        self._captures = []
+        self._paused = False
+
+    def reset(self):
+        """Обнуляет все метрики."""
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        """Увеличивает счетчик."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        if self._captures:
+            for capture in self._captures:
+                capture._add(key, value)
+            if self._paused:
+                return
+        self._add(key, value)
+
+    def _add(self, key, value):
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        """Добавляет значение в гистограмму."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        if self._captures:
+            for capture in self._captures:
+                capture._observe(key, seconds)
+            if self._paused:
+                return
+        self._observe(key, seconds)
+
+    def _observe(self, key, seconds):
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def capture(self):
+        """
+        Собирает метрики блока with еще и в отдельный реестр (для profile).
+
+        Работает и при выключенном сборе: тогда замеры блока попадают
+        только в отдельный реестр, а общий не меняется.
+        """
+        capture = MetricsRegistry(enabled=True)
+        saved = self.enabled, self._paused
+        self._paused = not self.enabled
+        self.enabled = True
+        self._captures.append(capture)
+        try:
+            yield capture
+        finally:
+            self._captures.remove(capture)
+            self.enabled, self._paused = saved
+
+    def total(self, name, **labels):
+        """Сумма счетчика name по всем рядам с указанными метками."""
+        wanted = labels.items()
+        return sum(
+            value for (counter, key), value in self._counters.items()
+            if counter == name and wanted <= dict(key).items()
+        )
+
+    def timer(self, name, **labels):
+        """Контекстный менеджер, замеряющий время блока."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def counters(self):
+        """Список (имя, метки, значение) по всем счетчикам."""
+        return [
+            (name, dict(labels), value)
+            for (name, labels), value in sorted(self._counters.items())
+        ]
+
+    def histograms(self):
+        """Список (имя, метки, гистограмма)."""
+        return [
+            (name, dict(labels), histogram)
+            for (name, labels), histogram in sorted(
+                self._histograms.items(), key=lambda item: item[0]
+            )
+        ]
+
+    def to_dict(self, gauges=None):
+        """Снимок метрик для JSON."""
+        return {
+            "counters": [
+                {"name": name, "labels": labels, "value": value}
+                for name, labels, value in self.counters()
+            ],
+            "histograms": [
+                {
+                    "name": name,
+                    "labels": labels,
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": dict(zip(
+                        [str(bound) for bound in histogram.bounds] + ["+Inf"],
+                        histogram.counts,
+                    )),
+                }
+                for name, labels, histogram in self.histograms()
+            ],
+            "gauges": dict(gauges or {}),
+        }
+
+    def to_json(self, gauges=None):
+        return json.dumps(self.to_dict(gauges), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, gauges=None):
+        """Текстовый формат Prometheus."""
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for name, labels, value in self.counters():
+            full_name = f"{METRICS_PREFIX}_{name}"
+            declare(full_name, "counter")
+            lines.append(f"{full_name}{_format_labels(labels)} {value}")
+
+        for name, labels, histogram in self.histograms():
+            full_name = f"{METRICS_PREFIX}_{name}"
+            declare(full_name, "histogram")
+            cumulative = 0
+            bounds = [repr(bound) for bound in histogram.bounds] + ["+Inf"]
+            for bound, count in zip(bounds, histogram.counts):
+                cumulative += count
+                bucket_labels = _format_labels(dict(labels, le=bound))
+                lines.append(f"{full_name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{full_name}_sum{_format_labels(labels)} {histogram.sum}")
+            lines.append(
+                f"{full_name}_count{_format_labels(labels)} {histogram.count}"
+            )
+
+        for name, value in (gauges or {}).items():
+            full_name = f"{METRICS_PREFIX}_{name}"
+            declare(full_name, "gauge")
+            lines.append(f"{full_name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+# Общий реестр процесса
+metrics = MetricsRegistry()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import csv
+import io
+import json
+from itertools import chain
+from prettytable import PrettyTable
+from .constants import OUTPUT_PAGE_SIZE
+from .loader import iter_batches
+from .metrics import metrics
+
+EMPTY_RESULT = "Нет данных для отображения."
+
+
+def _table_page(rows, columns, first):
+    table = PrettyTable()
+    table.field_names = columns
+    for record in rows:
+        table.add_row([record.get(column, '') for column in columns])
+    return str(table)
+
+
+def _csv_page(rows, columns, first):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if first:
+        writer.writerow(columns)
+    writer.writerows([record.get(column) for column in columns] for record in rows)
+    return buffer.getvalue().rstrip("\n")
+
+
+def _jsonl_page(rows, columns, first):
+    return "\n".join(
+        json.dumps(
+            {column: record.get(column) for column in columns}, ensure_ascii=False
+        )
+        for record in rows
+    )
+
+
+_FORMATTERS = {"table": _table_page, "csv": _csv_page, "jsonl": _jsonl_page}
+
+
+def iter_output(chunks, columns, output_format="table", page_size=OUTPUT_PAGE_SIZE):
+    """
+    Форматирует результат выборки по страницам.
+
+    chunks - списки записей (как выдает iter_select), columns - столбцы
+    вывода. Каждая страница из page_size строк форматируется и отдается
+    отдельно, поэтому весь результат не собирается ни в памяти, ни в
+    одной строке. Формат table печатает каждую страницу своей таблицей,
+    csv - строки CSV с заголовком в начале, jsonl - по объекту в строке.
+    """
+    formatter = _FORMATTERS[output_format]
+    first = True
+    for page in iter_batches(chain.from_iterable(chunks), page_size):
+        with metrics.timer("phase_seconds", phase="format"):
+            text = formatter(page, columns, first)
+        first = False
+        yield text
+
+    if first:
+        # Пустой результат: у CSV остается заголовок
+        if output_format == "table":
+            yield EMPTY_RESULT
+        elif output_format == "csv":
+            yield formatter([], columns, True)
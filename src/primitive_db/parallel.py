@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from .constants import PARALLEL_SCAN_MIN_ROWS, PARALLEL_SCAN_WORKERS
+
+# Пул создается при первом параллельном просмотре и живет до выхода.
+# Процессы запускаются через spawn: fork процесса с потоком журнала
+# упреждающей записи может унаследовать захваченные блокировки.
+_settings = {
+    "workers": PARALLEL_SCAN_WORKERS,
+    "min_rows": PARALLEL_SCAN_MIN_ROWS,
+}
+_pool = None
+
+
+def configure(workers=None, min_rows=None):
+    """
+    Задает число процессов (None - по числу ядер, 0 или 1 - без пула)
+    и порог строк параллельного просмотра. Пул пересоздается.
+    """
+    shutdown()
+    _settings["workers"] = workers
+    if min_rows is not None:
+        _settings["min_rows"] = min_rows
+
+
+def worker_count():
+    """Сколько процессов у пула (0 - параллельный просмотр выключен)."""
+    workers = _settings["workers"]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return workers if workers > 1 else 0
+
+
+def scan_workers(rows):
+    """Сколько процессов взять на просмотр rows строк (0 - просматривать здесь)."""
+    return worker_count() if rows >= _settings["min_rows"] else 0
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=worker_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def map_ordered(function, tasks):
+    """
+    Выполняет function(task) в пуле и выдает результаты в порядке задач.
+
+    Вперед отправляется не больше двух задач на процесс, поэтому память
+    ограничена, а если потребитель прекратил чтение (LIMIT), еще не
+    начатые задачи отменяются.
+    """
+    pool = _get_pool()
+    window = 2 * worker_count()
+    tasks = iter(tasks)
+    pending = deque()
+    try:
+        for task in tasks:
+            pending.append(pool.submit(function, task))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def shutdown():
+    """Останавливает пул процессов, если он запущен."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
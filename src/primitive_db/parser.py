@@ -1,114 +1,347 @@
 #!/usr/bin/env python3
 
-import shlex
+import re
+from collections import namedtuple
+from .constants import (
+    AGGREGATE_FUNCTIONS, ERROR_AGGREGATE_FUNCTION, ERROR_COLUMNS, ERROR_LIMIT,
+    ERROR_OUTPUT_FORMAT, ERROR_SELECT, OUTPUT_FORMATS, ERROR_JOIN,
+    ERROR_JOIN_ALIAS, ERROR_PARAMS, ERROR_SET_FORMAT,
+)
+from .decorators import log_phase
+from .expressions import Param, compile_condition, literal_value, tokenize
 
+# Разобранный select; columns=None - все столбцы, limit=None - без LIMIT,
+# group_by - список столбцов GROUP BY или None, join - JoinClause или None
+SelectQuery = namedtuple(
+    "SelectQuery",
+    "table columns where order_by limit offset output_format group_by join",
+    defaults=(None, None),
+)
 
-def parse_where_condition(where_clause):
+# from <таблица> [<псевдоним>] join <таблица> [<псевдоним>] on <on_left> = <on_right>;
+# псевдонимы по умолчанию равны именам таблиц
+JoinClause = namedtuple("JoinClause", "left_alias table alias on_left on_right")
+
+
+class Aggregate(namedtuple("Aggregate", "function column")):
+    """Агрегатная функция из списка столбцов select: count(*), sum(age)."""
+
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.function}({self.column})"
+
+
+_AGGREGATE_RE = re.compile(r"^(\w+)\s*\(\s*([^\s()]+)\s*\)$")
+
+_JOIN_RE = re.compile(
+    r"^(\S+)(?:\s+(\S+))?\s+join\s+(\S+)(?:\s+(\S+))?"
+    r"\s+on\s+(\S+?)\s*=\s*(\S+)$",
+    re.IGNORECASE,
+)
+
+# FORMAT ищется только в самом конце запроса
+_FORMAT_RE = re.compile(r"\s+format\s+(\w+)\s*$", re.IGNORECASE)
+
+
+@log_phase("parse")
+def parse_where_condition(where_clause, params=False):
     """
-    Парсит условие WHERE в словарь.
+    Разбирает условие WHERE в скомпилированный предикат.
 
-    Пример: "age = 28" -> {'age': 28}
-    Пример: "name = 'Sergei'" -> {'name': 'Sergei'}
+    Поддерживаются AND, OR, NOT, скобки, операторы =, !=, <, <=, >, >=
+    и IN (...). Пример: "age >= 18 and (name = 'Sergei' or id in (1, 2))".
+    Разбор кэшируется по тексту условия. С params=True вместо значений
+    можно писать параметры ?: получится шаблон (см. Condition.bind).
     """
-    if not where_clause:
+    if not where_clause or not where_clause.strip():
         return None
 
     try:
-        # Разбиваем на части
-        parts = shlex.split(where_clause)
+        condition = compile_condition(where_clause.strip())
+    except Exception as e:
+        raise ValueError(f"Ошибка разбора условия WHERE: {e}")
+    if condition.params and not params:
+        raise ValueError(ERROR_PARAMS)
+    return condition
 
-        if len(parts) != 3 or parts[1] != '=':
-            raise ValueError("Некорректный формат условия WHERE")
 
-        column = parts[0]
-        value = parse_value(parts[2])
+def split_keyword(text, keyword):
+    """
+    Делит текст по первому вхождению ключевого слова вне кавычек.
 
-        return {column: value}
-    except Exception as e:
-        raise ValueError(f"Ошибка разбора условия WHERE: {e}")
+    Возвращает (до, после) или None, если слова нет.
+    """
+    words = r"\s+".join(re.escape(word) for word in keyword.split())
+    pattern = re.compile(
+        rf"""("[^"]*"|'[^']*')|\b{words}\b""", re.IGNORECASE
+    )
+    for match in pattern.finditer(text):
+        if match.group(1) is None:
+            return text[:match.start()], text[match.end():]
+    return None
 
 
-def parse_set_clause(set_clause):
+def parse_order_by(order_clause):
     """
-    Парсит условие SET в словарь.
+    Парсит ORDER BY в кортеж (столбец, по_убыванию).
 
-    Пример: "age = 29" -> {'age': 29}
-    Пример: "name = 'Ivan'" -> {'name': 'Ivan'}
+    Пример: "age desc" -> ('age', True)
     """
-    updates = {}
+    parts = order_clause.split()
+    if not parts or len(parts) > 2:
+        raise ValueError("Некорректный формат ORDER BY")
 
-    try:
-        # Разбиваем по запятым для множественных SET
-        assignments = set_clause.split(',')
+    direction = parts[1].lower() if len(parts) == 2 else "asc"
+    if direction not in ("asc", "desc"):
+        raise ValueError(f"Неизвестное направление сортировки: {parts[1]}")
 
-        for assignment in assignments:
-            parts = shlex.split(assignment.strip())
+    return parts[0], direction == "desc"
 
-            if len(parts) != 3 or parts[1] != '=':
-                raise ValueError("Некорректный формат условия SET")
 
-            column = parts[0]
-            value = parse_value(parts[2])
-            updates[column] = value
+def parse_columns(columns_str):
+    """
+    Парсит список столбцов select.
 
-        return updates
-    except Exception as e:
-        raise ValueError(f"Ошибка разбора условия SET: {e}")
+    Пример: "name, age" -> ['name', 'age']; пусто или "*" -> None (все).
+    Агрегаты становятся Aggregate: "active, count(*)" ->
+    ['active', Aggregate('count', '*')].
+    """
+    columns_str = columns_str.strip()
+    if not columns_str or columns_str == "*":
+        return None
+
+    columns = []
+    for item in columns_str.split(','):
+        item = item.strip()
+        match = _AGGREGATE_RE.match(item)
+        if match is not None:
+            function, column = match.group(1).lower(), match.group(2)
+            if function not in AGGREGATE_FUNCTIONS:
+                raise ValueError(ERROR_AGGREGATE_FUNCTION.format(match.group(1)))
+            if column == "*" and function != "count":
+                raise ValueError(ERROR_COLUMNS.format(columns_str))
+            columns.append(Aggregate(function, column))
+        elif item and len(item.split()) == 1 and "(" not in item:
+            columns.append(item)
+        else:
+            raise ValueError(ERROR_COLUMNS.format(columns_str))
+    return columns
 
 
-def parse_value(value_str):
-    """Парсит строковое значение в соответствующий тип."""
-    # Убираем кавычки если есть
-    cleaned_value = value_str.strip()
-    if (cleaned_value.startswith('"') and cleaned_value.endswith('"')) or \
-       (cleaned_value.startswith("'") and cleaned_value.endswith("'")):
-        return cleaned_value[1:-1]
+def parse_group_by(group_clause):
+    """
+    Парсит GROUP BY в список столбцов.
+
+    Пример: "active, age" -> ['active', 'age']
+    """
+    columns = parse_columns(group_clause)
+    if columns is None or any(isinstance(column, Aggregate) for column in columns):
+        raise ValueError(ERROR_COLUMNS.format(group_clause.strip()))
+    return columns
+
+
+def parse_limit(limit_clause):
+    """
+    Парсит LIMIT в кортеж (лимит, смещение).
+
+    Пример: "10 offset 20" -> (10, 20)
+    """
+    parts = limit_clause.split()
+    if len(parts) not in (1, 3) or (
+        len(parts) == 3 and parts[1].lower() != "offset"
+    ):
+        raise ValueError(ERROR_LIMIT.format(limit_clause.strip()))
+
+    numbers = parts[::2]
+    if not all(number.isdigit() for number in numbers):
+        raise ValueError(ERROR_LIMIT.format(limit_clause.strip()))
 
-    # Убираем запятые в конце (проблема с shlex)
-    if cleaned_value.endswith(','):
-        cleaned_value = cleaned_value[:-1]
+    limit = int(numbers[0])
+    offset = int(numbers[1]) if len(numbers) == 2 else 0
+    return limit, offset
 
-    # Пробуем преобразовать в int
+
+def parse_from(from_clause):
+    """
+    Парсит FROM в кортеж (таблица, JoinClause или None).
+
+    Пример: "users u join orders o on u.ID = o.user_id" ->
+    ('users', JoinClause('u', 'orders', 'o', 'u.ID', 'o.user_id'))
+    """
+    words = from_clause.split()
+    if not words:
+        raise ValueError(ERROR_SELECT)
+    if "join" not in (word.lower() for word in words):
+        return words[0], None
+
+    match = _JOIN_RE.match(from_clause.strip())
+    if match is None:
+        raise ValueError(ERROR_JOIN)
+    table, left_alias, join_table, alias, on_left, on_right = match.groups()
+    left_alias = left_alias or table
+    alias = alias or join_table
+    if left_alias == alias:
+        raise ValueError(ERROR_JOIN_ALIAS.format(alias))
+    return table, JoinClause(left_alias, join_table, alias, on_left, on_right)
+
+
+def parse_select(query, params=False):
+    """
+    Разбирает запрос select в SelectQuery.
+
+    select [<столбец>|<функция>(<столбец>|*), ...|*] from <таблица>
+    [join <таблица> on <столбец> = <столбец>]
+    [where <условие>] [group by <столбец>, ...]
+    [order by <столбец> [asc|desc]] [limit N [offset M]]
+    [format table|csv|jsonl]
+
+    params=True разрешает параметры ? в WHERE.
+    """
+    output_format = "table"
+    match = _FORMAT_RE.search(query)
+    if match is not None:
+        output_format = match.group(1).lower()
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(ERROR_OUTPUT_FORMAT.format(match.group(1)))
+        query = query[:match.start()]
+
+    from_parts = split_keyword(query, "from")
+    if from_parts is None:
+        raise ValueError(ERROR_SELECT)
+    head, rest = from_parts
+
+    words = head.split(None, 1)
+    columns = parse_columns(words[1] if len(words) > 1 else "")
+    if not rest.split():
+        raise ValueError(ERROR_SELECT)
+
+    limit, offset = None, 0
+    limit_parts = split_keyword(rest, "limit")
+    if limit_parts is not None:
+        rest, limit_str = limit_parts
+        limit, offset = parse_limit(limit_str)
+
+    order_by = None
+    order_parts = split_keyword(rest, "order by")
+    if order_parts is not None:
+        rest, order_str = order_parts
+        order_by = parse_order_by(order_str)
+
+    group_by = None
+    group_parts = split_keyword(rest, "group by")
+    if group_parts is not None:
+        rest, group_str = group_parts
+        group_by = parse_group_by(group_str)
+
+    where_clause = None
+    where_parts = split_keyword(rest, "where")
+    if where_parts is not None:
+        rest, where_str = where_parts
+        where_clause = parse_where_condition(where_str, params)
+
+    table_name, join = parse_from(rest)
+    return SelectQuery(
+        table_name, columns, where_clause, order_by, limit, offset, output_format,
+        group_by, join,
+    )
+
+
+@log_phase("parse")
+def parse_set_clause(set_clause, params=False):
+    """
+    Парсит условие SET в словарь.
+
+    Пример: "age = 29" -> {'age': 29}
+    Пример: "name = 'Ivan'" -> {'name': 'Ivan'}
+    С params=True значением может быть параметр ? (Param по порядку).
+    """
     try:
-        return int(cleaned_value)
-    except ValueError:
-        pass
+        tokens = tokenize(set_clause)
+    except ValueError as e:
+        raise ValueError(f"Ошибка разбора условия SET: {e}")
 
-    # Пробуем преобразовать в bool
-    if cleaned_value.lower() == 'true':
-        return True
-    elif cleaned_value.lower() == 'false':
-        return False
+    if not tokens:
+        raise ValueError(f"Ошибка разбора условия SET: {ERROR_SET_FORMAT}")
 
-    # Оставляем как строку
-    return cleaned_value
+    updates = {}
+    count = 0
+    # Присваивания: <столбец> = <значение>, через запятую
+    for position in range(0, len(tokens), 4):
+        assignment = tokens[position:position + 4]
+        column, op, value, separator = assignment + [None] * (4 - len(assignment))
+        if (
+            column[0] != "word"
+            or op != ("op", "=")
+            or value is None or value[0] not in ("word", "string", "param")
+            or separator not in (None, ("punct", ","))
+            or (separator is not None and position + 4 == len(tokens))
+        ):
+            raise ValueError(f"Ошибка разбора условия SET: {ERROR_SET_FORMAT}")
+
+        if value[0] == "param":
+            if not params:
+                raise ValueError(ERROR_PARAMS)
+            updates[column[1]] = Param(count)
+            count += 1
+        else:
+            updates[column[1]] = literal_value(*value)
+    return updates
 
 
-def parse_values(values_str):
-    """Парсит список значений в скобках."""
-    # Убираем скобки и разбиваем
-    values_str = values_str.strip()
-    if values_str.startswith('(') and values_str.endswith(')'):
-        values_str = values_str[1:-1]
+@log_phase("parse")
+def parse_values_list(values_str, params=False):
+    """
+    Парсит один или несколько наборов значений в скобках.
 
+    Пример: '("lock", 28, true), ("key", 30, false)'
+    -> [['lock', 28, True], ['key', 30, False]]
+    С params=True значением может быть параметр ? (Param по порядку).
+    """
     try:
-        # Разбиваем с учетом кавычек
-        parts = shlex.split(values_str)
-        values = []
+        tokens = tokenize(values_str)
+    except ValueError as e:
+        raise ValueError(f"Ошибка разбора значений: {e}")
 
-        for part in parts:
-            # Убираем запятые которые shlex мог оставить
-            clean_part = part.rstrip(',')
-            values.append(parse_value(clean_part))
+    rows = []
+    position = 0
+    count = 0
 
-        return values
-    except Exception:
-        # Fallback: простой split по запятым
-        parts = values_str.split(',')
-        values = []
+    def take():
+        nonlocal position
+        if position >= len(tokens):
+            raise ValueError("Ошибка разбора значений: неожиданный конец")
+        position += 1
+        return tokens[position - 1]
 
-        for part in parts:
-            clean_part = part.strip()
-            values.append(parse_value(clean_part))
+    while True:
+        if take() != ("punct", "("):
+            raise ValueError("Ошибка разбора значений: ожидалась \"(\"")
+
+        values = []
+        if position < len(tokens) and tokens[position] == ("punct", ")"):
+            take()
+        else:
+            while True:
+                kind, value = take()
+                if kind != "param":
+                    values.append(literal_value(kind, value))
+                elif params:
+                    values.append(Param(count))
+                    count += 1
+                else:
+                    raise ValueError(ERROR_PARAMS)
+                token = take()
+                if token == ("punct", ")"):
+                    break
+                if token != ("punct", ","):
+                    raise ValueError(
+                        f"Ошибка разбора значений: ожидалась запятая, "
+                        f"получено {token[1]}"
+                    )
+        rows.append(values)
 
-        return values
+        if position == len(tokens):
+            return rows
+        if take() != ("punct", ","):
+            raise ValueError("Ошибка разбора значений: наборы разделяются запятой")
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+import asyncio
+import contextlib
+import io
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from .constants import DEFAULT_DURABILITY, SERVER_HOST, SERVER_LINE_LIMIT
+from .decorators import set_auto_confirm
+from .engine import execute_command
+from .manager import TableManager
+
+
+def encode_response(text):
+    """Ответ: длина тела в байтах, перевод строки и само тело."""
+    body = text.encode('utf-8')
+    return f"{len(body)}\n".encode('ascii') + body
+
+
+class Server:
+    """
+    TCP сервер поверх одного TableManager.
+
+    Запрос - одна команда в строке, в той же грамматике, что и в
+    интерактивном режиме. Клиент может отправлять команды, не дожидаясь
+    ответов (конвейер): они выполняются по порядку, ответы приходят в
+    том же порядке. Команды всех клиентов выполняются по одной в
+    отдельном потоке: пока команда ждет блокировку записи или
+    просматривает большую таблицу, цикл событий принимает соединения и
+    читает запросы. Клиент с открытой транзакцией (begin) получает сервер в
+    монопольное пользование до commit, rollback или отключения.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.clients = 0
+        self._session = asyncio.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def run_command(self, line):
+        """Выполняет команду, возвращает (вывод, продолжать ли сеанс)."""
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            keep_going = execute_command(self.manager, line)
+        return output.getvalue(), keep_going
+
+    async def handle_client(self, reader, writer):
+        self.clients += 1
+        owns_session = False
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    writer.write(encode_response("Ошибка: Слишком длинная команда.\n"))
+                    break
+                if not line:
+                    break
+
+                if not owns_session:
+                    await self._session.acquire()
+                try:
+                    output, keep_going = await self._in_thread(
+                        self.run_command, line.decode('utf-8', errors='replace')
+                    )
+                finally:
+                    owns_session = self.manager.in_transaction
+                    if not owns_session:
+                        self._session.release()
+
+                writer.write(encode_response(output))
+                await writer.drain()
+                if not keep_going:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            if owns_session:
+                # Клиент отключился посреди транзакции
+                self.manager.rollback()
+                self._session.release()
+            self.clients -= 1
+            writer.close()
+
+    def _in_thread(self, func, *args):
+        """Выполняет func в потоке команд, не останавливая цикл событий."""
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, func, *args)
+
+    async def publish_periodically(self):
+        """Публикует изменения, чтобы не держать блокировку записи долго."""
+        interval = self.manager.flush_interval or 1.0
+        while True:
+            await asyncio.sleep(interval)
+            if not self._session.locked():
+                await self._in_thread(self.manager.idle)
+
+    def close(self):
+        """Дожидается выполняемой команды и закрывает менеджер таблиц."""
+        self._executor.shutdown(wait=True)
+        self.manager.close()
+
+
+async def serve(port, host=SERVER_HOST, durability=DEFAULT_DURABILITY,
+                auto_vacuum=False):
+    """Запускает сервер и обслуживает клиентов до остановки."""
+    # Подтвердить удаление по сети некому
+    set_auto_confirm(True)
+    manager = TableManager(durability=durability, auto_vacuum=auto_vacuum)
+    server = Server(manager)
+
+    tcp_server = await asyncio.start_server(
+        server.handle_client, host, port, limit=SERVER_LINE_LIMIT
+    )
+    publisher = asyncio.ensure_future(server.publish_periodically())
+    print(f"Сервер запущен на {host}:{port}.")
+
+    # SIGINT и SIGTERM завершают сервер с записью изменений
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, stop.set)
+        except NotImplementedError:
+            pass
+
+    try:
+        async with tcp_server:
+            await stop.wait()
+        print("Сервер остановлен.")
+    finally:
+        publisher.cancel()
+        server.close()
+
+
+def run_server(port, host=SERVER_HOST, durability=DEFAULT_DURABILITY,
+               auto_vacuum=False):
+    """Точка входа режима сервера."""
+    try:
+        asyncio.run(serve(port, host, durability, auto_vacuum))
+    except KeyboardInterrupt:
+        print("Сервер остановлен.")
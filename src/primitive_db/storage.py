@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+
+import json
+import os
+from .constants import (
+    DATA_DIR, LOG_EXTENSION, LEGACY_EXTENSION, BINARY_EXTENSION,
+    LOG_INSERT, LOG_UPDATE, LOG_DELETE,
+)
+from .metrics import metrics
+
+
+def get_log_path(table_name, data_dir=DATA_DIR):
+    """Возвращает путь к журналу таблицы."""
+    return os.path.join(data_dir, f"{table_name}{LOG_EXTENSION}")
+
+
+def get_legacy_path(table_name, data_dir=DATA_DIR):
+    """Возвращает путь к старому JSON файлу таблицы."""
+    return os.path.join(data_dir, f"{table_name}{LEGACY_EXTENSION}")
+
+
+def get_binary_path(table_name, data_dir=DATA_DIR):
+    """Возвращает путь к двоичному файлу таблицы."""
+    return os.path.join(data_dir, f"{table_name}{BINARY_EXTENSION}")
+
+
+def remove_table_files(table_name, data_dir=DATA_DIR):
+    """Удаляет журнал и двоичный файл таблицы, если они есть."""
+    for path in (get_log_path(table_name, data_dir),
+                 get_binary_path(table_name, data_dir)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def get_files_size(table_name, data_dir=DATA_DIR):
+    """Суммарный размер журнала и двоичного файла таблицы в байтах."""
+    size = get_log_size(table_name, data_dir)
+    binary_path = get_binary_path(table_name, data_dir)
+    if os.path.exists(binary_path):
+        size += os.path.getsize(binary_path)
+    return size
+
+
+def insert_entry(record):
+    """Запись журнала о добавлении строки."""
+    # Копия: запись журнала не должна меняться вместе со строкой таблицы
+    return {"op": LOG_INSERT, "row": dict(record)}
+
+
+def update_entry(ids, changes):
+    """Запись журнала об изменении строк с указанными ID."""
+    return {"op": LOG_UPDATE, "ids": list(ids), "set": changes}
+
+
+def delete_entry(ids):
+    """Запись журнала об удалении строк с указанными ID."""
+    return {"op": LOG_DELETE, "ids": list(ids)}
+
+
+def dead_rows(entry):
+    """Сколько версий строк запись журнала делает мертвыми в файлах таблицы."""
+    if entry.get("op") in (LOG_UPDATE, LOG_DELETE):
+        return len(entry["ids"])
+    return 0
+
+
+def _dump_entry(entry):
+    return json.dumps(entry, ensure_ascii=False) + "\n"
+
+
+def append_log(table_name, entries, data_dir=DATA_DIR, sync=False):
+    """
+    Дописывает записи в конец журнала таблицы.
+
+    С sync=True данные сбрасываются на диск через fsync до возврата.
+    """
+    if not entries:
+        return
+
+    os.makedirs(data_dir, exist_ok=True)
+    filepath = get_log_path(table_name, data_dir)
+    torn = _has_torn_tail(filepath)
+
+    data = "".join(_dump_entry(entry) for entry in entries).encode('utf-8')
+    if torn:
+        # Недописанная строка после сбоя остается отдельной строкой
+        data = b"\n" + data
+
+    with open(filepath, 'ab') as file:
+        file.write(data)
+        if sync:
+            file.flush()
+            os.fsync(file.fileno())
+
+    if metrics.enabled:
+        metrics.inc("bytes_written_total", len(data), phase="save")
+
+
+def _has_torn_tail(filepath):
+    """Проверяет, что файл не пуст и не заканчивается переводом строки."""
+    try:
+        with open(filepath, 'rb') as file:
+            file.seek(0, os.SEEK_END)
+            if file.tell() == 0:
+                return False
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) != b"\n"
+    except FileNotFoundError:
+        return False
+
+
+def write_log(table_name, records, data_dir=DATA_DIR):
+    """
+    Перезаписывает журнал таблицы снимком текущих данных.
+
+    Файл сначала пишется во временный, затем атомарно подменяет старый.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    filepath = get_log_path(table_name, data_dir)
+    tmp_path = f"{filepath}.tmp"
+
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        file.writelines(_dump_entry(insert_entry(record)) for record in records)
+        file.flush()
+        os.fsync(file.fileno())
+        written = os.fstat(file.fileno()).st_size
+
+    os.replace(tmp_path, filepath)
+    if metrics.enabled:
+        metrics.inc("bytes_written_total", written, phase="save")
+
+
+def apply_entry(rows, entry):
+    """Применяет запись журнала к словарю строк {ID: запись}."""
+    op = entry.get("op")
+
+    if op == LOG_INSERT:
+        record = entry["row"]
+        rows[record.get('ID')] = record
+    elif op == LOG_UPDATE:
+        changes = entry["set"]
+        for record_id in entry["ids"]:
+            record = rows.get(record_id)
+            if record is None:
+                continue
+            record.update(changes)
+    elif op == LOG_DELETE:
+        for record_id in entry["ids"]:
+            rows.pop(record_id, None)
+    else:
+        raise ValueError(f"Неизвестная операция в журнале: {op}")
+
+
+def apply_entries(records, entries):
+    """Применяет записи журнала к списку строк и возвращает новый список."""
+    rows = {record.get('ID'): record for record in records}
+    for entry in entries:
+        apply_entry(rows, entry)
+    return list(rows.values())
+
+
+def get_log_size(table_name, data_dir=DATA_DIR):
+    """Возвращает размер журнала таблицы в байтах (0, если его нет)."""
+    try:
+        return os.path.getsize(get_log_path(table_name, data_dir))
+    except FileNotFoundError:
+        return 0
+
+
+def iter_log(table_name, data_dir=DATA_DIR, limit=None, start=0):
+    """
+    Читает записи журнала таблицы по порядку.
+
+    limit ограничивает чтение первыми limit байтами: так читатель видит
+    опубликованную версию, даже если писатель уже дописывает следующую.
+    start - смещение начала чтения (граница записи).
+    Если опубликован непустой журнал, а файла нет, FileNotFoundError
+    пробрасывается: файл заменила более новая версия таблицы.
+    """
+    consumed = start
+
+    try:
+        with open(get_log_path(table_name, data_dir), 'rb') as file:
+            file.seek(start)
+            for line in file:
+                consumed += len(line)
+                if limit is not None and consumed > limit:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # Недописанная строка после сбоя: её изменения
+                    # восстанавливаются из журнала упреждающей записи
+                    continue
+                yield entry
+    except FileNotFoundError:
+        if limit:
+            raise
+        return
+
+    if metrics.enabled:
+        metrics.inc(
+            "bytes_read_total",
+            consumed if limit is None else min(consumed, limit),
+            phase="load",
+        )
+
+
+def replay_log(table_name, data_dir=DATA_DIR, limit=None):
+    """Восстанавливает данные таблицы, проигрывая её журнал (до limit байт)."""
+    rows = {}
+    for entry in iter_log(table_name, data_dir, limit):
+        apply_entry(rows, entry)
+    return list(rows.values())
+
+
+def migrate_legacy_table(table_name, data_dir=DATA_DIR):
+    """Переводит таблицу из старого JSON файла в журнал, если нужно."""
+    legacy_path = get_legacy_path(table_name, data_dir)
+    if not os.path.exists(legacy_path):
+        return
+    if os.path.exists(get_log_path(table_name, data_dir)):
+        return
+
+    with open(legacy_path, 'r', encoding='utf-8') as file:
+        records = json.load(file)
+
+    write_log(table_name, records, data_dir)
+    os.remove(legacy_path)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+
+from itertools import islice
+from .constants import SCAN_CHUNK_SIZE
+from .decorators import log_phase
+from .index import HashIndex, SortedIndex
+from .metrics import metrics
+
+
+def iter_matching(table_name, candidates, where_clause, chunk_size=SCAN_CHUNK_SIZE):
+    """
+    Проверяет кандидатов по частям и выдает списки совпавших записей.
+
+    Потребитель может остановиться после любой части: остальные
+    кандидаты не просматриваются.
+    """
+    predicate = where_clause.predicate if where_clause else None
+    candidates = iter(candidates)
+    while True:
+        with metrics.timer("phase_seconds", phase="filter"):
+            chunk = list(islice(candidates, chunk_size))
+            if predicate is not None:
+                matches = [record for record in chunk if predicate(record)]
+            else:
+                matches = chunk
+        if not chunk:
+            return
+        if metrics.enabled:
+            metrics.inc("rows_scanned_total", len(chunk), table=table_name)
+        if matches:
+            yield matches
+
+
+class Table:
+    """
+    Данные таблицы в памяти вместе с её индексами.
+
+    Записи хранятся в словаре {ID: запись} в порядке добавления, он же
+    служит первичным ключом: поиск и удаление по ID не требуют просмотра.
+    """
+
+    def __init__(self, name, records=None, indexes=None, column_types=None):
+        self.name = name
+        self.by_id = {record.get('ID'): record for record in records or []}
+        self.column_types = dict(column_types or {})
+        self.indexes = {}
+
+        for column, kind in (indexes or {}).items():
+            self.add_index(column, kind)
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def __len__(self):
+        return len(self.by_id)
+
+    @property
+    def records(self):
+        """Список всех записей в порядке добавления."""
+        return list(self.by_id.values())
+
+    def max_id(self):
+        """Возвращает наибольший ID в таблице (0 для пустой)."""
+        return max(
+            (record_id for record_id in self.by_id if isinstance(record_id, int)),
+            default=0,
+        )
+
+    def add_index(self, column, kind="hash"):
+        """Создает индекс по столбцу и заполняет его текущими записями."""
+        if kind == "sorted":
+            index = SortedIndex(column, self.column_types.get(column))
+        else:
+            index = HashIndex(column)
+        index.build(self.by_id.values())
+        self.indexes[column] = index
+
+    def drop_index(self, column):
+        """Удаляет индекс по столбцу."""
+        self.indexes.pop(column, None)
+
+    def access_path(self, where_clause):
+        """
+        Выбирает способ найти кандидатов для WHERE: (вид, столбец, аргумент).
+
+        Равенство (или IN) по ID обслуживается первичным ключом ("key"),
+        по индексированному столбцу - корзинами индекса ("index"),
+        сравнения <, > по столбцу с упорядоченным индексом - поиском
+        диапазона ("range"). Иначе нужен полный просмотр ("scan").
+        """
+        if where_clause:
+            equalities = dict(where_clause.equalities)
+            if 'ID' in equalities:
+                return "key", 'ID', set(equalities['ID'])
+
+            for column, values in where_clause.equalities:
+                if column in self.indexes:
+                    return "index", column, set(values)
+
+            for column, index in self.indexes.items():
+                if index.kind == "sorted":
+                    bounds = where_clause.bounds(column, index.value_type)
+                    if bounds is not None:
+                        return "range", column, bounds
+
+        return "scan", None, None
+
+    def candidates(self, where_clause):
+        """
+        Возвращает записи, среди которых нужно искать совпадения с WHERE.
+
+        Условие целиком проверяет вызывающий код.
+        """
+        kind, column, argument = self.access_path(where_clause)
+        if kind == "key":
+            return [self.by_id[value] for value in argument if value in self.by_id]
+        if kind == "index":
+            found = []
+            for value in argument:
+                found.extend(self.indexes[column].lookup(value))
+            return found
+        if kind == "range":
+            return self.indexes[column].range(*argument)
+        return self.records
+
+    def key_lookup(self, column):
+        """
+        Функция "значение -> записи" по первичному ключу или индексу столбца.
+
+        Возвращает None, если ни ключа, ни индекса по столбцу нет.
+        """
+        if column == 'ID':
+            by_id = self.by_id
+            return lambda value: [by_id[value]] if value in by_id else []
+        index = self.indexes.get(column)
+        return index.lookup if index is not None else None
+
+    def estimate(self, where_clause):
+        """Число кандидатов для WHERE, посчитанное без их выборки."""
+        kind, column, argument = self.access_path(where_clause)
+        if kind == "key":
+            return sum(1 for value in argument if value in self.by_id)
+        if kind == "index":
+            index = self.indexes[column]
+            return sum(index.count(value) for value in argument)
+        if kind == "range":
+            return self.indexes[column].count_range(*argument)
+        return len(self.by_id)
+
+    @log_phase("filter")
+    def filter(self, where_clause):
+        """Возвращает записи, удовлетворяющие условию."""
+        if where_clause is None:
+            if metrics.enabled:
+                metrics.inc("rows_scanned_total", len(self.by_id), table=self.name)
+            return self.records
+
+        candidates = self.candidates(where_clause)
+        if metrics.enabled:
+            metrics.inc("rows_scanned_total", len(candidates), table=self.name)
+        predicate = where_clause.predicate
+        return [record for record in candidates if predicate(record)]
+
+    def iter_filter(self, where_clause, columns=None):
+        """
+        Как filter, но потоково: выдает списки совпавших записей по частям.
+
+        columns (нужные столбцы) не используется: записи уже хранятся
+        словарями и не копируются.
+        """
+        if where_clause is None:
+            candidates = self.by_id.values()
+        else:
+            candidates = self.candidates(where_clause)
+        return iter_matching(self.name, candidates, where_clause)
+
+    def ordered_candidates(self, where_clause, column, descending=False):
+        """
+        Возвращает кандидатов в порядке столбца по упорядоченному индексу.
+
+        Если упорядоченного индекса по столбцу нет, возвращает None.
+        """
+        index = self.indexes.get(column)
+        if index is None or index.kind != "sorted":
+            return None
+
+        if where_clause:
+            bounds = where_clause.bounds(column, index.value_type)
+            if bounds is not None:
+                return index.range(*bounds, descending=descending)
+
+        return index.ordered(descending)
+
+    def append(self, record):
+        """Добавляет запись в таблицу и индексы."""
+        self.by_id[record.get('ID')] = record
+        for index in self.indexes.values():
+            index.add(record)
+
+    def update_record(self, record, changes):
+        """
+        Изменяет запись, поддерживая индексы в актуальном состоянии.
+        ID не меняется (см. core.update): ключи by_id остаются прежними.
+        """
+        touched = [
+            index for column, index in self.indexes.items() if column in changes
+        ]
+        for index in touched:
+            index.remove(record)
+
+        record.update(changes)
+
+        for index in touched:
+            index.add(record)
+
+    def remove_records(self, records):
+        """Удаляет записи из таблицы и индексов."""
+        for record in records:
+            for index in self.indexes.values():
+                index.remove(record)
+            self.by_id.pop(record.get('ID'), None)
+
+    def clear(self):
+        """Удаляет все записи."""
+        self.by_id = {}
+        for index in self.indexes.values():
+            index.build([])
@@ -3,6 +3,9 @@
 import json
 import os
 from .constants import META_FILE, DATA_DIR
+from .decorators import log_phase
+from .metrics import metrics
+from .storage import append_log, migrate_legacy_table, replay_log, write_log
 
 
 def load_metadata(filepath=META_FILE):
@@ -15,27 +18,31 @@ def load_metadata(filepath=META_FILE):
 
 
 def save_metadata(data, filepath=META_FILE):
-    """Сохраняет метаданные в JSON файл."""
-    with open(filepath, 'w', encoding='utf-8') as file:
+    """Сохраняет метаданные в JSON файл через временный файл."""
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
         json.dump(data, file, ensure_ascii=False, indent=2)
+        file.flush()
+        os.fsync(file.fileno())
+        written = os.fstat(file.fileno()).st_size
+    os.replace(tmp_path, filepath)
+    if metrics.enabled:
+        metrics.inc("bytes_written_total", written, phase="save")
 
 
-def load_table_data(table_name, data_dir=DATA_DIR):
-    """Загружает данные таблицы из JSON файла."""
+@log_phase("load")
+def load_table_data(table_name, data_dir=DATA_DIR, limit=None):
+    """Загружает данные таблицы, проигрывая её журнал (до limit байт)."""
     os.makedirs(data_dir, exist_ok=True)
-    filepath = os.path.join(data_dir, f"{table_name}.json")
-
-    try:
-        with open(filepath, 'r', encoding='utf-8') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return []
+    migrate_legacy_table(table_name, data_dir)
+    return replay_log(table_name, data_dir, limit)
 
 
 def save_table_data(table_name, data, data_dir=DATA_DIR):
-    """Сохраняет данные таблицы в JSON файл."""
-    os.makedirs(data_dir, exist_ok=True)
-    filepath = os.path.join(data_dir, f"{table_name}.json")
+    """Сохраняет данные таблицы целиком, сжимая журнал до снимка."""
+    write_log(table_name, data, data_dir)
 
-    with open(filepath, 'w', encoding='utf-8') as file:
-        json.dump(data, file, ensure_ascii=False, indent=2)
+
+def append_table_changes(table_name, entries, data_dir=DATA_DIR, sync=False):
+    """Дописывает изменения в журнал таблицы без перезаписи файла."""
+    append_log(table_name, entries, data_dir, sync)
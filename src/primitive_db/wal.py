@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import threading
+import time
+from .constants import DEFAULT_DURABILITY, ERROR_DURABILITY
+from .metrics import metrics
+
+
+def parse_durability(policy):
+    """
+    Разбирает политику надежности.
+
+    "always" -> 0 (fsync на каждый коммит), "off" -> None (без fsync),
+    "<N>ms" -> N/1000 (один fsync на группу коммитов раз в N мс).
+    """
+    policy = str(policy).strip().lower()
+    if policy == "always":
+        return 0
+    if policy == "off":
+        return None
+    if policy.endswith("ms") and policy[:-2].isdigit() and int(policy[:-2]) > 0:
+        return int(policy[:-2]) / 1000
+    raise ValueError(ERROR_DURABILITY.format(policy))
+
+
+class WriteAheadLog:
+    """
+    Журнал упреждающей записи: одна строка JSON на транзакцию.
+
+    Коммит дописывается в файл сразу, а fsync выполняется по политике.
+    При интервальной политике коммиты, пришедшие между двумя fsync,
+    становятся надежными одним общим вызовом (групповой коммит).
+    """
+
+    def __init__(self, path, durability=DEFAULT_DURABILITY):
+        self.path = path
+        self.commits = 0
+        self.fsyncs = 0
+        self._file = None
+        self._unsynced = False
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._syncer = None
+        self.set_durability(durability)
+
+    def set_durability(self, policy):
+        """Меняет политику fsync для текущей сессии."""
+        interval = parse_durability(policy)
+        self._stop_syncer()
+        self.policy = str(policy).strip().lower()
+        self.interval = interval
+
+        if interval:
+            # Фоновый fsync, чтобы хвост не ждал следующего коммита
+            self._stop = threading.Event()
+            self._syncer = threading.Thread(target=self._sync_loop, daemon=True)
+            self._syncer.start()
+
+    def _stop_syncer(self):
+        if self._syncer is not None:
+            self._stop.set()
+            self._syncer.join()
+            self._syncer = None
+
+    def _sync_loop(self):
+        while not self._stop.wait(self.interval):
+            self.sync()
+
+    def _open(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+            if self._file.tell() > 0:
+                # Отделяем возможную недописанную строку после сбоя
+                self._file.write("\n")
+        return self._file
+
+    def append(self, record):
+        """Дописывает транзакцию в журнал и делает fsync по политике."""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+
+        with self._lock:
+            file = self._open()
+            file.write(line)
+            file.flush()
+            self.commits += 1
+            self._unsynced = True
+            if metrics.enabled:
+                metrics.inc(
+                    "bytes_written_total", len(line.encode('utf-8')),
+                    phase="commit",
+                )
+
+            if self.interval == 0:
+                self._fsync()
+            elif (
+                self.interval
+                and time.monotonic() - self._last_sync >= self.interval
+            ):
+                self._fsync()
+
+    def _fsync(self):
+        os.fsync(self._file.fileno())
+        self.fsyncs += 1
+        self._unsynced = False
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        """Принудительно сбрасывает журнал на диск."""
+        with self._lock:
+            if self._file is not None and self._unsynced:
+                self._fsync()
+
+    def read(self):
+        """Читает все целые транзакции журнала."""
+        records = []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Недописанная транзакция после сбоя не применяется
+                        continue
+        except FileNotFoundError:
+            pass
+        return records
+
+    def truncate(self):
+        """Очищает журнал после переноса изменений в файлы таблиц."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if os.path.exists(self.path):
+                with open(self.path, 'w', encoding='utf-8') as file:
+                    os.fsync(file.fileno())
+            self._unsynced = False
+
+    def close(self):
+        """Сбрасывает хвост журнала и закрывает файл."""
+        self._stop_syncer()
+        self.sync()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def stats(self):
+        """Возвращает политику и счетчики коммитов и fsync."""
+        return {
+            "durability": self.policy,
+            "commits": self.commits,
+            "fsyncs": self.fsyncs,
+        }
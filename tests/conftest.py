@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+
+import pytest
+
+from src.primitive_db import parallel
+from src.primitive_db.constants import PARALLEL_SCAN_MIN_ROWS, PARALLEL_SCAN_WORKERS
+from src.primitive_db.decorators import set_auto_confirm
+from src.primitive_db.engine import execute_command
+from src.primitive_db.manager import TableManager
+
+# Представления и форматы, в которых запросы должны давать одно и то же:
+# имя -> команды, переводящие таблицу t в это представление
+LAYOUTS = {
+    "rows": [],
+    "hash_indexed": [
+        "create_index t name using hash",
+        "create_index t city using hash",
+    ],
+    "sorted_indexed": [
+        "create_index t age using sorted",
+        "create_index t name using sorted",
+    ],
+    "columnar": ["set_layout t columnar"],
+    "binary": ["set_format t binary"],
+    "zlib": ["set_format t zlib"],
+    "lzma": ["set_format t lzma"],
+}
+
+# Запросы, результаты которых сравниваются между представлениями
+QUERIES = [
+    "select from t",
+    "select from t where ID = 17",
+    "select from t where ID in (1, 2, 999)",
+    'select from t where name = "user5"',
+    'select from t where name != "user5" and age < 20',
+    'select from t where city = ""',
+    'select from t where city in ("Томск", "Париж")',
+    'select from t where name < "user2"',
+    "select from t where age >= 30 and age < 40 or active = false",
+    "select from t where not (age > 10)",
+    "select from t where active = true and ID > 250",
+    "select name, age from t where age > 80",
+    "select from t order by ID desc limit 5",
+    "select age from t where active = true order by age desc limit 7",
+    'select name from t where city = "Омск" order by name limit 3 offset 2',
+    "select city, count(*), min(age), max(age) from t group by city",
+    "select count(*) from t",
+    "select count(*) from t where age > 80",
+    "select count(*) from t where active = true group by active",
+]
+
+# Изменения между двумя прогонами запросов
+CHANGES = [
+    'update t set city = "Тверь" where age < 10',
+    "delete from t where ID in (3, 4, 5) or age = 42",
+    'insert into t values ("new", 7, "Тверь", true)',
+]
+
+# Столбцы таблицы sample_records для прямой записи двоичных файлов
+COLUMN_TYPES = {"ID": int, "name": str, "age": int, "active": bool}
+
+
+class Database:
+    """Каталог базы во временной папке и менеджеры, открытые над ним."""
+
+    def __init__(self, path):
+        self.meta_file = str(path / "db_meta.json")
+        self.data_dir = str(path / "data")
+        self.managers = []
+
+    def open(self, **options):
+        """Открывает менеджер таблиц (по умолчанию без fsync)."""
+        options.setdefault("durability", "off")
+        manager = TableManager(self.meta_file, self.data_dir, **options)
+        self.managers.append(manager)
+        return manager
+
+    def crash(self, manager):
+        """Бросает менеджер, как упавший процесс: без контрольной точки."""
+        manager.wal.close()
+        manager._lock.close()
+        self.managers.remove(manager)
+
+    def close(self):
+        for manager in self.managers:
+            manager.close()
+        self.managers = []
+
+
+def run(manager, command):
+    """Выполняет команду и возвращает её вывод."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        execute_command(manager, command)
+    return output.getvalue()
+
+
+def rows(manager, query):
+    """Выполняет select и возвращает записи вывода в формате jsonl."""
+    output = run(manager, f"{query} format jsonl")
+    return [json.loads(line) for line in output.splitlines() if line]
+
+
+def fill(manager, count=300):
+    """Создает таблицу t из count строк с повторяющимися значениями."""
+    run(manager, "create_table t name:str age:int city:str active:bool")
+    cities = ["Москва", "Казань", "Томск", "", "Омск"]
+    values = ", ".join(
+        f'("user{i % 37}", {i * 7 % 90}, "{cities[i % 5]}", '
+        f'{"true" if i % 3 else "false"})'
+        for i in range(count)
+    )
+    run(manager, f"insert into t values {values}")
+
+
+def sample_records(count):
+    """Записи с ID от 1 до count, где в каждом столбце встречается NULL."""
+    return [
+        {
+            "ID": number,
+            "name": None if number % 11 == 0 else f"user{number % 7}",
+            "age": None if number % 13 == 0 else number,
+            "active": None if number % 17 == 0 else number % 2 == 0,
+        }
+        for number in range(1, count + 1)
+    ]
+
+
+def query_results(manager):
+    """
+    Результаты QUERIES. Без ORDER BY порядок строк зависит от способа
+    доступа (индекс, просмотр), поэтому сравнивается только их набор;
+    запросы с ORDER BY выводят лишь столбец сортировки, и их порядок
+    однозначен.
+    """
+    results = {}
+    for query in QUERIES:
+        result = rows(manager, query)
+        if "order by" not in query:
+            result.sort(key=lambda row: json.dumps(row, ensure_ascii=False))
+        results[query] = result
+    return results
+
+
+def check_layout(path, layout, expected):
+    """
+    Сравнивает результаты QUERIES в представлении layout с expected до
+    изменений CHANGES, после них и после перезапуска.
+    """
+    database = Database(path / layout)
+    manager = database.open()
+    fill(manager)
+    for command in LAYOUTS[layout]:
+        assert "Ошибка" not in run(manager, command)
+    before, after = expected
+    assert query_results(manager) == before
+
+    for change in CHANGES:
+        run(manager, change)
+    assert query_results(manager) == after
+
+    # И после перезапуска: снимок файла плюс журнал изменений
+    database.close()
+    assert query_results(database.open()) == after
+    database.close()
+
+
+@pytest.fixture(autouse=True)
+def auto_confirm():
+    set_auto_confirm(True)
+    yield
+    set_auto_confirm(False)
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = Database(tmp_path)
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def expected(tmp_path):
+    """Результаты QUERIES на обычной таблице по строкам: до и после CHANGES."""
+    database = Database(tmp_path / "expected")
+    manager = database.open()
+    fill(manager)
+    before = query_results(manager)
+    for change in CHANGES:
+        run(manager, change)
+    after = query_results(manager)
+    database.close()
+    assert all(before.values()) and all(after.values())
+    return before, after
+
+
+@pytest.fixture
+def scan_pool():
+    """Пул процессов, который берет любой просмотр (от одной строки)."""
+    parallel.configure(2, 1)
+    yield
+    parallel.configure(PARALLEL_SCAN_WORKERS, PARALLEL_SCAN_MIN_ROWS)
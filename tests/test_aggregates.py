@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from conftest import LAYOUTS, fill, rows, run
+
+
+@pytest.fixture
+def manager(database):
+    manager = database.open()
+    run(manager, "create_table t name:str age:int city:str")
+    run(
+        manager,
+        'insert into t values ("a", 10, "X"), ("b", 20, "X"), ("c", 35, "Y")',
+    )
+    return manager
+
+
+def test_group_by_with_all_functions(manager):
+    query = (
+        "select city, count(*), sum(age), avg(age), min(age), max(age) "
+        "from t group by city order by city"
+    )
+    assert rows(manager, query) == [
+        {"city": "X", "count(*)": 2, "sum(age)": 30, "avg(age)": 15.0,
+         "min(age)": 10, "max(age)": 20},
+        {"city": "Y", "count(*)": 1, "sum(age)": 35, "avg(age)": 35.0,
+         "min(age)": 35, "max(age)": 35},
+    ]
+
+
+def test_totals_without_group_by(manager):
+    assert rows(manager, "select count(*), avg(age) from t where age > 100") == [
+        {"count(*)": 0, "avg(age)": None},
+    ]
+    assert rows(manager, "select min(name), max(name) from t") == [
+        {"min(name)": "a", "max(name)": "c"},
+    ]
+
+
+def test_order_and_limit_apply_to_result_rows(manager):
+    query = "select city, count(*) from t group by city order by count(*) {} limit 1"
+    assert rows(manager, query.format("desc")) == [{"city": "X", "count(*)": 2}]
+    assert rows(manager, query.format("asc")) == [{"city": "Y", "count(*)": 1}]
+
+
+@pytest.mark.parametrize("query, error", [
+    ("select sum(name) from t", "только к столбцам int"),
+    ("select name, count(*) from t", "должен быть в GROUP BY"),
+    ("select count(*) from t group by nope", "не существует"),
+])
+def test_invalid_aggregates(manager, query, error):
+    assert error in run(manager, query)
+
+
+@pytest.mark.parametrize("layout", ["rows", "hash_indexed", "columnar", "binary"])
+def test_count_with_where_matches_rows(database, layout):
+    manager = database.open()
+    fill(manager)
+    for command in LAYOUTS[layout]:
+        run(manager, command)
+    matched = len(rows(manager, "select ID from t where age > 40 and active = true"))
+    assert rows(
+        manager, "select count(*) from t where age > 40 and active = true"
+    ) == [{"count(*)": matched}]
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import os
+
+import pytest
+
+from src.primitive_db.api import DataError, ProgrammingError, connect
+from src.primitive_db.constants import LOCK_FILE
+from src.primitive_db.locking import FileLock
+
+
+@pytest.fixture
+def db(tmp_path):
+    connection = connect(
+        str(tmp_path / "db_meta.json"), str(tmp_path / "data"), durability="off"
+    )
+    connection.execute("create_table users name:str age:int")
+    yield connection
+    connection.close()
+
+
+def _lock_is_free(tmp_path):
+    """Может ли другой процесс сейчас захватить блокировку записи."""
+    lock = FileLock(os.path.join(str(tmp_path / "data"), LOCK_FILE))
+    free = lock.acquire(blocking=False)
+    lock.close()
+    return free
+
+
+def test_prepared_statements(db):
+    result = db.executemany(
+        "insert into users values (?, ?)", [("ann", 30), ("bob", 25), ("cat", 41)]
+    )
+    assert result.rowcount == 3 and result.ids == [1, 2, 3]
+
+    select = db.prepare("select name from users where age >= ? order by name")
+    assert select.execute((30,)).fetchall() == [("ann",), ("cat",)]
+    assert db.prepare("select name from users where age >= ? order by name") is select
+
+    assert db.execute("update users set age = ? where name = ?", (31, "ann")).ids == [1]
+    assert db.execute("delete from users where age < ?", (30,)).rowcount == 1
+    assert db.execute("select count(*) from users").fetchall() == [(2,)]
+
+
+def test_transaction_rolls_back_on_error(db):
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.execute("insert into users values (?, ?)", ("ann", 30))
+            raise RuntimeError
+    assert db.execute("select from users").fetchall() == []
+
+
+@pytest.mark.parametrize("query, params, error", [
+    ("insert into users values (?, ?)", ("ann", "x"), DataError),
+    ("insert into users values (?, ?)", ("ann",), ProgrammingError),
+    ("insert into users values (?, ?)", ("ann", 1.5), DataError),
+    ("update users set age = ? where ID = 1", ("x",), DataError),
+])
+def test_failed_write_releases_lock(tmp_path, db, query, params, error):
+    with pytest.raises(error):
+        db.execute(query, params)
+    assert _lock_is_free(tmp_path)
+
+
+def test_write_publishes_and_releases_lock(tmp_path, db):
+    db.execute("insert into users values (?, ?)", ("ann", 30))
+    assert _lock_is_free(tmp_path)
+
+    # Другое соединение видит изменение без контрольной точки первого
+    other = connect(
+        str(tmp_path / "db_meta.json"), str(tmp_path / "data"), durability="off"
+    )
+    assert other.execute("select name from users").fetchall() == [("ann",)]
+    other.execute("insert into users values (?, ?)", ("bob", 25))
+    assert db.execute("select count(*) from users").fetchall() == [(2,)]
+    other.close()
+
+
+def test_transaction_holds_lock_until_commit(tmp_path, db):
+    db.begin()
+    db.execute("insert into users values (?, ?)", ("ann", 30))
+    assert not _lock_is_free(tmp_path)
+    db.commit()
+    assert _lock_is_free(tmp_path)
+
+    db.begin()
+    db.execute("delete from users where ID = ?", (1,))
+    db.rollback()
+    assert _lock_is_free(tmp_path)
+    assert db.execute("select count(*) from users").fetchall() == [(1,)]
+
+
+def test_prepare_sees_tables_of_other_connections(tmp_path, db):
+    assert db.execute("select from users").fetchall() == []
+    other = connect(
+        str(tmp_path / "db_meta.json"), str(tmp_path / "data"), durability="off"
+    )
+    other.execute("create_table orders amount:int")
+    other.execute("insert into orders values (?)", (5,))
+    assert db.execute("select amount from orders").fetchall() == [(5,)]
+    other.close()
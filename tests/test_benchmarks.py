@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import json
+
+import pytest
+
+from benchmarks.__main__ import compare, main
+from benchmarks.data import format_size, generate_records, parse_size
+from benchmarks.suite import percentile, run_size
+
+
+@pytest.mark.parametrize("text, size", [
+    ("10000", 10_000), ("10k", 10_000), ("1m", 1_000_000), (" 2K ", 2_000),
+])
+def test_size_round_trip(text, size):
+    assert parse_size(text) == size
+    assert parse_size(format_size(size)) == size
+
+
+def test_generated_data_depends_only_on_seed():
+    first = list(generate_records(50, seed=3))
+    assert first == list(generate_records(50, seed=3))
+    assert first != list(generate_records(50, seed=4))
+    assert [record["ID"] for record in first] == list(range(1, 51))
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.5) == 0
+
+
+def test_run_size_measures_selected_operations():
+    only = {"select_all", "select_where_eq_binary", "command_select"}
+    results = run_size(2000, only=only)
+    assert set(results) == only
+    for result in results.values():
+        assert result["ops"] > 0
+        assert result["ops_per_sec"] > 0
+        assert result["p50_us"] <= result["p95_us"] <= result["p99_us"]
+
+
+def _report(**ops_per_sec):
+    return {"results": {"10k": {
+        name: {"ops_per_sec": value} for name, value in ops_per_sec.items()
+    }}}
+
+
+def test_compare_reports_only_drops_over_threshold():
+    baseline = _report(select=100, insert=100, load=100)
+    report = _report(select=85, insert=70, load=150, save=10)
+    regressions = compare(report, baseline, 0.2)
+    assert [(name, round(change, 2)) for _, name, change in regressions] == [
+        ("insert", -0.3),
+    ]
+
+
+def test_main_fails_on_regression(tmp_path, capsys):
+    output = tmp_path / "report.json"
+    main(["--sizes", "1k", "--only", "select_all", "--output", str(output)])
+    report = json.loads(output.read_text(encoding="utf-8"))
+    assert set(report["results"]["1k"]) == {"select_all"}
+
+    # База в тысячу раз быстрее текущего прогона
+    report["results"]["1k"]["select_all"]["ops_per_sec"] *= 1000
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(report), encoding="utf-8")
+    with pytest.raises(SystemExit) as error:
+        main(["--sizes", "1k", "--only", "select_all", "--baseline", str(baseline)])
+    assert error.value.code == 1
+    assert "Регрессий больше 20%: 1" in capsys.readouterr().out
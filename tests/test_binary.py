@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import os
+
+import pytest
+
+from src.primitive_db.binary import load_binary_table, write_binary
+from src.primitive_db.parser import parse_where_condition
+from conftest import (
+    COLUMN_TYPES, check_layout, fill, rows, run, sample_records,
+)
+
+
+@pytest.mark.parametrize("compression", [None, "zlib", "lzma"])
+def test_binary_round_trip(tmp_path, compression):
+    records = sample_records(200) + [
+        {"ID": 1000, "name": "", "age": -5, "active": True},
+    ]
+    write_binary(
+        "t", records, COLUMN_TYPES, str(tmp_path), segment_rows=64,
+        compression=compression,
+    )
+    table = load_binary_table("t", "t", COLUMN_TYPES, str(tmp_path))
+    assert list(table) == records
+
+    for condition in [
+        'name = "user3"', 'name = ""', "age > 150", 'name != "user1"',
+        "active = false", 'name in ("user2", "nobody")', "ID >= 190",
+    ]:
+        where = parse_where_condition(condition)
+        assert table.filter(where) == [r for r in records if where.predicate(r)]
+
+
+def test_binary_rejects_wrong_type(tmp_path):
+    with pytest.raises(ValueError):
+        write_binary("t", [{"ID": 1, "age": "x"}], {"ID": int, "age": int},
+                     str(tmp_path))
+    assert not os.listdir(tmp_path)
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_binary_append_keeps_columns_mapped(tmp_path, compression):
+    records = sample_records(200)
+    write_binary(
+        "t", records, COLUMN_TYPES, str(tmp_path), segment_rows=64,
+        compression=compression,
+    )
+    table = load_binary_table("t", "t", COLUMN_TYPES, str(tmp_path))
+    added = [
+        {"ID": 201, "name": "user3", "age": None, "active": True},
+        {"ID": 202, "name": None, "age": 500, "active": None},
+        {"ID": 5, "name": "new", "age": 5, "active": False},
+    ]
+    for record in added:
+        table.append(record)
+    assert table.mapped_columns == list(COLUMN_TYPES)
+
+    records = [record for record in records if record["ID"] != 5] + added
+    assert sorted(table, key=lambda r: r["ID"]) == sorted(
+        records, key=lambda r: r["ID"]
+    )
+    for condition in [
+        'name = "user3"', 'name != "new"', "age > 150", "active = false",
+        'name in ("new", "user1")', "ID > 199 or age < 3",
+    ]:
+        where = parse_where_condition(condition)
+        assert sorted(map(str, table.filter(where))) == sorted(
+            str(record) for record in records if where.predicate(record)
+        )
+
+    # Измененный столбец копируется в память вместе с хвостом
+    table.update_record(table._row(table.by_id[202]), {"name": "x"})
+    assert "name" not in table.mapped_columns
+    assert table._row(table.by_id[202])["name"] == "x"
+    assert table._row(table.by_id[201])["name"] == "user3"
+
+
+@pytest.mark.parametrize("storage_format", ["jsonl", "binary", "zlib", "lzma"])
+def test_round_trip_after_restart(database, storage_format):
+    manager = database.open()
+    fill(manager, 100)
+    run(manager, f"set_format t {storage_format}")
+    run(manager, 'update t set name = "x" where age < 30')
+    run(manager, "delete from t where ID > 90")
+    expected = rows(manager, "select from t")
+    database.close()
+
+    manager = database.open()
+    assert rows(manager, "select from t") == expected
+    assert len(expected) == 90
+
+
+@pytest.mark.parametrize("layout", ["binary", "zlib", "lzma"])
+def test_layouts_give_same_results(tmp_path, layout, expected):
+    check_layout(tmp_path, layout, expected)
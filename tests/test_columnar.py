@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from src.primitive_db.columnar import (
+    ColumnarTable, IntColumn, StrColumn, mask_from_flags, mask_positions,
+)
+from src.primitive_db.parser import parse_where_condition
+from conftest import LAYOUTS, check_layout, fill, rows, run
+
+COLUMN_TYPES = {"ID": int, "name": str, "age": int, "active": bool}
+
+
+def _table(count):
+    return ColumnarTable("t", [
+        {"ID": number, "name": f"user{number % 5}",
+         "age": None if number % 7 == 0 else number, "active": number % 2 == 0}
+        for number in range(1, count + 1)
+    ], COLUMN_TYPES)
+
+
+def test_columnar_gives_same_results(tmp_path, expected):
+    check_layout(tmp_path, "columnar", expected)
+
+
+def test_masks():
+    mask = mask_from_flags(bytes([1, 0, 0, 1, 1]))
+    assert list(mask_positions(mask, 5)) == [0, 3, 4]
+
+    column = StrColumn()
+    for value in ["b", None, "a", "b"]:
+        column.append(value)
+    assert list(mask_positions(column.compare("=", "b"), 4)) == [0, 3]
+    assert list(mask_positions(column.compare("!=", "b"), 4)) == [1, 2]
+    assert list(mask_positions(column.compare("<", "b"), 4)) == [2]
+    assert list(mask_positions(column.contains(["a", "z"]), 4)) == [2]
+
+
+def test_columns_reject_wrong_types():
+    with pytest.raises(ValueError):
+        IntColumn().append(True)
+    with pytest.raises(ValueError):
+        StrColumn().append(1)
+
+
+@pytest.mark.parametrize("condition", [
+    'name = "user1" and age > 10', "age = 7", "age != 7", "not active = true",
+    'name in ("user2", "user3") or ID < 3', "missing = 1", "missing != 1",
+])
+def test_filter_matches_predicate(condition):
+    table = _table(100)
+    where = parse_where_condition(condition)
+    assert table.filter(where) == [record for record in table if where(record)]
+
+
+def test_deletes_compact_columns():
+    table = _table(100)
+    table.remove_records([{"ID": number} for number in range(1, 61)])
+    assert len(table.alive) == 40
+    assert [record["ID"] for record in table] == list(range(61, 101))
+    assert table.filter(parse_where_condition("ID = 70"))[0]["name"] == "user0"
+
+
+def test_columnar_rejects_indexes(database):
+    manager = database.open()
+    fill(manager, 5)
+    run(manager, "set_layout t columnar")
+    assert "Ошибка" in run(manager, "create_index t age")
+    assert len(rows(manager, "select from t")) == 5
+
+
+@pytest.mark.parametrize("layout", list(LAYOUTS))
+@pytest.mark.parametrize("change", [
+    'update t set age = "x" where ID > 0',
+    'update t set name = "ok", age = "x" where ID > 0',
+    'update t set nope = 1 where ID > 0',
+    'update t set active = 1 where ID = 1',
+])
+def test_update_rejects_bad_set(database, layout, change):
+    manager = database.open()
+    fill(manager, 10)
+    for command in LAYOUTS[layout]:
+        run(manager, command)
+    expected = rows(manager, "select from t")
+    output = run(manager, change)
+    assert "Ошибка валидации" in output
+    assert "Произошла ошибка" not in output
+    # Ни одна строка не изменена, в журнал ничего не записано
+    assert rows(manager, "select from t") == expected
+    database.close()
+    assert rows(database.open(), "select from t") == expected
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import os
+
+import pytest
+
+from src.primitive_db.binary import pack_bits, unpack_bits
+from src.primitive_db.storage import get_binary_path
+from conftest import fill, rows, run
+
+
+@pytest.mark.parametrize("count", [0, 1, 7, 8, 9, 1001])
+def test_pack_bits_round_trip(count):
+    flags = bytes(number * 7 % 3 == 0 for number in range(count))
+    assert bytes(unpack_bits(pack_bits(flags), count)) == flags
+
+
+def test_compressed_files_are_smaller(database):
+    manager = database.open()
+    fill(manager, 2000)
+    expected = rows(manager, "select from t")
+    sizes = {}
+    for storage_format in ["binary", "zlib", "lzma"]:
+        run(manager, f"set_format t {storage_format}")
+        path = get_binary_path(manager.table_file("t"), database.data_dir)
+        sizes[storage_format] = os.path.getsize(path)
+        assert rows(manager, "select from t") == expected
+    assert sizes["lzma"] < sizes["binary"] and sizes["zlib"] < sizes["binary"]
+
+
+@pytest.mark.parametrize("storage_format", ["binary", "zlib", "lzma"])
+def test_binary_errors_name_format(database, storage_format):
+    manager = database.open()
+    fill(manager, 5)
+    run(manager, f"set_format t {storage_format}")
+    assert f"в формате {storage_format}" in run(manager, "create_index t age")
+    assert f"в формате {storage_format}" in run(manager, "set_layout t columnar")
+
+    run(manager, "set_format t jsonl")
+    run(manager, "create_index t age")
+    assert f"в формате {storage_format}." in run(
+        manager, f"set_format t {storage_format}"
+    )
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+from src.primitive_db.locking import FileLock
+from conftest import fill, rows, run
+
+
+def test_reader_sees_only_published_version(database):
+    writer = database.open(flush_every=0, flush_interval=0)
+    fill(writer, 10)
+    writer.flush()
+    reader = database.open()
+    assert len(rows(reader, "select from t")) == 10
+
+    run(writer, "delete from t where ID > 5")
+    # Не опубликовано: читатель видит прежнюю версию и не ждет писателя
+    assert len(rows(reader, "select from t")) == 10
+    writer.flush()
+    assert len(rows(reader, "select from t")) == 5
+
+
+def test_write_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "db.lock")
+    first, second = FileLock(path), FileLock(path)
+    assert first.acquire(blocking=False)
+    assert not second.acquire(blocking=False)
+    first.release()
+    assert second.acquire(blocking=False)
+    first.close()
+    second.close()
+
+
+def test_writers_do_not_lose_updates(database):
+    first = database.open(flush_every=0, flush_interval=0)
+    second = database.open(flush_every=0, flush_interval=0)
+    fill(first, 5)
+    first.idle()
+
+    # Второй писатель перед изменением перечитывает последнюю версию
+    run(second, 'insert into t values ("second", 1, "", true)')
+    second.idle()
+    run(first, 'insert into t values ("first", 1, "", true)')
+    first.idle()
+    for manager in (first, second):
+        assert rows(manager, "select ID, name from t where ID > 5") == [
+            {"ID": 6, "name": "second"}, {"ID": 7, "name": "first"},
+        ]
+
+
+def test_next_writer_recovers_crashed_writer(database):
+    writer = database.open(flush_every=0, flush_interval=0)
+    fill(writer, 5)
+    reader = database.open()
+    database.crash(writer)
+    # Журнал упавшего писателя еще не опубликован
+    assert "не существует" in run(reader, "select from t")
+
+    run(reader, "delete from t where ID = 1")
+    assert rows(reader, "select count(*) from t") == [{"count(*)": 4}]
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+from conftest import fill, rows, run
+
+
+def _plan(output):
+    """Строки плана explain как словарь {пункт: значение}."""
+    return dict(line.split(": ", 1) for line in output.splitlines())
+
+
+def test_explain_shows_access_path(database):
+    manager = database.open()
+    fill(manager)
+    run(manager, "create_index t name using hash")
+    run(manager, "create_index t age using sorted")
+
+    plan = _plan(run(manager, "explain select from t where ID = 5"))
+    assert plan["Доступ"] == "первичный ключ ID (значений: 1)"
+    assert plan["Оценка кандидатов"] == "1"
+    assert plan["Кэш выборок"] == "промах"
+
+    plan = _plan(run(manager, 'explain select from t where name = "user3"'))
+    assert "индекс" in plan["Доступ"] and "name" in plan["Доступ"]
+
+    plan = _plan(run(manager, 'explain select from t where city = "Омск"'))
+    assert plan["Доступ"] == "полный просмотр"
+    assert plan["Оценка кандидатов"] == "300"
+
+    plan = _plan(run(manager, "explain select count(*) from t group by city"))
+    assert "группы: city" in plan["Агрегация"]
+
+
+def test_explain_does_not_execute(database):
+    manager = database.open()
+    fill(manager, 20)
+    plan = _plan(run(manager, "explain delete from t where age < 50"))
+    assert plan["Запрос"] == "delete"
+    assert "журнал упреждающей записи" in plan["Запись"]
+    assert len(rows(manager, "select from t")) == 20
+    assert "Используйте" in run(manager, "explain insert into t values (1)")
+
+
+def test_explain_shows_cache_hit_and_unloaded_table(database):
+    manager = database.open()
+    fill(manager, 20)
+    run(manager, "select from t where ID = 5")
+    plan = _plan(run(manager, "explain select from t where ID = 5"))
+    assert plan["Кэш выборок"].startswith("попадание")
+    manager.close()
+    database.managers.remove(manager)
+
+    manager = database.open()
+    plan = _plan(run(manager, "explain select from t"))
+    assert plan["Данные"].startswith("загрузка с диска")
+
+
+def test_profile_runs_command_and_reports_phases(database):
+    manager = database.open()
+    fill(manager, 50)
+    output = run(manager, "profile select from t where age < 30")
+    returned = len(rows(manager, "select from t where age < 30"))
+    assert f"Строк просмотрено: 50, возвращено: {returned}," in output
+    assert "Кэш выборок: промах" in output
+    for phase in ("parse", "filter", "format", "прочее"):
+        assert f"| {phase} " in output
+
+    output = run(manager, 'profile insert into t values ("x", 1, "Омск", true)')
+    assert "изменено: 1" in output and "| commit " in output
+    assert len(rows(manager, "select from t")) == 51
+    assert "Используйте" in run(manager, "profile list_tables")
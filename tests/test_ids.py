@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from src.primitive_db.parser import parse_where_condition
+from conftest import LAYOUTS, fill, rows, run
+
+
+def test_ids_are_not_reused(database):
+    manager = database.open()
+    fill(manager, 5)
+    run(manager, "delete from t where ID >= 4")
+    run(manager, 'insert into t values ("a", 1, "", true)')
+    assert rows(manager, 'select ID from t where name = "a"') == [{"ID": 6}]
+    database.close()
+
+    # Счетчик хранится в метаданных и переживает перезапуск
+    manager = database.open()
+    run(manager, 'insert into t values ("b", 1, "", true), ("c", 1, "", true)')
+    assert rows(manager, "select ID from t where age = 1") == [
+        {"ID": 6}, {"ID": 7}, {"ID": 8},
+    ]
+
+
+def test_id_lookup_skips_scan(database):
+    manager = database.open()
+    fill(manager, 50)
+    table = manager.get_table("t")
+    where = parse_where_condition("ID = 7 and age > 0")
+    assert table.access_path(where) == ("key", "ID", {7})
+    assert rows(manager, "select ID, age from t where ID = 7") == [
+        {"ID": 7, "age": 42},
+    ]
+    assert "удалено" in run(manager, "delete from t where ID = 7")
+    assert rows(manager, "select from t where ID = 7") == []
+
+
+@pytest.mark.parametrize("layout", list(LAYOUTS))
+def test_update_rejects_id(database, layout):
+    manager = database.open()
+    fill(manager, 10)
+    for command in LAYOUTS[layout]:
+        run(manager, command)
+    expected = rows(manager, "select from t")
+    assert "первичный ключ" in run(manager, "update t set ID = 1 where ID = 2")
+    assert "первичный ключ" in run(manager, "update t set ID = 5 where ID > 0")
+    assert rows(manager, "select from t") == expected
+    database.close()
+    assert rows(database.open(), "select from t") == expected
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+from src.primitive_db.parser import parse_where_condition
+from conftest import check_layout, fill, rows, run
+
+
+def test_hash_indexes_give_same_results(tmp_path, expected):
+    check_layout(tmp_path, "hash_indexed", expected)
+
+
+def test_hash_index_is_used_and_kept_up_to_date(database):
+    manager = database.open()
+    fill(manager, 50)
+    run(manager, "create_index t name using hash")
+    table = manager.get_table("t")
+    where = parse_where_condition('name = "user5" and age > 10')
+    assert table.access_path(where)[:2] == ("index", "name")
+
+    run(manager, 'update t set name = "moved" where name = "user5"')
+    run(manager, 'delete from t where name = "user6"')
+    assert rows(manager, 'select ID from t where name = "user5"') == []
+    assert rows(manager, 'select ID from t where name = "user6"') == []
+    assert rows(manager, 'select ID from t where name = "moved"') == [
+        {"ID": 6}, {"ID": 43},
+    ]
+
+
+def test_hash_index_survives_restart(database):
+    manager = database.open()
+    fill(manager, 10)
+    run(manager, "create_index t city using hash")
+    database.close()
+
+    manager = database.open()
+    assert list(manager.get_table("t").indexes) == ["city"]
+    assert "удален" in run(manager, "drop_index t city")
+    database.close()
+    assert database.open().get_table("t").indexes == {}
+
+
+def test_sorted_indexes_give_same_results(tmp_path, expected):
+    check_layout(tmp_path, "sorted_indexed", expected)
+
+
+def test_sorted_index_serves_ranges_and_order(database):
+    manager = database.open()
+    fill(manager, 100)
+    run(manager, "create_index t age using sorted")
+    table = manager.get_table("t")
+    kind, column, _ = table.access_path(parse_where_condition("age > 80 and ID > 3"))
+    assert (kind, column) == ("range", "age")
+
+    where = parse_where_condition("age >= 85")
+    ordered = table.ordered_candidates(where, "age", descending=True)
+    assert [record["age"] for record in ordered] == sorted(
+        (record["age"] for record in table if record["age"] >= 85), reverse=True
+    )
+    assert table.ordered_candidates(None, "name") is None
+
+    run(manager, "update t set age = 100 where ID = 1")
+    assert rows(manager, "select age from t order by age desc limit 2") == [
+        {"age": 100}, {"age": 89},
+    ]
+
+
+def test_sorted_index_rejects_bool(database):
+    manager = database.open()
+    fill(manager, 5)
+    assert "Ошибка" in run(manager, "create_index t active using sorted")
+    assert manager.get_table("t").indexes == {}
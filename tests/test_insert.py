@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import json
+
+import pytest
+
+from src.primitive_db.loader import iter_batches
+from src.primitive_db.parser import parse_values_list
+from conftest import fill, rows, run
+
+
+def test_parse_values_list():
+    assert parse_values_list('("lock", 28, true), ("a, b", -3, false)') == [
+        ["lock", 28, True], ["a, b", -3, False],
+    ]
+    for text in ['("a", 1', '("a") ("b")', '("a"),']:
+        with pytest.raises(ValueError):
+            parse_values_list(text)
+
+
+def test_multi_row_insert_gets_consecutive_ids(database):
+    manager = database.open()
+    fill(manager, 3)
+    output = run(
+        manager, 'insert into t values ("a", 1, "", true), ("b", 2, "x y", false)'
+    )
+    assert "Ошибка" not in output
+    assert rows(manager, "select ID, name, city from t where ID > 3") == [
+        {"ID": 4, "name": "a", "city": ""},
+        {"ID": 5, "name": "b", "city": "x y"},
+    ]
+
+
+def test_bad_row_rejects_whole_insert(database):
+    manager = database.open()
+    fill(manager, 3)
+    output = run(manager, 'insert into t values ("a", 1, "", true), ("b", "x", "", 1)')
+    assert "Ошибка" in output
+    assert rows(manager, "select count(*) from t") == [{"count(*)": 3}]
+    run(manager, 'insert into t values ("c", 1, "", true)')
+    assert rows(manager, 'select ID from t where name = "c"') == [{"ID": 4}]
+
+
+def test_load_csv_and_jsonl(database, tmp_path):
+    csv_file = tmp_path / "users.csv"
+    csv_file.write_text(
+        'active,name,city,age\ntrue,"Doe, J",Омск,40\nнет,b,,2\n', encoding="utf-8"
+    )
+    jsonl_file = tmp_path / "users.jsonl"
+    jsonl_file.write_text(
+        json.dumps({"name": "c", "age": 3, "city": "x", "active": True}) + "\n"
+        + json.dumps(["d", 4, "y", False]) + "\n",
+        encoding="utf-8",
+    )
+
+    manager = database.open()
+    run(manager, "create_table t name:str age:int city:str active:bool")
+    assert "Загружено записей" in run(manager, f"load t from {csv_file}")
+    run(manager, f"load t from {jsonl_file}")
+    assert rows(manager, "select from t") == [
+        {"ID": 1, "name": "Doe, J", "age": 40, "city": "Омск", "active": True},
+        {"ID": 2, "name": "b", "age": 2, "city": "", "active": False},
+        {"ID": 3, "name": "c", "age": 3, "city": "x", "active": True},
+        {"ID": 4, "name": "d", "age": 4, "city": "y", "active": False},
+    ]
+
+
+def test_load_reports_bad_line(database, tmp_path):
+    csv_file = tmp_path / "bad.csv"
+    csv_file.write_text("a,1,x,true\nb,two,y,false\n", encoding="utf-8")
+    manager = database.open()
+    run(manager, "create_table t name:str age:int city:str active:bool")
+    assert "Строка 2" in run(manager, f"load t from {csv_file}")
+
+
+def test_iter_batches():
+    assert [len(batch) for batch in iter_batches(range(7), 3)] == [3, 3, 1]
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from conftest import LAYOUTS, fill, rows, run
+
+
+@pytest.fixture
+def manager(database):
+    manager = database.open()
+    run(manager, "create_table users name:str age:int")
+    run(manager, "create_table orders user_id:int amount:int")
+    run(manager, 'insert into users values ("ann", 30), ("bob", 25), ("cat", 41)')
+    run(manager, "insert into orders values (1, 10), (1, 30), (3, 50), (9, 5)")
+    return manager
+
+
+JOIN = "from users u join orders o on u.ID = o.user_id"
+
+
+def test_join_on_key(manager):
+    assert rows(manager, f"select u.name, o.amount {JOIN} order by o.amount") == [
+        {"u.name": "ann", "o.amount": 10},
+        {"u.name": "ann", "o.amount": 30},
+        {"u.name": "cat", "o.amount": 50},
+    ]
+    query = f"select u.name, o.amount {JOIN} where o.amount > 20 and u.age < 40"
+    assert rows(manager, query) == [{"u.name": "ann", "o.amount": 30}]
+
+
+def test_join_without_aliases(manager):
+    query = (
+        "select name, amount from users join orders "
+        "on users.ID = orders.user_id where amount < 20"
+    )
+    assert rows(manager, query) == [{"name": "ann", "amount": 10}]
+
+
+def test_join_with_aggregates(manager):
+    query = f"select u.name, count(*), sum(o.amount) {JOIN} group by u.name"
+    assert rows(manager, f"{query} order by u.name") == [
+        {"u.name": "ann", "count(*)": 2, "sum(o.amount)": 40},
+        {"u.name": "cat", "count(*)": 1, "sum(o.amount)": 50},
+    ]
+
+
+def test_join_errors(manager):
+    assert "не существует" in run(manager, f"select u.nope {JOIN}")
+    output = run(manager, "select from users u join nope o on u.ID = o.user_id")
+    assert 'Таблица "nope" не существует' in output
+
+
+def test_explain_shows_join_strategy(manager):
+    output = run(manager, f"explain select u.name {JOIN} where o.amount > 20")
+    assert "поиск пар по ключу" in output
+    assert "Условие до соединения (o): amount > 20" in output
+    output = run(
+        manager, "explain select from users u join orders o on u.age = o.amount"
+    )
+    assert "хэш-соединение" in output
+
+
+@pytest.mark.parametrize("layout", ["rows", "hash_indexed", "columnar", "binary"])
+def test_join_matches_nested_loop(database, layout):
+    manager = database.open()
+    fill(manager)
+    for command in LAYOUTS[layout]:
+        run(manager, command)
+    run(manager, "create_table cities name:str size:int")
+    run(manager, 'insert into cities values ("Москва", 3), ("Омск", 1), ("", 0)')
+
+    people = rows(manager, "select from t where age < 50")
+    cities = rows(manager, "select from cities")
+    expected = sorted(
+        (person["ID"], city["size"])
+        for person in people for city in cities
+        if person["city"] == city["name"]
+    )
+    assert expected
+    joined = rows(
+        manager,
+        "select t.ID, c.size from t join cities c on t.city = c.name "
+        "where t.age < 50",
+    )
+    assert sorted((row["t.ID"], row["c.size"]) for row in joined) == expected
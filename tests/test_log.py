@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+import json
+import os
+
+from src.primitive_db.storage import (
+    append_log, delete_entry, get_legacy_path, get_log_path, get_log_size,
+    insert_entry, migrate_legacy_table, replay_log, update_entry, write_log,
+)
+from conftest import fill, rows, run
+
+
+def _records(count):
+    return [
+        {"ID": number, "name": f"user{number % 7}", "age": number}
+        for number in range(1, count + 1)
+    ]
+
+
+def test_log_round_trip(tmp_path):
+    records = _records(50)
+    write_log("t", records, str(tmp_path))
+    assert replay_log("t", str(tmp_path)) == records
+
+
+def test_changes_are_appended(tmp_path):
+    data_dir = str(tmp_path)
+    write_log("t", _records(3), data_dir)
+    size = get_log_size("t", data_dir)
+
+    append_log("t", [
+        insert_entry({"ID": 4, "name": "new", "age": 4}),
+        update_entry([1, 4], {"age": 40}),
+        delete_entry([2]),
+    ], data_dir)
+    # Снимок не переписывается: изменения дописаны после него
+    with open(get_log_path("t", data_dir), "rb") as file:
+        file.seek(size)
+        assert len(file.read().splitlines()) == 3
+
+    assert replay_log("t", data_dir) == [
+        {"ID": 1, "name": "user1", "age": 40},
+        {"ID": 3, "name": "user3", "age": 3},
+        {"ID": 4, "name": "new", "age": 40},
+    ]
+    # Читатель с опубликованным размером видит только снимок
+    assert replay_log("t", data_dir, limit=size) == _records(3)
+
+
+def test_torn_line_is_skipped(tmp_path):
+    data_dir = str(tmp_path)
+    write_log("t", _records(2), data_dir)
+    with open(get_log_path("t", data_dir), "a", encoding="utf-8") as file:
+        file.write('{"op": "delete", "ids": [1')
+    append_log("t", [delete_entry([2])], data_dir)
+    assert replay_log("t", data_dir) == _records(1)
+
+
+def test_legacy_table_is_migrated(tmp_path):
+    data_dir = str(tmp_path)
+    with open(get_legacy_path("t", data_dir), "w", encoding="utf-8") as file:
+        json.dump(_records(3), file)
+    migrate_legacy_table("t", data_dir)
+    assert not os.path.exists(get_legacy_path("t", data_dir))
+    assert replay_log("t", data_dir) == _records(3)
+
+
+def test_changes_survive_restart(database):
+    manager = database.open()
+    fill(manager, 100)
+    run(manager, 'update t set name = "x" where age < 30')
+    run(manager, "delete from t where ID > 90")
+    expected = rows(manager, "select from t")
+    database.close()
+
+    assert rows(database.open(), "select from t") == expected
+    assert len(expected) == 90
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+import json
+
+import pytest
+
+from src.primitive_db.metrics import Histogram, MetricsRegistry, metrics
+from conftest import fill, run
+
+
+@pytest.fixture
+def registry():
+    """Общий реестр процесса: включен и пуст на время теста."""
+    enabled = metrics.enabled
+    metrics.enabled = True
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+    metrics.enabled = enabled
+
+
+def test_counters_sum_by_labels():
+    registry = MetricsRegistry(enabled=True)
+    registry.inc("rows", 3, table="a")
+    registry.inc("rows", 2, table="b")
+    registry.inc("rows", table="a")
+    assert registry.total("rows") == 6
+    assert registry.total("rows", table="a") == 4
+    assert registry.counters() == [
+        ("rows", {"table": "a"}, 4), ("rows", {"table": "b"}, 2),
+    ]
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    registry.inc("rows")
+    with registry.timer("seconds"):
+        pass
+    assert registry.counters() == [] and registry.histograms() == []
+
+
+def test_histogram_quantile_is_bucket_bound():
+    histogram = Histogram(bounds=(0.001, 0.01, 0.1))
+    for value in (0.0005, 0.0005, 0.005, 0.05):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 0.001
+    assert histogram.quantile(0.99) == 0.1
+    histogram.observe(1)
+    assert histogram.quantile(1) == float("inf")
+
+
+def test_capture_works_when_collection_is_off():
+    registry = MetricsRegistry(enabled=False)
+    with registry.capture() as capture:
+        registry.inc("rows", 5)
+    assert capture.total("rows") == 5
+    assert registry.counters() == [] and not registry.enabled
+
+
+def test_commands_are_counted(database, registry):
+    manager = database.open()
+    fill(manager, 50)
+    run(manager, "select from t where age < 30")
+    run(manager, "nonsense")
+
+    assert registry.total("commands_total", command="select") == 1
+    assert registry.total("commands_total", command="unknown") == 1
+    assert registry.total("rows_scanned_total", table="t") > 0
+    assert registry.total("rows_returned_total", table="t") > 0
+    output = run(manager, "stats")
+    assert "command_seconds" in output and "select_cache_hits" in output
+
+
+def test_stats_export(database, registry, tmp_path):
+    manager = database.open()
+    fill(manager, 10)
+    json_path = tmp_path / "metrics.json"
+    prometheus_path = tmp_path / "metrics.prom"
+    run(manager, f"stats json {json_path}")
+    run(manager, f"stats prometheus {prometheus_path}")
+
+    snapshot = json.loads(json_path.read_text(encoding="utf-8"))
+    assert {"name": "commands_total", "labels": {"command": "insert"},
+            "value": 1} in snapshot["counters"]
+    assert "wal_commits" in snapshot["gauges"]
+    text = prometheus_path.read_text(encoding="utf-8")
+    assert "# TYPE primitive_db_commands_total counter" in text
+    assert 'command_seconds_bucket{command="insert",le="+Inf"} 1' in text
+
+
+def test_stats_switches(database, registry):
+    manager = database.open()
+    assert "выключен" in run(manager, "stats off")
+    run(manager, "list_tables")
+    assert registry.counters() == []
+    assert "включен" in run(manager, "stats on")
+    run(manager, "list_tables")
+    assert registry.total("commands_total") == 1
+    # Сама команда stats reset учитывается уже после обнуления
+    assert "сброшены" in run(manager, "stats reset")
+    assert registry.counters() == [("commands_total", {"command": "stats"}, 1)]
+    assert "Используйте" in run(manager, "stats bogus")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+import csv
+import io
+
+import pytest
+
+from conftest import fill, rows, run
+
+
+def test_projection_keeps_requested_order(database):
+    manager = database.open()
+    fill(manager, 5)
+    result = rows(manager, "select age, name from t where ID = 2")
+    assert result == [{"age": 7, "name": "user1"}]
+    assert list(result[0]) == ["age", "name"]
+    assert "не существует" in run(manager, "select nope from t")
+
+
+def test_limit_and_offset(database):
+    manager = database.open()
+    fill(manager, 30)
+    ids = [row["ID"] for row in rows(manager, "select ID from t limit 4 offset 3")]
+    assert ids == [4, 5, 6, 7]
+    ordered = rows(manager, "select ID from t order by ID desc limit 2 offset 1")
+    assert [row["ID"] for row in ordered] == [29, 28]
+    assert rows(manager, "select from t limit 5 offset 100") == []
+    assert "Нет данных" in run(manager, "select from t limit 0")
+
+
+@pytest.mark.parametrize("clause", ["limit -1", "limit x", "limit 1 offset -2"])
+def test_bad_limit_is_rejected(database, clause):
+    manager = database.open()
+    fill(manager, 5)
+    assert "Ошибка" in run(manager, f"select from t {clause}")
+
+
+def test_csv_output_quotes_values(database):
+    manager = database.open()
+    run(manager, "create_table t name:str note:str")
+    run(manager, 'insert into t values ("a,b", "x y"), ("c", "")')
+    output = run(manager, "select from t format csv")
+    assert list(csv.reader(io.StringIO(output))) == [
+        ["ID", "name", "note"], ["1", "a,b", "x y"], ["2", "c", ""],
+    ]
+    assert run(manager, "select name from t where ID = 5 format csv") == "name\n"
+
+
+def test_jsonl_output_keeps_types(database):
+    manager = database.open()
+    fill(manager, 3)
+    assert rows(manager, "select name, age, active from t where ID = 1") == [
+        {"name": "user0", "age": 0, "active": False},
+    ]
+    assert "Неизвестный формат" in run(manager, "select from t format xml")
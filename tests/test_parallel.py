@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from src.primitive_db import parallel
+from src.primitive_db.binary import load_binary_table, write_binary
+from src.primitive_db.core import aggregate, iter_select, select
+from src.primitive_db.parser import Aggregate, parse_where_condition
+from conftest import COLUMN_TYPES, check_layout, fill, run
+
+CONDITIONS = [
+    None,
+    'name = "user5" or age > 80',
+    "active = false and ID > 100",
+    "ID < 0",
+]
+
+
+def _table(tmp_path, compression):
+    records = [
+        {"ID": number, "name": f"user{number % 9}", "age": number % 97,
+         "active": number % 4 != 0}
+        for number in range(1, 501)
+    ]
+    write_binary(
+        "t", records, COLUMN_TYPES, str(tmp_path), segment_rows=64,
+        compression=compression,
+    )
+    table = load_binary_table("t", "t", COLUMN_TYPES, str(tmp_path))
+    # Измененный сегмент и добавленные строки просматривает основной процесс
+    table.update_record(table._row(70), {"name": "user5"})
+    table.append({"ID": 501, "name": "user5", "age": 1, "active": False})
+    return table
+
+
+def _results(table):
+    results = []
+    for condition in CONDITIONS:
+        where = parse_where_condition(condition) if condition else None
+        matched = select(table, where)
+        results.append(matched)
+        results.append(list(iter_select(table, where, limit=3, columns={"age"})))
+        results.append(aggregate(
+            table,
+            ["active", Aggregate("count", "*"), Aggregate("sum", "age"),
+             Aggregate("max", "name")],
+            where, ["active"],
+        ))
+        count = aggregate(table, [Aggregate("count", "*")], where)
+        assert count == [{"count(*)": len(matched)}]
+        results.append(count)
+    return results
+
+
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_parallel_scan_matches_local_scan(tmp_path, scan_pool, compression):
+    table = _table(tmp_path, compression)
+    assert table.parallel_segments(None) is not None
+    scanned = _results(table)
+    assert all(result is not None for result in scanned)
+
+    parallel.configure(0)
+    assert table.parallel_segments(None) is None
+    assert _results(table) == scanned
+
+
+def test_parallel_commands_match_local_scan(tmp_path, scan_pool, expected):
+    check_layout(tmp_path, "binary", expected)
+
+
+def test_explain_shows_parallel_scan(database, scan_pool):
+    manager = database.open()
+    fill(manager)
+    run(manager, "set_format t binary")
+    output = run(manager, "explain select from t where age > 10")
+    assert "Параллельный просмотр: процессов: 2" in output
+    output = run(manager, "explain select from t where ID = 5")
+    assert "Параллельный просмотр: нет" in output
+
+    parallel.configure(0)
+    output = run(manager, "explain select from t where age > 10")
+    assert "Параллельный просмотр: выключен" in output
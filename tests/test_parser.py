@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from src.primitive_db.parser import parse_set_clause, parse_where_condition
+from conftest import fill, rows, run
+
+RECORDS = [
+    {"ID": 1, "name": "ann", "age": 30, "active": True},
+    {"ID": 2, "name": "bob", "age": 17, "active": False},
+    {"ID": 3, "name": "a b", "age": None, "active": True},
+    {"ID": 4, "name": "Sergei", "age": 45},
+]
+
+
+@pytest.mark.parametrize("condition, ids", [
+    ("age >= 18", [1, 4]),
+    ("age < 18 or name = 'a b'", [2, 3]),
+    ("not (age > 20) and active = true", [3]),
+    ('age >= 18 and (name = "Sergei" or ID in (1, 2))', [1, 4]),
+    ("name != 'ann'", [2, 3, 4]),
+    ("name > 'b'", [2]),
+    ("active = false or active = true and age > 40", [2]),
+    ("ID in (4, 9) or not ID < 3", [3, 4]),
+    ("missing = 1", []),
+    ("age = 'x'", []),
+])
+def test_where_condition(condition, ids):
+    where = parse_where_condition(condition)
+    assert [record["ID"] for record in RECORDS if where.predicate(record)] == ids
+
+
+def test_where_parse_is_cached():
+    assert parse_where_condition("age > 1") is parse_where_condition("age > 1")
+    assert parse_where_condition("  ") is None
+
+
+@pytest.mark.parametrize("condition", [
+    "age >", "age = 1 and", "(age = 1", "age in 1", "age ~ 1", "age = ?",
+])
+def test_where_condition_errors(condition):
+    with pytest.raises(ValueError):
+        parse_where_condition(condition)
+
+
+def test_set_clause():
+    assert parse_set_clause('name = "a, b", age = 3, active = false') == {
+        "name": "a, b", "age": 3, "active": False,
+    }
+    for text in ["", "name", "name = ", "name = 1,", "name = 1 age = 2"]:
+        with pytest.raises(ValueError):
+            parse_set_clause(text)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ('"Dan Jr"', "Dan Jr"),
+    ('"x,y"', "x,y"),
+    ("'where = 1'", "where = 1"),
+    ('"set"', "set"),
+])
+def test_update_keeps_quoted_set_values(database, value, expected):
+    manager = database.open()
+    fill(manager, 3)
+    assert "обновлено: 1" in run(manager, f"update t set name = {value} where ID = 1")
+    assert rows(manager, "select name from t where ID = 1") == [{"name": expected}]
+
+
+def test_update_quoted_number_stays_str(database):
+    manager = database.open()
+    fill(manager, 3)
+    output = run(manager, 'update t set name = "42", city = "a b" where ID = 2')
+    assert "Ошибка" not in output
+    assert rows(manager, "select name, city from t where ID = 2") == [
+        {"name": "42", "city": "a b"}
+    ]
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import io
+
+from src.primitive_db.decorators import set_auto_confirm
+from src.primitive_db.engine import run_script
+from src.primitive_db.main import main
+from src.primitive_db.metrics import metrics
+from conftest import Database, rows
+
+SCRIPT = """
+# таблица пользователей
+create_table t name:str age:int
+-- две записи
+insert into t values ("a", 1), ("b", 2)
+delete from t where ID = 1
+exit
+insert into t values ("after exit", 3)
+"""
+
+
+def test_script_runs_commands_until_exit(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    run_script(io.StringIO(SCRIPT), durability="off")
+    output = capsys.readouterr().out
+    assert "Выполнено команд: 4" in output
+    assert "команд/с" in output
+
+    database = Database(tmp_path)
+    assert rows(database.open(), "select from t") == [{"ID": 2, "name": "b", "age": 2}]
+    database.close()
+
+
+def test_script_option_with_yes(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(metrics, "enabled", metrics.enabled)
+    set_auto_confirm(False)
+    script = tmp_path / "script.sql"
+    script.write_text(
+        'create_table t name:str\ninsert into t values ("a")\ndrop_table t\n',
+        encoding="utf-8",
+    )
+    main(["--script", str(script), "--yes", "--durability", "off"])
+    assert "Выполнено команд: 3" in capsys.readouterr().out
+
+    # --yes подтверждает удаление без вопроса
+    database = Database(tmp_path)
+    assert "t" not in database.open().metadata
+    database.close()
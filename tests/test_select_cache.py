@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+from src.primitive_db.decorators import create_cacher
+from conftest import fill, rows, run
+
+
+def test_cache_is_bounded_by_entries_and_rows():
+    cache = create_cacher(max_entries=2, max_rows=10)
+    for key in "abc":
+        cache("t", key, lambda: [1])
+    assert not cache.contains("t", "a")
+    assert cache.contains("t", "b") and cache.contains("t", "c")
+
+    # Слишком большой результат не кэшируется и ничего не вытесняет
+    cache("t", "big", lambda: list(range(20)))
+    assert not cache.contains("t", "big")
+    assert cache.stats()["entries"] == 2
+
+    cache("t", "d", lambda: list(range(8)))
+    stats = cache.stats()
+    assert stats["rows"] <= 10 and stats["evictions"] == 3
+
+
+def test_lru_order_and_hits():
+    cache = create_cacher(max_entries=2)
+    calls = []
+    cache("t", "a", lambda: calls.append("a") or [1])
+    cache("t", "b", lambda: [2])
+    assert cache("t", "a", lambda: calls.append("a") or [1]) == [1]
+    cache("t", "c", lambda: [3])
+    assert calls == ["a"]
+    assert cache.contains("t", "a") and not cache.contains("t", "b")
+    assert cache.stats()["hits"] == 1
+
+
+def test_invalidate_drops_only_one_table():
+    cache = create_cacher()
+    cache("t", "a", lambda: [1])
+    cache("u", "a", lambda: [2])
+    cache.invalidate("t")
+    assert not cache.contains("t", "a")
+    assert cache.contains("u", "a")
+    assert cache("t", "a", lambda: [3]) == [3]
+
+
+def test_changes_invalidate_cached_selects(database):
+    manager = database.open()
+    fill(manager, 10)
+    query = 'select ID from t where name = "user1"'
+    assert rows(manager, query) == [{"ID": 2}]
+    hits = manager.select_cache.stats()["hits"]
+    assert rows(manager, query) == [{"ID": 2}]
+    assert manager.select_cache.stats()["hits"] == hits + 1
+
+    run(manager, 'update t set name = "user1" where ID = 3')
+    assert rows(manager, query) == [{"ID": 2}, {"ID": 3}]
+    run(manager, "delete from t where ID = 2")
+    assert rows(manager, query) == [{"ID": 3}]
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import threading
+import time
+
+from src.primitive_db.constants import LOCK_FILE
+from src.primitive_db.locking import FileLock
+from src.primitive_db.server import Server
+
+
+async def _start(database):
+    manager = database.open()
+    database.managers.remove(manager)
+    server = Server(manager)
+    tcp_server = await asyncio.start_server(server.handle_client, "127.0.0.1", 0)
+    port = tcp_server.sockets[0].getsockname()[1]
+    return server, tcp_server, port
+
+
+async def _connect(port):
+    return await asyncio.open_connection("127.0.0.1", port)
+
+
+async def _send(writer, *commands):
+    writer.write("".join(f"{command}\n" for command in commands).encode("utf-8"))
+    await writer.drain()
+
+
+async def _receive(reader):
+    size = int(await reader.readline())
+    return (await reader.readexactly(size)).decode("utf-8")
+
+
+async def _stop(server, tcp_server, *writers):
+    for writer in writers:
+        writer.close()
+    tcp_server.close()
+    await tcp_server.wait_closed()
+    server.close()
+
+
+def test_pipelined_commands_answer_in_order(database):
+    async def main():
+        server, tcp_server, port = await _start(database)
+        reader, writer = await _connect(port)
+        await _send(
+            writer,
+            "create_table t name:str",
+            'insert into t values ("a"), ("b")',
+            "select name from t format jsonl",
+            "exit",
+        )
+        outputs = [await _receive(reader) for _ in range(4)]
+        await _stop(server, tcp_server, writer)
+        return outputs
+
+    outputs = asyncio.run(main())
+    assert "создана" in outputs[0]
+    assert "2" in outputs[1]
+    assert outputs[2].splitlines() == ['{"name": "a"}', '{"name": "b"}']
+
+
+def test_waiting_for_write_lock_keeps_loop_running(database):
+    async def main():
+        server, tcp_server, port = await _start(database)
+        reader, writer = await _connect(port)
+        await _send(writer, "create_table t name:str")
+        await _receive(reader)
+        server.manager.idle()
+
+        # Блокировку держит писатель другого процесса; страховка от
+        # зависания теста, если цикл событий все же остановится
+        lock = FileLock(os.path.join(database.data_dir, LOCK_FILE))
+        assert lock.acquire(blocking=False)
+        timer = threading.Timer(2.0, lock.release)
+        timer.start()
+
+        await _send(writer, 'insert into t values ("a")')
+        started = time.monotonic()
+        await asyncio.sleep(0.1)
+        stalled = time.monotonic() - started
+        other_reader, other_writer = await asyncio.wait_for(_connect(port), 1)
+
+        timer.cancel()
+        lock.release()
+        inserted = await asyncio.wait_for(_receive(reader), 5)
+        await _send(other_writer, "select name from t format jsonl")
+        selected = await asyncio.wait_for(_receive(other_reader), 5)
+        lock.close()
+        await _stop(server, tcp_server, writer, other_writer)
+        return stalled, inserted, selected
+
+    stalled, inserted, selected = asyncio.run(main())
+    assert stalled < 1
+    assert "Ошибка" not in inserted
+    assert selected.splitlines() == ['{"name": "a"}']
+
+
+def test_disconnect_rolls_back_open_transaction(database):
+    async def main():
+        server, tcp_server, port = await _start(database)
+        reader, writer = await _connect(port)
+        await _send(writer, "create_table t name:str", "begin")
+        await _receive(reader)
+        await _receive(reader)
+        await _send(writer, 'insert into t values ("lost")')
+        await _receive(reader)
+
+        # Пока транзакция открыта, другой клиент ждет
+        other_reader, other_writer = await _connect(port)
+        await _send(other_writer, "select from t format jsonl")
+        waiting = asyncio.ensure_future(_receive(other_reader))
+        await asyncio.sleep(0.1)
+        assert not waiting.done()
+
+        writer.close()
+        selected = await asyncio.wait_for(waiting, 5)
+        await _stop(server, tcp_server, other_writer)
+        return selected
+
+    assert asyncio.run(main()) == ""
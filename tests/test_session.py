@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+from src.primitive_db.storage import get_log_size
+from conftest import fill, rows, run
+
+
+def _log_size(manager):
+    return get_log_size(manager.table_file("t"), manager.data_dir)
+
+
+def test_table_is_loaded_once(database):
+    manager = database.open()
+    fill(manager, 10)
+    table = manager.get_table("t")
+    run(manager, "select from t")
+    run(manager, 'update t set name = "x" where ID = 1')
+    assert manager.get_table("t") is table
+
+
+def test_changes_are_deferred_until_flush(database):
+    manager = database.open(flush_every=0, flush_interval=0)
+    fill(manager, 10)
+    run(manager, "delete from t where ID > 5")
+    assert manager.dirty_tables() == ["t"]
+    assert _log_size(manager) == 0
+
+    run(manager, "flush")
+    assert not manager.is_dirty()
+    assert _log_size(manager) > 0
+    assert len(rows(database.open(), "select from t")) == 5
+
+
+def test_flush_after_every_n_operations(database):
+    manager = database.open(flush_every=3, flush_interval=0)
+    fill(manager, 10)
+    assert manager.is_dirty()
+    run(manager, "delete from t where ID = 1")
+    assert not manager.is_dirty()
+    size = _log_size(manager)
+
+    # Следующая контрольная точка - снова через три команды
+    run(manager, "delete from t where ID = 2")
+    run(manager, "select from t")
+    assert manager.is_dirty()
+    assert _log_size(manager) == size
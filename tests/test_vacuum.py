@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from conftest import fill, rows, run
+
+
+@pytest.mark.parametrize("storage_format", ["jsonl", "binary", "zlib", "lzma"])
+def test_vacuum_removes_dead_rows(database, storage_format):
+    manager = database.open()
+    fill(manager, 200)
+    run(manager, f"set_format t {storage_format}")
+    run(manager, 'update t set city = "x" where ID <= 100')
+    run(manager, "delete from t where ID > 150")
+    expected = rows(manager, "select from t")
+    # Мертвые строки считаются при переносе изменений в файлы
+    run(manager, "flush")
+    assert "Мертвых строк в файлах: 150" in run(manager, "info t")
+
+    output = run(manager, "vacuum t")
+    assert "мертвых строк убрано: 150" in output
+    assert "Мертвых строк в файлах: 0" in run(manager, "info t")
+    assert rows(manager, "select from t") == expected
+    database.close()
+    assert rows(database.open(), "select from t") == expected
+
+
+def test_background_vacuum_keeps_concurrent_changes(database, monkeypatch):
+    monkeypatch.setattr("src.primitive_db.manager.VACUUM_MIN_DEAD_ROWS", 10)
+    manager = database.open(auto_vacuum=True, flush_every=1)
+    fill(manager, 100)
+    run(manager, "delete from t where ID > 20")
+    assert manager.vacuum_running
+    # Изменения во время сжатия дописываются в новое поколение
+    run(manager, "delete from t where ID = 1")
+    run(manager, 'insert into t values ("late", 1, "Томск", true)')
+    manager.finish_vacuum(wait=True)
+    expected = rows(manager, "select from t")
+    assert len(expected) == 20
+    assert manager.table_file("t") != "t"
+    database.close()
+    assert rows(database.open(), "select from t") == expected
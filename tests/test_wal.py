@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import os
+
+import pytest
+
+from src.primitive_db.wal import WriteAheadLog, parse_durability
+from conftest import fill, rows, run
+
+
+def _crash_after(database, commands, **options):
+    """Выполняет команды без контрольной точки, роняет менеджер и открывает новый."""
+    manager = database.open(flush_every=0, flush_interval=0, **options)
+    for command in commands:
+        run(manager, command)
+    database.crash(manager)
+    return database.open()
+
+
+def test_committed_changes_survive_crash(database):
+    manager = database.open()
+    fill(manager, 20)
+    database.close()
+
+    manager = _crash_after(database, [
+        'update t set name = "changed" where ID = 1',
+        "delete from t where ID = 2",
+        'insert into t values ("after", 1, "Томск", true)',
+    ])
+    assert rows(manager, "select name from t where ID = 1") == [{"name": "changed"}]
+    assert rows(manager, "select from t where ID = 2") == []
+    assert rows(manager, 'select ID from t where name = "after"') == [{"ID": 21}]
+    assert rows(manager, "select count(*) from t") == [{"count(*)": 20}]
+
+
+def test_open_transaction_is_lost_in_crash(database):
+    manager = database.open()
+    fill(manager, 5)
+    database.close()
+
+    manager = _crash_after(database, [
+        "begin",
+        "delete from t where ID > 1",
+    ])
+    assert rows(manager, "select count(*) from t") == [{"count(*)": 5}]
+
+
+def test_rollback_restores_tables_and_schema(database):
+    manager = database.open()
+    fill(manager, 5)
+    run(manager, "begin")
+    run(manager, "delete from t where ID > 1")
+    run(manager, "create_table other x:int")
+    run(manager, "rollback")
+    assert rows(manager, "select count(*) from t") == [{"count(*)": 5}]
+    assert "не существует" in run(manager, "select from other")
+
+
+def test_schema_changes_replayed_after_crash(database):
+    manager = _crash_after(database, [
+        "create_table u name:str",
+        'insert into u values ("x")',
+    ])
+    assert rows(manager, "select from u") == [{"ID": 1, "name": "x"}]
+
+
+def test_torn_last_transaction_is_skipped(tmp_path):
+    path = str(tmp_path / "wal.log")
+    wal = WriteAheadLog(path, "always")
+    wal.append({"changes": [], "metadata": None, "n": 1})
+    wal.close()
+    with open(path, "a", encoding="utf-8") as file:
+        file.write('{"changes": [["t", {"op": "ins')
+
+    wal = WriteAheadLog(path, "always")
+    assert wal.read() == [{"changes": [], "metadata": None, "n": 1}]
+    # Следующий коммит не склеивается с недописанной строкой
+    wal.append({"n": 2})
+    assert [record.get("n") for record in wal.read()] == [1, 2]
+    wal.close()
+
+
+@pytest.mark.parametrize("policy, interval", [
+    ("always", 0), ("off", None), ("20ms", 0.02), (" 5MS ", 0.005),
+])
+def test_parse_durability(policy, interval):
+    assert parse_durability(policy) == interval
+
+
+@pytest.mark.parametrize("policy", ["never", "0ms", "ms", "-5ms"])
+def test_parse_durability_rejects(policy):
+    with pytest.raises(ValueError):
+        parse_durability(policy)
+
+
+def test_group_commit_merges_fsyncs(tmp_path):
+    always = WriteAheadLog(str(tmp_path / "always.log"), "always")
+    grouped = WriteAheadLog(str(tmp_path / "grouped.log"), "10000ms")
+    for number in range(50):
+        always.append({"n": number})
+        grouped.append({"n": number})
+    assert always.fsyncs == 50
+    assert grouped.fsyncs <= 1
+
+    # Хвост группы сбрасывается при закрытии
+    grouped.close()
+    assert grouped.fsyncs >= 1
+    assert len(grouped.read()) == 50
+    always.close()
+
+
+def test_checkpoint_truncates_log(database):
+    manager = database.open()
+    fill(manager, 5)
+    manager.flush()
+    assert os.path.getsize(manager.wal.path) == 0
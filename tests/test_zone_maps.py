@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+import functools
+
+from src.primitive_db.binary import load_binary_table, write_binary
+from src.primitive_db.parser import parse_where_condition
+from conftest import COLUMN_TYPES, fill, rows, run, sample_records
+
+
+def test_zone_maps_skip_segments(tmp_path):
+    write_binary(
+        "t", sample_records(1000), COLUMN_TYPES, str(tmp_path), segment_rows=100
+    )
+    table = load_binary_table("t", "t", COLUMN_TYPES, str(tmp_path))
+    ranges, skipped = table.segments(parse_where_condition("ID > 950"))
+    assert ranges == [(900, 1000)]
+    assert skipped == 9
+
+    # Измененный сегмент просматривается всегда
+    table.update_record(table._row(5), {"age": 5000})
+    ranges, _ = table.segments(parse_where_condition("age > 950"))
+    assert ranges == [(0, 100), (900, 1000)]
+    assert len(table.filter(parse_where_condition("age > 950"))) == 48
+
+
+def test_zone_maps_keep_null_and_bool_counts(tmp_path):
+    write_binary(
+        "t", sample_records(1000), COLUMN_TYPES, str(tmp_path), segment_rows=100
+    )
+    table = load_binary_table("t", "t", COLUMN_TYPES, str(tmp_path))
+    for condition in ["age > 5000", 'name = "nobody"', "ID < 1"]:
+        ranges, skipped = table.segments(parse_where_condition(condition))
+        assert ranges == [] and skipped == 10
+    where = parse_where_condition('name > "user5" and ID <= 250')
+    assert table.filter(where) == [
+        record for record in sample_records(1000) if where.predicate(record)
+    ]
+
+
+def test_explain_and_changes_use_zone_maps(database, monkeypatch):
+    monkeypatch.setattr(
+        "src.primitive_db.manager.write_binary",
+        functools.partial(write_binary, segment_rows=50),
+    )
+    manager = database.open()
+    fill(manager)
+    run(manager, "set_format t binary")
+    output = run(manager, "explain select from t where ID > 260")
+    assert "Сегменты: 6 по 50 строк, пропущено по картам зон: 5" in output
+
+    # update и delete идут теми же сегментами
+    run(manager, 'update t set city = "x" where ID > 260')
+    run(manager, "delete from t where ID > 290")
+    changed = rows(manager, 'select ID from t where city = "x"')
+    assert [row["ID"] for row in changed] == list(range(261, 291))
+    output = run(manager, "explain select from t where ID > 260")
+    assert "изменено после снимка: 1" in output